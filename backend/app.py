@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, Body
+from fastapi import FastAPI, HTTPException, Body, Query, WebSocket, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 import psutil
@@ -8,6 +9,9 @@ import json
 from datetime import datetime
 import torch
 
+from compl import MetricsSampler, MultiResolutionStore, MetricsBroadcaster
+from persistence import StoreFull, shared_store, iter_row_chunks, validate_chunk, BulkReport, DEFAULT_CHUNK_SIZE
+
 app = FastAPI(title="CL-CompL Dashboard API")
 
 # Set up CORS
@@ -26,8 +30,13 @@ class CognitiveLoadInput(BaseModel):
     loadValue: int
     timestamp: str
 
-# Store cognitive load readings
-cognitive_load_records = []
+# Store cognitive load readings (write-behind, flushed in batches; see open_store_from_env).
+# The system router writes to the same store.
+cognitive_load_store = shared_store()
+
+# Background sampling of system metrics
+METRICS_SAMPLE_INTERVAL = 1.0  # seconds between samples
+METRICS_TIME_SERIES_POINTS = 20  # samples kept for the dashboard time series
 
 # Helper function to get system metrics
 def get_system_metrics():
@@ -47,50 +56,116 @@ def get_system_metrics():
         
     return metrics
 
+metrics_sampler = MetricsSampler(
+    get_system_metrics,
+    interval=METRICS_SAMPLE_INTERVAL,
+    capacity=METRICS_TIME_SERIES_POINTS
+)
+
+# CompL history with 1s/10s/1min/1h rollups, fed by the sampler
+metrics_store = MultiResolutionStore()
+metrics_sampler.add_listener(metrics_store.add_sample)
+
+# Push channel: one sampler fanned out to every streaming client
+metrics_broadcaster = MetricsBroadcaster(metrics_sampler)
+
+@app.on_event("startup")
+async def start_metrics_sampler():
+    await metrics_sampler.start()
+
+@app.on_event("shutdown")
+async def stop_metrics_sampler():
+    await metrics_sampler.stop()
+
+@app.on_event("shutdown")
+async def flush_cognitive_load_store():
+    await cognitive_load_store.close()
+
 @app.get("/")
 def read_root():
     return {"message": "CL-CompL Dashboard API is running"}
 
 @app.get("/api/system-metrics")
 async def system_metrics():
-    # Get basic system metrics
-    metrics = get_system_metrics()
-    
-    # Add execution time simulation (would be real in production)
-    execution_samples = []
-    for _ in range(5):
-        start_time = time.time()
-        # Simulate computation with complexity based on day of month (for demo variation)
-        n = datetime.now().day * 100000
-        sum(i * i for i in range(n))
-        execution_time = (time.time() - start_time) * 1000  # Convert to ms
-        execution_samples.append(execution_time)
-    
-    metrics["execution_time"] = sum(execution_samples) / len(execution_samples)
-    
-    # Generate time series data for the dashboard
-    time_series = []
-    for i in range(20):
-        # Create slightly varied metrics for time series display
-        var_factor = 0.9 + (i % 5) * 0.05
-        time_series.append({
-            "time": i,
-            "vramUsage": metrics["vram_used"] * var_factor if metrics["vram_used"] > 0 else 4 + (i % 5) * 0.8,
-            "cpuUsage": metrics["cpu_usage"] * var_factor,
-            "executionTime": metrics["execution_time"] * var_factor
-        })
+    # Served from the sampler's buffer; no measurement happens per request
+    return metrics_sampler.payload()
+
+@app.get("/api/system-metrics/range")
+async def system_metrics_range(
+    from_ts: Optional[float] = Query(None, alias="from", description="Start, epoch seconds"),
+    to_ts: Optional[float] = Query(None, alias="to", description="End, epoch seconds"),
+    step: Optional[float] = Query(None, gt=0, description="Seconds per returned point")
+):
+    # Defaults to the last hour
+    to_ts = time.time() if to_ts is None else to_ts
+    from_ts = to_ts - 3600 if from_ts is None else from_ts
+    if from_ts > to_ts:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
     
-    return {
-        "current": metrics,
-        "timeSeries": time_series
-    }
+    return metrics_store.query(from_ts, to_ts, step)
+
+@app.websocket("/api/system-metrics/ws")
+async def system_metrics_ws(websocket: WebSocket, interval: float = METRICS_SAMPLE_INTERVAL):
+    # Snapshot on connect, then changed fields only; send {"interval": s} to change the rate
+    await websocket.accept()
+    await metrics_broadcaster.serve_websocket(websocket, interval)
+
+@app.get("/api/system-metrics/stream")
+async def system_metrics_stream(interval: float = METRICS_SAMPLE_INTERVAL):
+    # Server-Sent Events variant of the WebSocket stream
+    return StreamingResponse(
+        metrics_broadcaster.sse_events(interval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
 
 @app.post("/api/cognitive-load")
 async def record_cognitive_load(data: CognitiveLoadInput):
-    cognitive_load_records.append(data.dict())
+    # Queued in memory and persisted by the next batch flush
+    try:
+        cognitive_load_store.put("reading", data.dict())
+    except StoreFull as e:
+        raise HTTPException(status_code=503, detail=f"Cognitive load store is full: {e}", headers={"Retry-After": "1"})
+    
+    return {"status": "recorded", "records_count": cognitive_load_store.count()}
+
+@app.post("/api/cognitive-load/bulk")
+async def record_cognitive_load_bulk(
+    request: Request,
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, gt=0, le=10000)
+):
+    # NDJSON (application/x-ndjson) or CSV (text/csv) body, one reading per line.
+    # Rows are validated chunk by chunk; invalid rows are reported, valid ones stored.
+    report = BulkReport()
+    async for chunk in iter_row_chunks(request, chunk_size):
+        valid, errors = validate_chunk(CognitiveLoadInput, chunk)
+        report.errors.extend(errors)
+        try:
+            cognitive_load_store.put_many("reading", [reading.dict() for _, reading in valid])
+        except StoreFull:
+            # Shed the chunk; the report tells the client which rows to resend
+            for row_number, _ in valid:
+                report.reject(row_number, "Store is full, retry later")
+            continue
+        report.accepted += len(valid)
+    
+    return report.to_dict()
+
+@app.get("/api/cognitive-load/records")
+async def stream_cognitive_load_records(
+    after_id: Optional[str] = Query(None, description="Return records stored after this id"),
+    limit: Optional[int] = Query(None, gt=0),
+    source: Optional[str] = Query(None, description="'reading' or 'project'")
+):
+    # Stored readings as NDJSON, one record per line; pass the last id back as after_id to resume
+    def records():
+        kwargs = {"limit": limit, "source": source}
+        if after_id:
+            kwargs["after_id"] = int(after_id) if after_id.isdigit() else after_id
+        for record in cognitive_load_store.read(**kwargs):
+            yield json.dumps(record) + "\n"
     
-    # In a real app, save this to a database
-    return {"status": "recorded", "records_count": len(cognitive_load_records)}
+    return StreamingResponse(records(), media_type="application/x-ndjson")
 
 @app.get("/api/optimal-point")
 async def get_optimal_point(taskType: str, userExperienceLevel: str):
@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Threads running blocking SQLAlchemy work for async routes. Keep it at or
+# below pool_size + max_overflow, or threads will queue for connections.
+DB_THREADS = int(os.environ.get("CL_DB_THREADS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_THREADS, thread_name_prefix="db")
+
+
+async def run_db(fn: Callable, *args, **kwargs) -> Any:
+    """
+    Run blocking database work on the bounded DB executor.
+
+    Async routes await this instead of calling the Session directly, so a
+    slow query no longer stalls the event loop (and the WebSockets it
+    serves). A request's Session is only used by one thread at a time,
+    since each call is awaited before the next one is made.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+def pool_options() -> Dict[str, Any]:
+    """
+    Connection pool settings for create_engine, from the environment:
+
+    DB_POOL_SIZE     connections kept open (default: CL_DB_THREADS)
+    DB_MAX_OVERFLOW  extra connections under load (default 4)
+    DB_POOL_TIMEOUT  seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE  seconds before a connection is replaced (default 1800)
+    """
+    return {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", str(DB_THREADS))),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "4")),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": True,
+    }
+
+
+def shutdown():
+    _executor.shutdown(wait=True)
@@ -0,0 +1,36 @@
+"""
+Add the archive partition table and the assessment timestamp index used by
+the archive job to an existing database (new databases get them from the
+models via create_all).
+
+    python -m app.migrations.add_cognitive_load_archive [--downgrade]
+"""
+import sys
+
+from ..models import CognitiveLoadArchivePartition, CognitiveLoadAssessment
+
+TIMESTAMP_INDEX = "ix_cognitive_load_assessments_timestamp"
+
+
+def _timestamp_index():
+    return next(index for index in CognitiveLoadAssessment.__table__.indexes if index.name == TIMESTAMP_INDEX)
+
+
+def upgrade(bind):
+    _timestamp_index().create(bind, checkfirst=True)
+    CognitiveLoadArchivePartition.__table__.create(bind, checkfirst=True)
+
+
+def downgrade(bind):
+    # Archived months stay in their files, but without the table nothing routes to them
+    CognitiveLoadArchivePartition.__table__.drop(bind, checkfirst=True)
+    _timestamp_index().drop(bind, checkfirst=True)
+
+
+if __name__ == "__main__":
+    from ..database import engine
+
+    if "--downgrade" in sys.argv:
+        downgrade(engine)
+    else:
+        upgrade(engine)
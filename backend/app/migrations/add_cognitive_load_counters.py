@@ -0,0 +1,65 @@
+"""
+Add the histogram bucket and rollup counter tables, with the unique indexes
+their INSERT ... ON CONFLICT upserts need, to an existing database (new
+databases get them from the models via create_all). Fill the new tables
+afterwards with python -m app.services.cognitive_load_histograms and
+python -m app.services.cognitive_load_rollups --rebuild.
+
+    python -m app.migrations.add_cognitive_load_counters [--downgrade]
+"""
+import sys
+
+from sqlalchemy import Index, MetaData, inspect
+
+from ..models import (
+    CognitiveLoadHistogramBucket,
+    ModuleExpertiseCognitiveLoadRollup,
+    StudentModuleCognitiveLoadRollup,
+    UserCognitiveLoadHistogramBucket,
+)
+from ..services.cognitive_load_histograms import CLASS_KEY, USER_KEY
+from ..services.cognitive_load_rollups import MODULE_KEY, STUDENT_KEY
+
+# Counter table -> columns of its upsert conflict target
+COUNTER_KEYS = [
+    (CognitiveLoadHistogramBucket, CLASS_KEY),
+    (UserCognitiveLoadHistogramBucket, USER_KEY),
+    (StudentModuleCognitiveLoadRollup, STUDENT_KEY),
+    (ModuleExpertiseCognitiveLoadRollup, MODULE_KEY),
+]
+
+
+def _has_unique_key(inspector, table_name, key_columns) -> bool:
+    keys = [constraint["column_names"] for constraint in inspector.get_unique_constraints(table_name)]
+    keys += [index["column_names"] for index in inspector.get_indexes(table_name) if index["unique"]]
+    return any(set(columns) == set(key_columns) for columns in keys)
+
+
+def upgrade(bind):
+    inspector = inspect(bind)
+    for model, key_columns in COUNTER_KEYS:
+        table = model.__table__
+        if not inspector.has_table(table.name):
+            # Created with its unique constraint
+            table.create(bind)
+        elif not _has_unique_key(inspector, table.name, key_columns):
+            # Tables from an earlier create_all without the constraint; an
+            # existing duplicate key makes this fail until the table is rebuilt.
+            # Built on a copy so the model's metadata does not gain the index
+            copy = table.to_metadata(MetaData())
+            Index(f"uq_{table.name}_key", *[copy.c[column] for column in key_columns], unique=True).create(bind)
+
+
+def downgrade(bind):
+    # The counters are derived data; the backfill jobs rebuild them
+    for model, _ in reversed(COUNTER_KEYS):
+        model.__table__.drop(bind, checkfirst=True)
+
+
+if __name__ == "__main__":
+    from ..database import engine
+
+    if "--downgrade" in sys.argv:
+        downgrade(engine)
+    else:
+        upgrade(engine)
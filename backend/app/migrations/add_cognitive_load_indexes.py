@@ -0,0 +1,40 @@
+"""
+Add the composite indexes used by the cognitive load routes to an existing
+database (new databases get them from the models via create_all).
+
+    python -m app.migrations.add_cognitive_load_indexes [--downgrade]
+"""
+import sys
+
+from ..models import CognitiveLoadAssessment, Task
+
+INDEX_NAMES = [
+    "ix_cognitive_load_assessments_user_timestamp",
+    "ix_cognitive_load_assessments_user_config_timestamp",
+    "ix_cognitive_load_assessments_task_config",
+    "ix_tasks_task_type_module",
+]
+
+
+def _indexes():
+    indexes = {index.name: index for table in (CognitiveLoadAssessment.__table__, Task.__table__) for index in table.indexes}
+    return [indexes[name] for name in INDEX_NAMES]
+
+
+def upgrade(bind):
+    for index in _indexes():
+        index.create(bind, checkfirst=True)
+
+
+def downgrade(bind):
+    for index in reversed(_indexes()):
+        index.drop(bind, checkfirst=True)
+
+
+if __name__ == "__main__":
+    from ..database import engine
+
+    if "--downgrade" in sys.argv:
+        downgrade(engine)
+    else:
+        upgrade(engine)
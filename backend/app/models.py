@@ -1,7 +1,18 @@
 # ... existing code ...
+from sqlalchemy import Index, UniqueConstraint
 
 class CognitiveLoadAssessment(Base):
     __tablename__ = "cognitive_load_assessments"
+    __table_args__ = (
+        # Latest assessment and keyset-paginated history of a user
+        Index("ix_cognitive_load_assessments_user_timestamp", "user_id", "timestamp", "id"),
+        # Same, filtered by configuration
+        Index("ix_cognitive_load_assessments_user_config_timestamp", "user_id", "config_type", "timestamp", "id"),
+        # Class/stats queries reach assessments through the tasks matching task_type/module_id
+        Index("ix_cognitive_load_assessments_task_config", "task_id", "config_type"),
+        # Month ranges read and deleted by the archive job
+        Index("ix_cognitive_load_assessments_timestamp", "timestamp"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -38,3 +49,101 @@ Task.cognitive_assessments = relationship(
     back_populates="task",
     cascade="all, delete-orphan"
 )
+
+# Tasks matching the task_type/module_id filters of the cognitive load routes
+Index("ix_tasks_task_type_module", Task.task_type, Task.module_id)
+
+# Precomputed histogram counters, kept current by the assessment insert paths.
+# NULL never conflicts in a unique constraint, so missing config_type,
+# task_type and expertise_level are stored as "" and a missing module_id as 0.
+class CognitiveLoadHistogramBucket(Base):
+    __tablename__ = "cognitive_load_histogram_buckets"
+    __table_args__ = (
+        UniqueConstraint("dimension", "score", "config_type", "task_type", "module_id", "expertise_level",
+                         name="uq_cognitive_load_histogram_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    dimension = Column(String, nullable=False)        # SEQ dimension, e.g. "effort"
+    score = Column(Integer, nullable=False)           # 1-9
+    config_type = Column(String, nullable=False, default="")
+    task_type = Column(String, nullable=False, default="")
+    module_id = Column(Integer, nullable=False, default=0)
+    expertise_level = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+
+class UserCognitiveLoadHistogramBucket(Base):
+    __tablename__ = "user_cognitive_load_histogram_buckets"
+    __table_args__ = (
+        UniqueConstraint("user_id", "dimension", "score", "config_type", "task_type", "module_id",
+                         name="uq_user_cognitive_load_histogram_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    dimension = Column(String, nullable=False)
+    score = Column(Integer, nullable=False)
+    config_type = Column(String, nullable=False, default="")
+    task_type = Column(String, nullable=False, default="")
+    module_id = Column(Integer, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+# Materialized cognitive load rollups: per-dimension score sums plus the
+# effort moments and overload count, so averages, standard deviation and
+# overload ratio of any group are sums over a few rows. Missing config_type
+# and expertise_level are stored as "" and a missing module_id as 0.
+class StudentModuleCognitiveLoadRollup(Base):
+    __tablename__ = "cognitive_load_rollup_student_module"
+    __table_args__ = (
+        UniqueConstraint("user_id", "module_id", "config_type", name="uq_cognitive_load_rollup_student_module"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    module_id = Column(Integer, nullable=False, default=0)
+    config_type = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    complexity_sum = Column(Integer, nullable=False, default=0)
+    usability_sum = Column(Integer, nullable=False, default=0)
+    effort_sum = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Integer, nullable=False, default=0)
+    frustration_sum = Column(Integer, nullable=False, default=0)
+    germane_sum = Column(Integer, nullable=False, default=0)
+    transfer_sum = Column(Integer, nullable=False, default=0)
+    effort_squared_sum = Column(Integer, nullable=False, default=0)
+    overload_count = Column(Integer, nullable=False, default=0)
+
+class ModuleExpertiseCognitiveLoadRollup(Base):
+    __tablename__ = "cognitive_load_rollup_module_expertise"
+    __table_args__ = (
+        UniqueConstraint("module_id", "expertise_level", "config_type", name="uq_cognitive_load_rollup_module_expertise"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    module_id = Column(Integer, nullable=False, default=0)
+    expertise_level = Column(String, nullable=False, default="")
+    config_type = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    complexity_sum = Column(Integer, nullable=False, default=0)
+    usability_sum = Column(Integer, nullable=False, default=0)
+    effort_sum = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Integer, nullable=False, default=0)
+    frustration_sum = Column(Integer, nullable=False, default=0)
+    germane_sum = Column(Integer, nullable=False, default=0)
+    transfer_sum = Column(Integer, nullable=False, default=0)
+    effort_squared_sum = Column(Integer, nullable=False, default=0)
+    overload_count = Column(Integer, nullable=False, default=0)
+
+# Months of assessments moved out of the database into Parquet files by
+# app.services.cognitive_load_archive; one row per file. Assessments older
+# than the first day after the latest archived month live only in the files.
+class CognitiveLoadArchivePartition(Base):
+    __tablename__ = "cognitive_load_archive_partitions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(String, nullable=False, index=True)  # "YYYY-MM" of the assessment timestamps
+    path = Column(String, nullable=False, unique=True)  # Relative to the archive directory
+    row_count = Column(Integer, nullable=False)
+    min_timestamp = Column(DateTime, nullable=False)
+    max_timestamp = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -1,14 +1,14 @@
-from fastapi import APIRouter, HTTPException
-import psutil
-try:
-    import GPUtil
-    gpu_available = True
-except ImportError:
-    gpu_available = False
+from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+import asyncio
+import os
 import time
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 
+from compl import MetricsSampler, MetricsBroadcaster, CachedProbe, TaskConflict, select_gpu_probe, read_ram, task_registry
+from persistence import StoreFull, shared_store
+
 router = APIRouter(
     prefix="/api/system",
     tags=["system"],
@@ -21,76 +21,163 @@ class SystemMetrics(BaseModel):
     gpu: Dict[str, float]
     activeTasksEstimatedTime: float
 
+# Sondas de GPU/RAM com cache (TTL em segundos) e execução fora do event loop.
+# O backend de GPU é escolhido por COMPL_GPU_PROBE (auto, nvml, gputil, sysfs, fake, none).
+GPU_PROBE_TTL = float(os.environ.get("GPU_PROBE_TTL", "2.0"))
+RAM_PROBE_TTL = float(os.environ.get("RAM_PROBE_TTL", "0.5"))
+
+gpu_probe = CachedProbe(select_gpu_probe().read, ttl=GPU_PROBE_TTL)
+ram_probe = CachedProbe(read_ram, ttl=RAM_PROBE_TTL)
+
+async def collect_system_metrics() -> SystemMetrics:
+    """
+    Lê as métricas do sistema (RAM, VRAM, GPU) através das sondas com cache.
+    Requisições simultâneas compartilham a mesma leitura em andamento.
+    """
+    ram, gpu = await asyncio.gather(ram_probe.get(), gpu_probe.get(), return_exceptions=True)
+    if isinstance(ram, Exception):
+        raise ram
+    
+    # Métricas de GPU (se disponível)
+    if isinstance(gpu, Exception) or gpu is None:
+        gpu = {"total": 0, "used": 0, "usage": 0.0}
+    vram = {"total": gpu["total"], "used": gpu["used"]}
+    gpu_usage = {"usage": gpu["usage"]}
+    
+    # Tempo estimado (s) até que todas as tarefas ativas terminem,
+    # com base na vazão média (EWMA) por tipo de tarefa e quantização
+    active_tasks_time = task_registry.aggregate_eta()
+    
+    return SystemMetrics(
+        ram=ram,
+        vram=vram,
+        gpu=gpu_usage,
+        activeTasksEstimatedTime=active_tasks_time
+    )
+
 @router.get("/metrics", response_model=SystemMetrics)
 async def get_system_metrics():
     """
     Endpoint para obter métricas do sistema (RAM, VRAM, GPU)
     """
     try:
-        # Métricas de RAM
-        ram_info = psutil.virtual_memory()
-        ram = {
-            "total": ram_info.total,
-            "used": ram_info.used,
-        }
-        
-        # Métricas de GPU (se disponível)
-        if gpu_available:
-            try:
-                gpus = GPUtil.getGPUs()
-                if gpus:
-                    vram = {
-                        "total": int(gpus[0].memoryTotal * 1024 * 1024),  # Converter MB para bytes
-                        "used": int(gpus[0].memoryUsed * 1024 * 1024)
-                    }
-                    gpu_usage = {
-                        "usage": gpus[0].load * 100  # Converter para percentual
-                    }
-                else:
-                    vram = {"total": 0, "used": 0}
-                    gpu_usage = {"usage": 0.0}
-            except Exception as e:
-                vram = {"total": 0, "used": 0}
-                gpu_usage = {"usage": 0.0}
-        else:
-            vram = {"total": 0, "used": 0}
-            gpu_usage = {"usage": 0.0}
-        
-        # Tempo estimado para tarefas ativas
-        # Normalmente seria calculado com base em dados de tarefas em andamento
-        # Esta é uma implementação simplificada
-        active_tasks_time = 0.0
-        # Aqui você poderia consultar um banco de dados ou serviço para obter tempos estimados
-        
-        return SystemMetrics(
-            ram=ram,
-            vram=vram,
-            gpu=gpu_usage,
-            activeTasksEstimatedTime=active_tasks_time
-        )
+        return await collect_system_metrics()
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting system metrics: {str(e)}")
 
+async def _read_stream_metrics() -> Dict[str, Any]:
+    return (await collect_system_metrics()).dict()
+
+# Um único amostrador alimenta todos os clientes de streaming;
+# ele só roda enquanto houver pelo menos um cliente conectado
+STREAM_SAMPLE_INTERVAL = 1.0  # segundos entre leituras
+metrics_broadcaster = MetricsBroadcaster(
+    MetricsSampler(_read_stream_metrics, interval=STREAM_SAMPLE_INTERVAL, capacity=1),
+    owns_sampler=True
+)
+
+@router.websocket("/metrics/ws")
+async def stream_system_metrics_ws(websocket: WebSocket, interval: float = STREAM_SAMPLE_INTERVAL):
+    """
+    Envia um snapshot das métricas na conexão e depois apenas os campos alterados.
+    O cliente pode enviar {"interval": segundos} para mudar a frequência.
+    """
+    await websocket.accept()
+    await metrics_broadcaster.serve_websocket(websocket, interval)
+
+@router.get("/metrics/stream")
+async def stream_system_metrics_sse(interval: float = STREAM_SAMPLE_INTERVAL):
+    """
+    Versão Server-Sent Events do streaming de métricas
+    """
+    return StreamingResponse(
+        metrics_broadcaster.sse_events(interval),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+class TaskStart(BaseModel):
+    task_type: str               # e.g., "generation", "fine-tuning"
+    quantization: str            # e.g., "q4", "q8"
+    total_units: float           # tokens a gerar ou passos de treino
+    task_id: Optional[str] = None
+
+class TaskProgress(BaseModel):
+    completed_units: float
+
+@router.post("/tasks")
+async def start_task(data: TaskStart):
+    """
+    Registra uma geração ou ajuste fino em andamento (409 se o task_id
+    ainda estiver ativo; para reiniciar, remova a tarefa antes)
+    """
+    try:
+        task_id = task_registry.start_task(data.task_type, data.quantization, data.total_units, data.task_id)
+    except TaskConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"task_id": task_id, "eta": task_registry.estimate(task_id)}
+
+@router.post("/tasks/{task_id}/progress")
+async def report_task_progress(task_id: str, data: TaskProgress):
+    """
+    Atualiza o progresso (unidades concluídas até agora) de uma tarefa
+    """
+    try:
+        task_registry.report_progress(task_id, data.completed_units)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return {"task_id": task_id, "eta": task_registry.estimate(task_id)}
+
+@router.delete("/tasks/{task_id}")
+async def finish_task(task_id: str):
+    """
+    Remove uma tarefa concluída ou cancelada
+    """
+    task_registry.finish_task(task_id)
+    return {"status": "success"}
+
+@router.get("/tasks")
+async def list_tasks():
+    """
+    Lista as tarefas ativas, seus ETAs e a vazão aprendida por classe,
+    para que o agendador do laboratório decida se admite novos jobs
+    """
+    return {
+        "tasks": task_registry.snapshot(),
+        "aggregateEta": task_registry.aggregate_eta(),
+        "throughput": task_registry.throughput_table()
+    }
+
 class CognitiveLoadData(BaseModel):
     project_id: str
     value: int
     timestamp: Optional[int] = None
 
+# Avaliações são enfileiradas em memória e gravadas em lotes, no mesmo
+# armazenamento usado pelo app (um por processo)
+cognitive_load_store = shared_store()
+
+@router.on_event("shutdown")
+async def flush_cognitive_load_store():
+    await cognitive_load_store.close()
+
 @router.post("/cognitive-load")
 async def save_cognitive_load(data: CognitiveLoadData):
     """
     Endpoint para salvar avaliações de carga cognitiva do usuário
     """
     try:
-        # Aqui você salvaria os dados em um banco de dados
-        # Por exemplo, usando SQLAlchemy ou outro ORM
-        
-        # Simulação de armazenamento bem-sucedido
         if data.timestamp is None:
             data.timestamp = int(time.time() * 1000)
+        
+        cognitive_load_store.put("project", data.dict())
             
         return {"status": "success", "message": "Cognitive load saved", "data": data.dict()}
     
+    except StoreFull as e:
+        raise HTTPException(status_code=503, detail=f"Cognitive load store is full: {e}", headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving cognitive load: {str(e)}")
@@ -1,25 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import Dict, List, Optional
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, conint
 from datetime import datetime
+from sqlalchemy import func, case, or_, and_
 from sqlalchemy.orm import Session
 
 from ..database import get_db
 from ..models import User, CognitiveLoadAssessment, Task
 from ..auth import get_current_user
+from ..db_executor import run_db
+from ..services import bootstrap
+from ..services.cognitive_load_stats import stats_engine, SEQ_DIMENSIONS, OVERLOAD_THRESHOLD
+from ..services.cognitive_load_histograms import record_assessments, query_user_histogram, query_class_histogram
+from ..services.cognitive_load_cache import response_cache, normalize_filters
+from ..services.cognitive_load_rollups import record_rollups, query_module_rollup_aggregates, query_student_rollups
+from ..services.cognitive_load_analysis import fetch_assessment_arrays, analyze_cohort, DEFAULT_GROUPS
+from ..services.cognitive_load_archive import archive_watcher, read_user_history, list_partitions, hot_start
+# Importing it registers the Session listener that moves counters when a user's expertise changes
+from ..services import cognitive_load_expertise  # noqa: F401
+from persistence.bulk import iter_row_chunks, validate_chunk, BulkReport, DEFAULT_CHUNK_SIZE
 
 router = APIRouter(prefix="/api/cognitive-load", tags=["cognitive-load"])
 
+# SEQ scale (Paas et al., 2003); the histograms, rollups and statistics count scores 1-9
+SeqScore = conint(ge=1, le=9)
+
 # Pydantic models for request/response
 class CognitiveLoadAssessmentCreate(BaseModel):
     task_id: int
-    complexity: int  # ICL proxy
-    usability: int   # ECL proxy
-    effort: int      # Total effort
-    confidence: int
-    frustration: int
-    germane: int     # GCL proxy
-    transfer: int    # Transfer capability
+    complexity: SeqScore  # ICL proxy
+    usability: SeqScore   # ECL proxy
+    effort: SeqScore      # Total effort
+    confidence: SeqScore
+    frustration: SeqScore
+    germane: SeqScore     # GCL proxy
+    transfer: SeqScore    # Transfer capability
     config_type: Optional[str] = None  # e.g., "q4", "q8"
     notes: Optional[str] = None
 
@@ -28,6 +44,23 @@ class CognitiveLoadResponse(BaseModel):
     histogramData: Dict
     stats: Optional[Dict] = None
 
+class CognitiveLoadAnalysisRequest(BaseModel):
+    task_type: Optional[str] = None
+    module_id: Optional[int] = None
+    expertise_level: Optional[str] = None
+    # Assessment time range; months before the hot partition are read from the archives
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    baseline: str = DEFAULT_GROUPS[0]   # config_type compared against
+    treatment: str = DEFAULT_GROUPS[1]
+    # CompL samples, e.g. the "series" of /api/system-metrics/range: {"time": epoch seconds, metric: value}
+    samples: List[Dict[str, Any]] = []
+    metrics: Optional[List[str]] = None  # default: every numeric field of the samples
+    tolerance: float = Field(60.0, gt=0)  # max seconds between an assessment and its sample
+    resamples: int = Field(2000, ge=100, le=20000)
+    confidence: float = Field(0.95, gt=0, lt=1)
+    seed: Optional[int] = None
+
 @router.post("/assessment")
 async def create_assessment(
     assessment: CognitiveLoadAssessmentCreate,
@@ -36,6 +69,187 @@ async def create_assessment(
 ):
     """Submit a new cognitive load assessment for a task"""
     
+    # Blocking database work runs on the DB executor, keeping the event loop free
+    return await run_db(insert_assessment, db, assessment, current_user)
+
+@router.post("/assessment/bulk")
+async def create_assessments_bulk(
+    request: Request,
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, gt=0, le=5000),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Submit many assessments at once as NDJSON or CSV (one per line).
+    
+    Rows are validated in chunks and each chunk is inserted with a single
+    executemany in its own transaction. Returns a per-row error report.
+    """
+    report = BulkReport()
+    async for chunk in iter_row_chunks(request, chunk_size):
+        valid, errors = validate_chunk(CognitiveLoadAssessmentCreate, chunk)
+        report.errors.extend(errors)
+        if not valid:
+            continue
+        
+        report.accepted += await run_db(insert_assessment_chunk, db, valid, current_user, report)
+    
+    return report.to_dict()
+
+@router.get("/user", response_model=CognitiveLoadResponse)
+async def get_user_cognitive_data(
+    task_type: Optional[str] = Query(None),
+    config_type: Optional[str] = Query(None),
+    module_id: Optional[int] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get cognitive load data for the current user"""
+    
+    # Blocking database work runs on the DB executor, keeping the event loop free
+    return await run_db(load_user_cognitive_data, db, current_user.id, task_type, config_type, module_id)
+
+@router.get("/user/history")
+async def get_user_cognitive_history(
+    task_type: Optional[str] = Query(None),
+    config_type: Optional[str] = Query(None),
+    module_id: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None, description="nextCursor of the previous page"),
+    limit: int = Query(50, gt=0, le=500),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Page through the current user's assessments, newest first.
+    
+    Pagination is by keyset on (timestamp, id), so every page costs the same
+    however far back it is, and only id, timestamp and the scores are loaded.
+    Pages older than the hot partition are read from the archived months.
+    """
+    before = decode_history_cursor(cursor) if cursor else None
+    
+    return await run_db(load_user_history, db, current_user.id, task_type, config_type, module_id, before, limit)
+
+@router.get("/archive")
+async def get_cognitive_load_archive(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Archived months and where the hot partition starts"""
+    
+    boundary = await run_db(hot_start, db)
+    partitions = await run_db(list_partitions, db)
+    
+    return {
+        "hotStart": boundary.isoformat() if boundary else None,
+        "partitions": [
+            dict(partition._asdict(), min_timestamp=partition.min_timestamp.isoformat(), max_timestamp=partition.max_timestamp.isoformat())
+            for partition in partitions
+        ]
+    }
+
+@router.get("/class", response_model=CognitiveLoadResponse)
+async def get_class_cognitive_data(
+    task_type: Optional[str] = Query(None),
+    config_type: Optional[str] = Query(None),
+    module_id: Optional[int] = Query(None),
+    expertise_level: Optional[str] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get aggregated cognitive load data for the class (the hot partition)"""
+    
+    if archive_watcher.due():
+        await run_db(archive_watcher.check, db)
+    
+    # Polls between inserts are served from the cache
+    cache_key = normalize_filters(task_type, config_type, module_id, expertise_level)
+    cached = response_cache.get("class", cache_key)
+    if cached is not None:
+        return cached
+    version = response_cache.version(cache_key)
+    
+    response = await run_db(compute_class_cognitive_data, db, task_type, config_type, module_id, expertise_level)
+    response_cache.put("class", cache_key, version, response)
+    
+    return response
+
+@router.get("/class/students")
+async def get_class_student_rollups(
+    config_type: Optional[str] = Query(None),
+    module_id: Optional[int] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Per-student averages for cohort comparison, read from the student rollup"""
+    
+    students = await run_db(query_student_rollups, db, config_type, module_id)
+    
+    return {"students": students}
+
+@router.post("/analysis")
+async def analyze_cognitive_load(
+    request: CognitiveLoadAnalysisRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Effect of config_type on each SEQ dimension and correlation with CompL samples.
+    
+    Statistics come with percentile bootstrap intervals; large cohorts are
+    resampled on a process pool.
+    """
+    arrays = await run_db(
+        fetch_assessment_arrays, db, request.task_type, request.module_id, request.expertise_level, request.since, request.until
+    )
+    
+    return await run_in_threadpool(
+        analyze_cohort,
+        arrays,
+        request.samples,
+        metrics=request.metrics,
+        groups=(request.baseline, request.treatment),
+        resamples=request.resamples,
+        confidence=request.confidence,
+        tolerance=request.tolerance,
+        seed=request.seed
+    )
+
+@router.on_event("shutdown")
+def stop_bootstrap_pool():
+    bootstrap.shutdown()
+
+@router.get("/stats")
+async def get_cognitive_load_stats(
+    task_type: Optional[str] = Query(None),
+    config_type: Optional[str] = Query(None),
+    module_id: Optional[int] = Query(None),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get statistical analysis of cognitive load data (the hot partition)"""
+    
+    if archive_watcher.due():
+        await run_db(archive_watcher.check, db)
+    
+    cache_key = normalize_filters(task_type, config_type, module_id)
+    cached = response_cache.get("stats", cache_key)
+    if cached is not None:
+        return cached
+    version = response_cache.version(cache_key)
+    
+    # Statistics are maintained incrementally; the first call loads them from the database,
+    # later ones only count the rows other workers inserted since
+    await run_db(stats_engine.sync, db)
+    
+    response = stats_engine.summary(task_type, config_type, module_id)
+    response_cache.put("stats", cache_key, version, response)
+    
+    return response
+
+# Database work of the endpoints, run on the DB executor
+def insert_assessment(db, assessment, current_user):
+    """Insert one assessment and update the derived statistics, histograms and cache"""
     # Validate task exists
     task = db.query(Task).filter(Task.id == assessment.task_id).first()
     if not task:
@@ -58,92 +272,161 @@ async def create_assessment(
     )
     
     db.add(db_assessment)
+    
+    # Histogram buckets and rollups are committed with the assessment
+    new_rows = [dict(assessment.dict(), task_type=task.task_type, module_id=task.module_id)]
+    record_assessments(db, current_user, new_rows)
+    record_rollups(db, current_user, new_rows)
     db.commit()
     db.refresh(db_assessment)
     
+    # Keep the running statistics current
+    stats_engine.add_assessment(
+        db_assessment.id,
+        task.task_type,
+        assessment.config_type,
+        task.module_id,
+        {dimension: getattr(assessment, dimension) for dimension in SEQ_DIMENSIONS}
+    )
+    response_cache.invalidate(task.task_type, assessment.config_type, task.module_id, current_user.expertise_level)
+    
     return {"success": True, "id": db_assessment.id}
 
-@router.get("/user", response_model=CognitiveLoadResponse)
-async def get_user_cognitive_data(
-    task_type: Optional[str] = Query(None),
-    config_type: Optional[str] = Query(None),
-    module_id: Optional[int] = Query(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Get cognitive load data for the current user"""
+def insert_assessment_chunk(db, valid, current_user, report):
+    """Insert the valid rows of a bulk chunk in one transaction; returns the number inserted"""
+    # Validate all task ids of the chunk with one query
+    task_ids = {assessment.task_id for _, assessment in valid}
+    existing_tasks = {
+        task_id: (task_type, module_id)
+        for task_id, task_type, module_id in db.query(Task.id, Task.task_type, Task.module_id).filter(Task.id.in_(task_ids))
+    }
     
-    # Query user's assessments with filters
-    query = db.query(CognitiveLoadAssessment).join(Task).filter(
-        CognitiveLoadAssessment.user_id == current_user.id
-    )
+    timestamp = datetime.utcnow()
+    rows = []
+    for row_number, assessment in valid:
+        if assessment.task_id not in existing_tasks:
+            report.reject(row_number, "Task not found")
+            continue
+        rows.append(dict(assessment.dict(), user_id=current_user.id, timestamp=timestamp))
     
-    if task_type:
-        query = query.filter(Task.task_type == task_type)
-    if config_type:
-        query = query.filter(CognitiveLoadAssessment.config_type == config_type)
-    if module_id:
-        query = query.filter(Task.module_id == module_id)
+    if not rows:
+        return 0
+    
+    db.bulk_insert_mappings(CognitiveLoadAssessment, rows)
+    new_rows = [
+        dict(row, task_type=existing_tasks[row["task_id"]][0], module_id=existing_tasks[row["task_id"]][1])
+        for row in rows
+    ]
+    record_assessments(db, current_user, new_rows)
+    record_rollups(db, current_user, new_rows)
+    db.commit()
+    
+    # bulk_insert_mappings does not return the new ids: the statistics count
+    # the chunk (and anything else above their high-water mark) by id range
+    stats_engine.catch_up(db)
+    affected = set()
+    for row in rows:
+        task_type, module_id = existing_tasks[row["task_id"]]
+        affected.add((task_type, row["config_type"], module_id))
+    for task_type, config_type, module_id in affected:
+        response_cache.invalidate(task_type, config_type, module_id, current_user.expertise_level)
     
-    assessments = query.order_by(CognitiveLoadAssessment.timestamp.desc()).all()
+    return len(rows)
+
+def load_user_cognitive_data(db, user_id, task_type, config_type, module_id):
+    """Latest scores and histogram of a user"""
+    # Only the score columns of the most recent assessment (LIMIT 1 on the user/timestamp index)
+    query = user_assessments_query(db, user_id, score_columns(), task_type, config_type, module_id)
+    latest_assessment = query.order_by(
+        CognitiveLoadAssessment.timestamp.desc(), CognitiveLoadAssessment.id.desc()
+    ).first()
     
     # Process data for radar chart
-    if assessments:
-        latest_assessment = assessments[0]  # Most recent assessment
-        radar_data = [
-            latest_assessment.complexity,
-            latest_assessment.usability,
-            latest_assessment.effort,
-            latest_assessment.confidence,
-            latest_assessment.frustration,
-            latest_assessment.germane,
-            latest_assessment.transfer
-        ]
+    if latest_assessment:
+        radar_data = list(latest_assessment)
     else:
         # Default data if no assessments
         radar_data = [0, 0, 0, 0, 0, 0, 0]
     
-    # Process historical data for histogram - simplified for this example
-    histogram_data = process_user_histogram_data(assessments)
+    # Histogram from the precomputed bucket counters
+    histogram_data = query_user_histogram(db, user_id, task_type, config_type, module_id)
     
     return {
         "radarData": radar_data,
         "histogramData": histogram_data
     }
 
-@router.get("/class", response_model=CognitiveLoadResponse)
-async def get_class_cognitive_data(
-    task_type: Optional[str] = Query(None),
-    config_type: Optional[str] = Query(None),
-    module_id: Optional[int] = Query(None),
-    expertise_level: Optional[str] = Query(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Get aggregated cognitive load data for the class"""
+def load_user_history(db, user_id, task_type, config_type, module_id, before, limit):
+    """One history page of a user; `before` is the (timestamp, id) keyset of the previous page"""
+    columns = [CognitiveLoadAssessment.id, CognitiveLoadAssessment.timestamp] + score_columns()
+    query = user_assessments_query(db, user_id, columns, task_type, config_type, module_id)
     
-    # Query all assessments with filters
-    query = db.query(CognitiveLoadAssessment).join(Task)
+    if before:
+        before_timestamp, before_id = before
+        query = query.filter(or_(
+            CognitiveLoadAssessment.timestamp < before_timestamp,
+            and_(CognitiveLoadAssessment.timestamp == before_timestamp, CognitiveLoadAssessment.id < before_id)
+        ))
     
-    if task_type:
-        query = query.filter(Task.task_type == task_type)
-    if config_type:
-        query = query.filter(CognitiveLoadAssessment.config_type == config_type)
-    if module_id:
-        query = query.filter(Task.module_id == module_id)
-    if expertise_level:
-        query = query.join(User).filter(User.expertise_level == expertise_level)
+    rows = query.order_by(
+        CognitiveLoadAssessment.timestamp.desc(), CognitiveLoadAssessment.id.desc()
+    ).limit(limit + 1).all()
     
-    assessments = query.all()
+    if len(rows) <= limit:
+        # Past the hot partition, pages continue into the archived months (all older)
+        rows += read_user_history(
+            db, user_id, ["id", "timestamp"] + SEQ_DIMENSIONS, before, limit + 1 - len(rows),
+            task_type=task_type, config_type=config_type, module_id=module_id
+        )
     
-    # Calculate average values for radar chart
-    radar_data = calculate_class_averages(assessments)
+    items = [
+        dict(zip(SEQ_DIMENSIONS, scores), id=row_id, timestamp=timestamp.isoformat())
+        for row_id, timestamp, *scores in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last_id, last_timestamp = rows[limit - 1][:2]
+        next_cursor = encode_history_cursor(last_timestamp, last_id)
+    
+    return {
+        "items": items,
+        "nextCursor": next_cursor
+    }
+
+def compute_class_cognitive_data(db, task_type, config_type, module_id, expertise_level):
+    """Radar averages, histogram and statistics of the class"""
+    # Histogram from the precomputed bucket counters
+    histogram_data = query_class_histogram(db, task_type, config_type, module_id, expertise_level)
+    
+    # Both paths group by the user's current expertise level (see services.cognitive_load_expertise)
+    if task_type:
+        # The rollups are per module, so task type filters aggregate the raw assessments
+        query = db.query(CognitiveLoadAssessment).join(Task).filter(Task.task_type == task_type)
+        
+        if config_type:
+            query = query.filter(CognitiveLoadAssessment.config_type == config_type)
+        if module_id:
+            query = query.filter(Task.module_id == module_id)
+        if expertise_level:
+            query = query.join(User).filter(User.expertise_level == expertise_level)
+        
+        # Aggregate in the database; only one summary row and the effort distribution are fetched
+        aggregates = query_class_aggregates(query)
+        effort_distribution = query_effort_distribution(query)
+    else:
+        # Sums over the module x expertise x config_type rollup rows
+        aggregates = query_module_rollup_aggregates(db, config_type, module_id, expertise_level)
+        effort_distribution = {
+            score: count
+            for score, count in zip(histogram_data["labels"], histogram_data["dimensions"]["effort"])
+            if count
+        }
     
-    # Process data for histogram
-    histogram_data = process_class_histogram_data(assessments)
+    # Calculate average values for radar chart
+    radar_data = calculate_class_averages(aggregates)
     
     # Calculate statistics
-    stats = calculate_cognitive_load_stats(assessments)
+    stats = calculate_cognitive_load_stats(aggregates, effort_distribution)
     
     return {
         "radarData": radar_data,
@@ -151,74 +434,84 @@ async def get_class_cognitive_data(
         "stats": stats
     }
 
-@router.get("/stats")
-async def get_cognitive_load_stats(
-    task_type: Optional[str] = Query(None),
-    config_type: Optional[str] = Query(None),
-    module_id: Optional[int] = Query(None),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Get statistical analysis of cognitive load data"""
-    
-    # Query assessments with filters
-    query = db.query(CognitiveLoadAssessment).join(Task)
+# Helper functions for data processing
+def score_columns():
+    """The seven SEQ score columns in radar chart order"""
+    return [getattr(CognitiveLoadAssessment, dimension) for dimension in SEQ_DIMENSIONS]
+
+def user_assessments_query(db, user_id, columns, task_type=None, config_type=None, module_id=None):
+    """Projected query over a user's assessments; joins Task only when filtering on it"""
+    query = db.query(*columns).filter(CognitiveLoadAssessment.user_id == user_id)
     
+    if task_type or module_id:
+        query = query.join(Task, CognitiveLoadAssessment.task_id == Task.id)
     if task_type:
         query = query.filter(Task.task_type == task_type)
     if config_type:
         query = query.filter(CognitiveLoadAssessment.config_type == config_type)
     if module_id:
         query = query.filter(Task.module_id == module_id)
+    return query
+
+def encode_history_cursor(timestamp, assessment_id):
+    return f"{timestamp.isoformat()}_{assessment_id}"
+
+def decode_history_cursor(cursor):
+    try:
+        timestamp, _, assessment_id = cursor.rpartition("_")
+        return datetime.fromisoformat(timestamp), int(assessment_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def query_class_aggregates(query):
+    """Compute count, per-dimension averages and effort moments with SQL aggregates"""
+    effort = CognitiveLoadAssessment.effort
+    row = query.with_entities(
+        func.count(CognitiveLoadAssessment.id),
+        *[func.avg(getattr(CognitiveLoadAssessment, dimension)) for dimension in SEQ_DIMENSIONS],
+        func.avg(effort * effort),
+        func.sum(case((effort >= OVERLOAD_THRESHOLD, 1), else_=0))
+    ).order_by(None).one()
     
-    assessments = query.all()
-    
-    # Calculate detailed statistics
-    stats = calculate_detailed_cognitive_load_stats(assessments)
-    
-    return stats
+    count = row[0] or 0
+    averages = [float(value or 0) for value in row[1:1 + len(SEQ_DIMENSIONS)]]
+    return {
+        "count": count,
+        "averages": dict(zip(SEQ_DIMENSIONS, averages)),
+        "effort_squared_mean": float(row[-2] or 0),
+        "overload_count": int(row[-1] or 0)
+    }
 
-# Helper functions for data processing
-def calculate_class_averages(assessments):
-    """Calculate average values for each dimension across all assessments"""
-    if not assessments:
+def query_effort_distribution(query):
+    """Count assessments per effort score (at most 9 rows, one per SEQ score)"""
+    effort = CognitiveLoadAssessment.effort
+    rows = query.with_entities(effort, func.count(CognitiveLoadAssessment.id)).group_by(effort).order_by(None).all()
+    return {score: count for score, count in rows}
+
+def calculate_class_averages(aggregates):
+    """Round the average of each dimension for the radar chart"""
+    if not aggregates["count"]:
         return [0, 0, 0, 0, 0, 0, 0]
     
-    total_complexity = sum(a.complexity for a in assessments)
-    total_usability = sum(a.usability for a in assessments)
-    total_effort = sum(a.effort for a in assessments)
-    total_confidence = sum(a.confidence for a in assessments)
-    total_frustration = sum(a.frustration for a in assessments)
-    total_germane = sum(a.germane for a in assessments)
-    total_transfer = sum(a.transfer for a in assessments)
-    
-    count = len(assessments)
-    
-    return [
-        round(total_complexity / count, 1),
-        round(total_usability / count, 1),
-        round(total_effort / count, 1),
-        round(total_confidence / count, 1),
-        round(total_frustration / count, 1),
-        round(total_germane / count, 1),
-        round(total_transfer / count, 1)
-    ]
-
-def process_user_histogram_data(assessments):
-    """Process user's assessments for histogram visualization"""
-    # This would be implemented based on the specific data structure needed
-    # Simplified placeholder
-    return {}
+    return [round(aggregates["averages"][dimension], 1) for dimension in SEQ_DIMENSIONS]
 
-def process_class_histogram_data(assessments):
-    """Process all assessments for histogram visualization"""
-    # This would be implemented based on the specific data structure needed
-    # Simplified placeholder
-    return {}
+def median_from_distribution(distribution):
+    """Median of the values described by a {value: count} distribution"""
+    count = sum(distribution.values())
+    middle = [(count - 1) // 2, count // 2]
+    values = []
+    seen = 0
+    for value in sorted(distribution):
+        seen += distribution[value]
+        while middle and middle[0] < seen:
+            values.append(value)
+            middle.pop(0)
+    return values[0] if count % 2 else sum(values) / 2
 
-def calculate_cognitive_load_stats(assessments):
-    """Calculate basic statistics from cognitive load assessments"""
-    if not assessments:
+def calculate_cognitive_load_stats(aggregates, effort_distribution):
+    """Calculate basic statistics from the SQL aggregates of the assessments"""
+    count = aggregates["count"]
+    if not count:
         return {
             "mean": 0,
             "median": 0,
@@ -226,24 +519,16 @@ def calculate_cognitive_load_stats(assessments):
             "overload": 0
         }
     
-    # Calculate mean effort
-    efforts = [a.effort for a in assessments]
-    mean = sum(efforts) / len(efforts)
-    
-    # Calculate median effort
-    efforts.sort()
-    if len(efforts) % 2 == 0:
-        median = (efforts[len(efforts)//2] + efforts[len(efforts)//2 - 1]) / 2
-    else:
-        median = efforts[len(efforts)//2]
-    
-    # Calculate standard deviation
-    variance = sum((x - mean) ** 2 for x in efforts) / len(efforts)
+    # Mean and population standard deviation of effort
+    mean = aggregates["averages"]["effort"]
+    variance = max(aggregates["effort_squared_mean"] - mean ** 2, 0)
     std_dev = variance ** 0.5
     
+    # Median effort from the per-score counts
+    median = median_from_distribution(effort_distribution)
+    
     # Calculate overload percentage (CL ≥ 7)
-    overload_count = sum(1 for e in efforts if e >= 7)
-    overload_percentage = (overload_count / len(efforts)) * 100
+    overload_percentage = (aggregates["overload_count"] / count) * 100
     
     return {
         "mean": round(mean, 2),
@@ -251,9 +536,3 @@ def calculate_cognitive_load_stats(assessments):
         "stdDev": round(std_dev, 2),
         "overload": round(overload_percentage)
     }
-
-def calculate_detailed_cognitive_load_stats(assessments):
-    """Calculate detailed statistics for deeper analysis"""
-    # This would include more advanced statistical analysis
-    # Simplified placeholder
-    return calculate_cognitive_load_stats(assessments)
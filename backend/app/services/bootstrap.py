@@ -0,0 +1,149 @@
+import math
+import multiprocessing
+import os
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+# Worker processes for large bootstraps; 1 keeps all work in the calling process
+BOOTSTRAP_PROCESSES = int(os.environ.get("CL_BOOTSTRAP_PROCESSES", str(os.cpu_count() or 1)))
+
+# Resample weights held in memory at once (resamples x rows, float32)
+BLOCK_CELLS = 4_000_000
+
+# Resamples x rows of one unit of work; also the size from which the pool is used
+CHUNK_CELLS = 50_000_000
+
+
+def _poisson_table() -> np.ndarray:
+    """Poisson(1) inverse CDF indexed by a uniform 16-bit integer"""
+    size = 1 << 16
+    pmf = [math.exp(-1) / math.factorial(k) for k in range(16)]
+    edges = np.round(np.cumsum(pmf) * size)
+    return np.searchsorted(edges, np.arange(size), side="right").astype(np.float32)
+
+
+POISSON_TABLE = _poisson_table()
+
+
+def poisson_weights(rng: np.random.Generator, resamples: int, rows: int) -> np.ndarray:
+    """
+    Bootstrap weights of shape (resamples, rows).
+
+    Each row is drawn Poisson(1) times instead of drawing exactly `rows`
+    indices (the Poisson bootstrap). For cohorts of more than a few hundred
+    rows the two agree, and a table lookup on 16-bit draws is about twice
+    as fast as counting drawn indices.
+    """
+    return POISSON_TABLE[rng.integers(0, 1 << 16, (resamples, rows), dtype=np.uint16)]
+
+
+def weighted_sums(features: np.ndarray, resamples: int, seed) -> np.ndarray:
+    """
+    Column sums of `features` under `resamples` bootstrap weightings.
+
+    Returns shape (resamples, columns + 1); the last column is the total
+    weight of each resample.
+    """
+    rng = np.random.default_rng(seed)
+    rows = len(features)
+    features = np.hstack([features, np.ones((rows, 1), dtype=np.float32)])
+    sums = np.empty((resamples, features.shape[1]))
+    block = max(1, BLOCK_CELLS // max(1, rows))
+    for start in range(0, resamples, block):
+        stop = min(resamples, start + block)
+        sums[start:stop] = poisson_weights(rng, stop - start, rows) @ features
+    return sums
+
+
+def _weighted_sums_from_file(path: str, resamples: int, seed) -> np.ndarray:
+    # Pool workers map the features instead of receiving a pickled copy
+    return weighted_sums(np.load(path, mmap_mode="r"), resamples, seed)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: the callers run in threads, which fork does not copy safely
+        _pool = ProcessPoolExecutor(max_workers=BOOTSTRAP_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _seed_sequence(seed) -> np.random.SeedSequence:
+    return seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+
+def bootstrap_sums(features: np.ndarray, resamples: int, seed=None) -> np.ndarray:
+    """
+    weighted_sums, split in chunks of about CHUNK_CELLS across the process pool.
+
+    Every chunk has its own seed derived from `seed`, so results do not
+    depend on the number of processes.
+    """
+    features = np.ascontiguousarray(features, dtype=np.float32)
+    rows = max(1, len(features))
+    per_chunk = max(1, CHUNK_CELLS // rows)
+    sizes = [min(per_chunk, resamples - start) for start in range(0, resamples, per_chunk)]
+    seeds = _seed_sequence(seed).spawn(len(sizes))
+
+    if BOOTSTRAP_PROCESSES <= 1 or len(sizes) == 1:
+        return np.vstack([weighted_sums(features, size, chunk_seed) for size, chunk_seed in zip(sizes, seeds)])
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "features.npy")
+        np.save(path, features)
+        pool = _get_pool()
+        return np.vstack(list(pool.map(_weighted_sums_from_file, [path] * len(sizes), sizes, seeds)))
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    # Unit-scale columns keep the float32 sums accurate; r is unchanged
+    values = np.asarray(values, dtype=np.float64)
+    scale = values.std(axis=0)
+    scale[scale == 0] = 1.0
+    return ((values - values.mean(axis=0)) / scale).astype(np.float32)
+
+
+def pearson(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pearson r between every column of x (rows, p) and of y (rows, q); shape (p, q)"""
+    x, y = _standardize(x).astype(np.float64), _standardize(y).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (x.T @ y) / len(x) / np.sqrt(np.outer((x * x).mean(axis=0), (y * y).mean(axis=0)))
+
+
+def bootstrap_pearson(x: np.ndarray, y: np.ndarray, resamples: int, seed=None) -> np.ndarray:
+    """Bootstrap distribution of pearson(x, y); shape (resamples, p, q)"""
+    x, y = _standardize(x), _standardize(y)
+    p, q = x.shape[1], y.shape[1]
+    products = (x[:, :, None] * y[:, None, :]).reshape(len(x), p * q)
+    sums = bootstrap_sums(np.hstack([x, y, x * x, y * y, products]), resamples, seed)
+
+    total = sums[:, -1:]
+    mean_x, mean_y = sums[:, :p] / total, sums[:, p:p + q] / total
+    var_x = sums[:, p + q:2 * p + q] / total - mean_x ** 2
+    var_y = sums[:, 2 * p + q:2 * p + 2 * q] / total - mean_y ** 2
+    cov = sums[:, 2 * p + 2 * q:-1].reshape(-1, p, q) / total[:, :, None] - mean_x[:, :, None] * mean_y[:, None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return cov / np.sqrt(var_x[:, :, None] * var_y[:, None, :])
+
+
+def percentile_interval(samples: np.ndarray, confidence: float) -> np.ndarray:
+    """Percentile confidence interval over the first axis; shape (2, ...)"""
+    alpha = (1 - confidence) / 2
+    with warnings.catch_warnings():
+        # All-NaN columns (an empty group, a constant metric) give NaN bounds
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanquantile(samples, [alpha, 1 - alpha], axis=0)
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
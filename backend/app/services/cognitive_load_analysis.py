@@ -0,0 +1,248 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from ..models import CognitiveLoadAssessment, Task, User
+from .bootstrap import bootstrap_pearson, pearson, percentile_interval
+from .cognitive_load_archive import hot_start, naive_utc, read_archives
+from .cognitive_load_stats import SEQ_DIMENSIONS
+
+# SEQ scores 1-9
+SCORES = np.arange(1, 10, dtype=np.float64)
+
+# CompL groups compared by the effect sizes: (baseline, treatment)
+DEFAULT_GROUPS = ("q4", "q8")
+
+
+def _database_arrays(db, task_type, module_id, expertise_level, since, until) -> Dict[str, np.ndarray]:
+    columns = [CognitiveLoadAssessment.timestamp, CognitiveLoadAssessment.config_type]
+    columns += [getattr(CognitiveLoadAssessment, dimension) for dimension in SEQ_DIMENSIONS]
+    query = db.query(*columns).join(Task, CognitiveLoadAssessment.task_id == Task.id)
+    if task_type:
+        query = query.filter(Task.task_type == task_type)
+    if module_id:
+        query = query.filter(Task.module_id == module_id)
+    if expertise_level:
+        query = query.join(User, CognitiveLoadAssessment.user_id == User.id).filter(User.expertise_level == expertise_level)
+    if since:
+        query = query.filter(CognitiveLoadAssessment.timestamp >= since)
+    if until:
+        query = query.filter(CognitiveLoadAssessment.timestamp < until)
+
+    rows = query.all()
+    timestamps, config_types, *scores = zip(*rows) if rows else [()] * len(columns)
+    return {
+        # Timestamps are naive UTC, as datetime64 assumes
+        "time": np.array(timestamps, dtype="datetime64[us]").astype(np.float64) / 1e6,
+        "config_type": np.array([config_type or "" for config_type in config_types], dtype=object),
+        "scores": np.array(scores, dtype=np.int8).reshape(len(SEQ_DIMENSIONS), -1).T
+    }
+
+
+def _archive_arrays(db, task_type, module_id, expertise_level, since, until) -> Dict[str, np.ndarray]:
+    table = read_archives(
+        db, ["timestamp", "config_type"] + SEQ_DIMENSIONS, since, until,
+        task_type=task_type, module_id=module_id, expertise_level=expertise_level
+    )
+    return {
+        "time": table["timestamp"].to_numpy().astype("datetime64[us]").astype(np.float64) / 1e6,
+        "config_type": table["config_type"].fill_null("").to_numpy(zero_copy_only=False).astype(object),
+        "scores": np.column_stack([table[dimension].to_numpy() for dimension in SEQ_DIMENSIONS]).astype(np.int8).reshape(-1, len(SEQ_DIMENSIONS))
+    }
+
+
+def fetch_assessment_arrays(
+    db,
+    task_type: Optional[str] = None,
+    module_id: Optional[int] = None,
+    expertise_level: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Load the matching assessments in [since, until) as columns.
+
+    The part of the range still in the database is one query; the part
+    before the hot partition is read from the archive files. Returns
+    "time" (epoch seconds), "config_type" ("" when missing) and "scores"
+    of shape (rows, SEQ dimensions).
+    """
+    since, until = naive_utc(since), naive_utc(until)
+    boundary = hot_start(db)
+    in_database = boundary is None or until is None or until > boundary
+    in_archives = boundary is not None and (since is None or since < boundary)
+    parts = []
+    if in_database or not in_archives:
+        parts.append(_database_arrays(db, task_type, module_id, expertise_level, since, until))
+    if in_archives:
+        archive_until = min(until, boundary) if until else boundary
+        parts.append(_archive_arrays(db, task_type, module_id, expertise_level, since, archive_until))
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def _sample_value(value) -> float:
+    # Rows of /api/system-metrics/range hold rollups; their mean is used
+    if isinstance(value, dict):
+        value = value.get("avg")
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def sample_metrics(samples: Sequence[Dict[str, Any]]) -> List[str]:
+    """Numeric fields present in the CompL samples"""
+    names = []
+    for sample in samples:
+        for name, value in sample.items():
+            if name != "time" and name not in names and not np.isnan(_sample_value(value)):
+                names.append(name)
+    return names
+
+
+def align_samples(times: np.ndarray, samples: Sequence[Dict[str, Any]], metrics: Sequence[str], tolerance: float) -> np.ndarray:
+    """
+    CompL values at each assessment time, shape (rows, metrics).
+
+    Each assessment takes the nearest sample at most `tolerance` seconds
+    away; rows without one are NaN.
+    """
+    values = np.full((len(times), len(metrics)), np.nan)
+    samples = sorted((sample for sample in samples if "time" in sample), key=lambda sample: sample["time"])
+    if not samples or not len(times):
+        return values
+
+    sample_times = np.array([float(sample["time"]) for sample in samples])
+    sample_values = np.array([[_sample_value(sample.get(name)) for name in metrics] for sample in samples]).reshape(len(samples), len(metrics))
+
+    right = np.clip(np.searchsorted(sample_times, times), 0, len(samples) - 1)
+    left = np.clip(right - 1, 0, len(samples) - 1)
+    nearest = np.where(np.abs(sample_times[left] - times) <= np.abs(sample_times[right] - times), left, right)
+    matched = np.abs(sample_times[nearest] - times) <= tolerance
+    values[matched] = sample_values[nearest[matched]]
+    return values
+
+
+def valid_rows(scores: np.ndarray) -> np.ndarray:
+    """Rows whose scores are all on the 1-9 scale"""
+    return ((scores >= 1) & (scores <= len(SCORES))).all(axis=1)
+
+
+def score_counts(scores: np.ndarray) -> np.ndarray:
+    """Count of each score per dimension, shape (dimensions, 9); scores outside 1-9 are not counted"""
+    dimensions = scores.shape[1]
+    offsets = np.arange(dimensions) * len(SCORES)
+    scores = scores.astype(np.int64)
+    # Out-of-range scores would land in a neighbouring dimension's bins (or fail bincount)
+    in_range = (scores >= 1) & (scores <= len(SCORES))
+    flat = (scores - 1 + offsets)[in_range]
+    return np.bincount(flat, minlength=dimensions * len(SCORES)).reshape(dimensions, len(SCORES))
+
+
+def _moments(counts: np.ndarray):
+    n = counts.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = counts @ SCORES / n
+        variance = (counts @ SCORES ** 2 - n * mean ** 2) / (n - 1)
+    return n, mean, variance
+
+
+def effect_sizes(baseline: np.ndarray, treatment: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Mean difference, Cohen's d and Hedges' g of treatment minus baseline.
+
+    Arguments are score counts (..., 9); the statistics have the leading shape.
+    """
+    n_a, mean_a, var_a = _moments(baseline)
+    n_b, mean_b, var_b = _moments(treatment)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pooled = np.sqrt(((n_a - 1) * var_a + (n_b - 1) * var_b) / (n_a + n_b - 2))
+        d = (mean_b - mean_a) / pooled
+        g = d * (1 - 3 / (4 * (n_a + n_b) - 9))
+    return {"meanDifference": mean_b - mean_a, "cohensD": d, "hedgesG": g}
+
+
+def bootstrap_counts(rng: np.random.Generator, counts: np.ndarray, resamples: int) -> np.ndarray:
+    """
+    Score counts of `resamples` bootstrap samples, shape (resamples, dimensions, 9).
+
+    Resampling n scores with replacement is a multinomial draw over the nine
+    observed score frequencies, so no row is touched.
+    """
+    n = int(counts[0].sum())
+    if not n:
+        return np.zeros((resamples,) + counts.shape, dtype=np.int64)
+    return rng.multinomial(n, counts / n, size=(resamples, counts.shape[0]))
+
+
+def _rounded(value) -> Optional[float]:
+    return round(float(value), 4) if np.isfinite(value) else None
+
+
+def analyze_cohort(
+    arrays: Dict[str, np.ndarray],
+    samples: Sequence[Dict[str, Any]] = (),
+    metrics: Optional[Sequence[str]] = None,
+    groups: Sequence[str] = DEFAULT_GROUPS,
+    resamples: int = 2000,
+    confidence: float = 0.95,
+    tolerance: float = 60.0,
+    seed: Optional[int] = None
+) -> Dict:
+    """
+    Relation between CL and CompL for the assessments in `arrays`.
+
+    effectSizes: per SEQ dimension, the difference of the second config_type
+    group from the first. correlations: Pearson r of each dimension with each
+    CompL metric of the samples matched in time. Every statistic has a
+    percentile bootstrap interval. Rows with a score outside 1-9 are left
+    out and counted in "excluded".
+    """
+    seed_sequence = np.random.SeedSequence(seed)
+    counts_seed, correlation_seed = seed_sequence.spawn(2)
+    # Rows stored before scores were validated may hold values off the scale
+    valid = valid_rows(arrays["scores"])
+    arrays = {name: values[valid] for name, values in arrays.items()}
+    scores = arrays["scores"]
+    baseline, treatment = groups
+
+    # Effect sizes from the score counts of each group
+    counts = [score_counts(scores[arrays["config_type"] == group]) for group in groups]
+    point = effect_sizes(*counts)
+    rng = np.random.default_rng(counts_seed)
+    resampled = effect_sizes(*[bootstrap_counts(rng, group_counts, resamples) for group_counts in counts])
+    interval = {name: percentile_interval(values, confidence) for name, values in resampled.items()}
+
+    effect = {}
+    for index, dimension in enumerate(SEQ_DIMENSIONS):
+        effect[dimension] = {
+            name: {
+                "value": _rounded(point[name][index]),
+                "ci": [_rounded(interval[name][0][index]), _rounded(interval[name][1][index])]
+            }
+            for name in point
+        }
+
+    # Correlations with the CompL samples nearest to each assessment
+    metrics = list(metrics) if metrics else sample_metrics(samples)
+    compl = align_samples(arrays["time"], samples, metrics, tolerance)
+    complete = ~np.isnan(compl).any(axis=1) if metrics else np.zeros(len(scores), dtype=bool)
+    correlations = {}
+    if complete.sum() >= 3:
+        x, y = scores[complete], compl[complete]
+        r = pearson(x, y)
+        r_interval = percentile_interval(bootstrap_pearson(x, y, resamples, correlation_seed), confidence)
+        for j, metric in enumerate(metrics):
+            correlations[metric] = {
+                dimension: {"r": _rounded(r[i, j]), "ci": [_rounded(r_interval[0][i, j]), _rounded(r_interval[1][i, j])]}
+                for i, dimension in enumerate(SEQ_DIMENSIONS)
+            }
+
+    return {
+        "count": len(scores),
+        "excluded": int((~valid).sum()),
+        "groups": {baseline: int(counts[0][0].sum()), treatment: int(counts[1][0].sum())},
+        "resamples": resamples,
+        "confidence": confidence,
+        "effectSizes": effect,
+        "matchedSamples": int(complete.sum()),
+        "correlations": correlations
+    }
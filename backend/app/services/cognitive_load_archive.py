@@ -0,0 +1,302 @@
+import argparse
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+
+from ..models import CognitiveLoadArchivePartition, CognitiveLoadAssessment, Task, User
+from .cognitive_load_cache import response_cache
+from .cognitive_load_histograms import record_assessments
+from .cognitive_load_rollups import record_rollups
+from .cognitive_load_stats import SEQ_DIMENSIONS, stats_engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    # Only needed once months are archived; until then every assessment is in the database
+    pa = pq = None
+
+# Root of the Parquet files; partition paths are relative to it
+ARCHIVE_DIR = os.environ.get("CL_ARCHIVE_DIR", os.path.join("data", "archive", "cognitive_load"))
+
+# Rows per Parquet row group; files are sorted by user, so user filters skip most groups
+ROW_GROUP_SIZE = 65536
+
+# Seconds between checks for archive runs made by other processes
+ARCHIVE_CHECK_INTERVAL = float(os.environ.get("CL_ARCHIVE_CHECK_INTERVAL", "60"))
+
+# Columns of an archive file: the assessment plus the task and user attributes
+# the routes filter on, so archives are read without joins
+ARCHIVE_COLUMNS = (
+    ["id", "user_id", "task_id", "task_type", "module_id", "expertise_level"]
+    + SEQ_DIMENSIONS
+    + ["config_type", "notes", "timestamp"]
+)
+
+Partition = namedtuple("Partition", "month path row_count min_timestamp max_timestamp")
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("pyarrow is required to read or write cognitive load archives")
+
+
+def _schema() -> "pa.Schema":
+    return pa.schema(
+        [("id", pa.int64()), ("user_id", pa.int64()), ("task_id", pa.int64()), ("task_type", pa.string()),
+         ("module_id", pa.int64()), ("expertise_level", pa.string())]
+        + [(dimension, pa.int8()) for dimension in SEQ_DIMENSIONS]
+        + [("config_type", pa.string()), ("notes", pa.string()), ("timestamp", pa.timestamp("us"))]
+    )
+
+
+def naive_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    """Assessment timestamps are naive UTC; aware datetimes are converted to match"""
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def next_month(start: datetime) -> datetime:
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def hot_start(db) -> Optional[datetime]:
+    """First moment still in the database; None when nothing is archived"""
+    latest = db.query(func.max(CognitiveLoadArchivePartition.month)).scalar()
+    return next_month(datetime.strptime(latest, "%Y-%m")) if latest else None
+
+
+def list_partitions(db, since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[Partition]:
+    """Archive files holding assessments in [since, until), oldest first"""
+    model = CognitiveLoadArchivePartition
+    query = db.query(model.month, model.path, model.row_count, model.min_timestamp, model.max_timestamp)
+    if since:
+        query = query.filter(model.max_timestamp >= since)
+    if until:
+        query = query.filter(model.min_timestamp < until)
+    return [Partition(*row) for row in query.order_by(model.min_timestamp, model.id)]
+
+
+def _month_rows(db, start: datetime, end: datetime) -> List[Dict]:
+    assessment = CognitiveLoadAssessment
+    columns = [
+        assessment.id, assessment.user_id, assessment.task_id, Task.task_type, Task.module_id, User.expertise_level,
+        *[getattr(assessment, dimension) for dimension in SEQ_DIMENSIONS],
+        assessment.config_type, assessment.notes, assessment.timestamp
+    ]
+    # Outer joins: every row of the month is deleted after archiving, so none may be left out
+    query = db.query(*columns).outerjoin(
+        Task, assessment.task_id == Task.id
+    ).outerjoin(
+        User, assessment.user_id == User.id
+    ).filter(
+        assessment.timestamp >= start, assessment.timestamp < end
+    ).order_by(assessment.user_id, assessment.timestamp, assessment.id)
+    return [dict(zip(ARCHIVE_COLUMNS, row)) for row in query]
+
+
+def _write_parquet(rows: List[Dict], path: str):
+    table = pa.Table.from_pylist(rows, schema=_schema())
+    temporary = path + ".tmp"
+    pq.write_table(table, temporary, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+    os.replace(temporary, path)
+
+
+def archive_month(db, start: datetime, directory: str = ARCHIVE_DIR) -> Optional[Partition]:
+    """
+    Move the assessments of the month beginning at `start` into a Parquet file.
+
+    The file is written first; the partition row, the counter decrements
+    and the delete are then committed together, so a failure leaves the
+    rows in the database and at most an unreferenced file.
+    """
+    _require_pyarrow()
+    end = next_month(start)
+    rows = _month_rows(db, start, end)
+    if not rows:
+        return None
+
+    month = start.strftime("%Y-%m")
+    ids = [row["id"] for row in rows]
+    relative = os.path.join(f"month={month}", f"part-{min(ids)}-{max(ids)}.parquet")
+    path = os.path.join(directory, relative)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_parquet(rows, path)
+
+    timestamps = [row["timestamp"] for row in rows]
+    partition = Partition(month, relative, len(rows), min(timestamps), max(timestamps))
+    try:
+        # Dashboards describe the hot partition, so its counters lose the archived rows
+        record_assessments(db, None, rows, weight=-1)
+        record_rollups(db, None, rows, weight=-1)
+        deleted = db.query(CognitiveLoadAssessment).filter(
+            CognitiveLoadAssessment.timestamp >= start, CognitiveLoadAssessment.timestamp < end
+        ).delete(synchronize_session=False)
+        if deleted != len(rows):
+            raise RuntimeError(f"{month} changed while it was archived ({len(rows)} rows written, {deleted} deleted)")
+        db.add(CognitiveLoadArchivePartition(**partition._asdict()))
+        db.commit()
+    except Exception:
+        db.rollback()
+        os.remove(path)
+        raise
+    return partition
+
+
+def archive_before(db, before: datetime, directory: str = ARCHIVE_DIR) -> List[Partition]:
+    """Archive every month that ends on or before `before` (rounded down to a month)"""
+    cutoff = month_start(before)
+    if cutoff > month_start(datetime.utcnow()):
+        # Assessments are timestamped on insert, so only past months are complete
+        raise ValueError("Only months before the current one can be archived")
+
+    first = db.query(func.min(CognitiveLoadAssessment.timestamp)).filter(
+        CognitiveLoadAssessment.timestamp < cutoff
+    ).scalar()
+    partitions = []
+    start = month_start(first) if first else cutoff
+    while start < cutoff:
+        partition = archive_month(db, start, directory)
+        if partition:
+            partitions.append(partition)
+        start = next_month(start)
+
+    stats_engine.reset()
+    response_cache.clear()
+    return partitions
+
+
+def _read_partition(directory: str, partition: Partition, columns: Optional[Sequence[str]], filters: List[Tuple]) -> "pa.Table":
+    # memory_map: pages of the file are mapped rather than read into buffers; row
+    # groups whose statistics exclude the filters are skipped
+    return pq.read_table(
+        os.path.join(directory, partition.path),
+        columns=list(columns) if columns else None,
+        filters=filters or None,
+        memory_map=True
+    )
+
+
+def _filters(since=None, until=None, **equal) -> List[Tuple]:
+    filters = [(column, "=", value) for column, value in equal.items() if value]
+    if since:
+        filters.append(("timestamp", ">=", since))
+    if until:
+        filters.append(("timestamp", "<", until))
+    return filters
+
+
+def read_archives(
+    db,
+    columns: Optional[Sequence[str]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    directory: str = ARCHIVE_DIR,
+    **equal
+) -> "pa.Table":
+    """
+    Archived assessments in [since, until) as one Arrow table.
+
+    Keyword arguments filter on equality, e.g. task_type="qlora"; empty
+    values are ignored, as in the routes.
+    """
+    _require_pyarrow()
+    partitions = list_partitions(db, since, until)
+    if not partitions:
+        empty = _schema().empty_table()
+        return empty.select(list(columns)) if columns else empty
+    filters = _filters(since, until, **equal)
+    return pa.concat_tables([_read_partition(directory, partition, columns, filters) for partition in partitions])
+
+
+def read_user_history(db, user_id: int, columns: Sequence[str], before: Optional[Tuple[datetime, int]], limit: int,
+                      directory: str = ARCHIVE_DIR, **equal) -> List[Tuple]:
+    """
+    Up to `limit` archived assessments of a user older than the `before`
+    keyset, newest first, as tuples of `columns`.
+
+    Months are read newest first and only until the page is full.
+    """
+    until = before[0] + timedelta(microseconds=1) if before else None
+    partitions = list_partitions(db, until=until)
+    if not partitions:
+        return []
+    _require_pyarrow()
+
+    columns = list(columns)
+    selected = list(dict.fromkeys(columns + ["timestamp", "id"]))
+    filters = _filters(until=until, user_id=user_id, **equal)
+    rows = []
+    for partition in reversed(partitions):
+        table = _read_partition(directory, partition, selected, filters)
+        table = table.sort_by([("timestamp", "descending"), ("id", "descending")])
+        for row in table.to_pylist():
+            if before and (row["timestamp"], row["id"]) >= before:
+                continue
+            rows.append(tuple(row[column] for column in columns))
+        if len(rows) >= limit:
+            break
+    return rows[:limit]
+
+
+class ArchiveWatcher:
+    """
+    Notices archive runs made by other processes (the archive job is a
+    separate command) and drops the statistics and cached responses that
+    still include the archived months.
+    """
+
+    def __init__(self, interval: float = ARCHIVE_CHECK_INTERVAL):
+        self.interval = interval
+        self._checked_at = float("-inf")
+        self._latest_partition: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def due(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.interval
+
+    def check(self, db):
+        latest = db.query(func.max(CognitiveLoadArchivePartition.id)).scalar()
+        with self._lock:
+            changed = self._checked_at != float("-inf") and latest != self._latest_partition
+            self._latest_partition = latest
+            self._checked_at = time.monotonic()
+        if changed:
+            stats_engine.reset()
+            response_cache.clear()
+
+
+archive_watcher = ArchiveWatcher()
+
+
+if __name__ == "__main__":
+    # python -m app.services.cognitive_load_archive --before 2026-02 [--directory DIR]
+    from ..database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move past months of cognitive load assessments to Parquet archives")
+    parser.add_argument("--before", help="First month to keep in the database, YYYY-MM")
+    parser.add_argument("--directory", default=ARCHIVE_DIR)
+    parser.add_argument("--list", action="store_true", help="List archived partitions")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        if args.before:
+            for partition in archive_before(session, datetime.strptime(args.before, "%Y-%m"), args.directory):
+                print(f"archived {partition.month}: {partition.row_count} rows -> {partition.path}")
+        if args.list or not args.before:
+            for partition in list_partitions(session):
+                print(f"{partition.month}  {partition.row_count:>9} rows  {partition.path}")
+            print(f"hot partition starts at {hot_start(session) or 'the first assessment'}")
+    finally:
+        session.close()
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import product
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# (task_type, config_type, module_id, expertise_level); None stands for "no filter"
+FilterKey = Tuple[Optional[str], Optional[str], Optional[int], Optional[str]]
+
+
+def normalize_filters(task_type=None, config_type=None, module_id=None, expertise_level=None) -> FilterKey:
+    """Filters as the routes apply them: empty values mean no filter"""
+    return (task_type or None, config_type or None, module_id or None, expertise_level or None)
+
+
+class ResponseCache:
+    """
+    LRU cache of endpoint responses keyed by the normalized filter tuple.
+
+    Each filter tuple has a version counter. A response is stored with the
+    version read before it was computed and is served only while that
+    version is current, so an insert that lands mid-computation still
+    invalidates it. `invalidate` bumps exactly the filter tuples an
+    assessment belongs to.
+
+    The cache is per process: with several workers, an insert only
+    invalidates the worker that handled it. Entries therefore also expire
+    `ttl` seconds after they were stored, which bounds how long a worker
+    serves a response that misses another worker's inserts (None: never,
+    for a single worker).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, FilterKey], Tuple[int, float, Any]]" = OrderedDict()
+        self._versions: Dict[FilterKey, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def version(self, key: FilterKey) -> int:
+        return self._versions.get(key, 0)
+
+    def get(self, endpoint: str, key: FilterKey) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((endpoint, key))
+            if entry is None or entry[0] != self.version(key) or self._expired(entry[1]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end((endpoint, key))
+            self.hits += 1
+            return entry[2]
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and self._clock() - stored_at >= self.ttl
+
+    def put(self, endpoint: str, key: FilterKey, version: int, response: Any):
+        with self._lock:
+            if version != self.version(key):
+                # Invalidated while it was being computed
+                return
+            self._entries[(endpoint, key)] = (version, self._clock(), response)
+            self._entries.move_to_end((endpoint, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, task_type: Optional[str], config_type: Optional[str], module_id: Optional[int], expertise_level: Optional[str]):
+        """Bump every filter tuple that matches an assessment with these attributes"""
+        with self._lock:
+            for key in product((task_type, None), (config_type, None), (module_id, None), (expertise_level, None)):
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Seconds a cached response is served without seeing other workers' inserts; 0 keeps it until invalidated
+RESPONSE_CACHE_TTL = float(os.environ.get("CL_RESPONSE_CACHE_TTL", "5"))
+
+# Shared by the /class and /stats routes
+response_cache = ResponseCache(
+    max_entries=int(os.environ.get("CL_RESPONSE_CACHE_SIZE", "256")),
+    ttl=RESPONSE_CACHE_TTL or None
+)
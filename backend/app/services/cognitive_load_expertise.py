@@ -0,0 +1,45 @@
+"""
+Which expertise level an assessment counts under.
+
+Class data grouped or filtered by expertise always uses the user's
+current expertise_level. The raw-assessment queries get it by joining
+users. The class histogram buckets and the module rollup store the level
+in their keys, so whenever a user's level changes through the ORM, their
+counts are moved to the new level in the same transaction. Archived
+months keep the level each user had when the month was archived.
+"""
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..models import User
+from .cognitive_load_cache import response_cache
+from . import cognitive_load_histograms, cognitive_load_rollups
+
+_CHANGED = "cognitive_load_expertise_changed"
+
+
+@event.listens_for(Session, "before_flush")
+def move_changed_expertise(session, flush_context, instances):
+    """Re-key the counters of users whose expertise_level is about to be flushed"""
+    for user in list(session.dirty):
+        if not isinstance(user, User) or not inspect(user).attrs.expertise_level.history.has_changes():
+            continue
+        # The database still holds the level the counters were recorded under
+        old_level = session.query(User.expertise_level).filter(User.id == user.id).scalar()
+        if (old_level or "") == (user.expertise_level or ""):
+            continue
+        cognitive_load_histograms.move_user_expertise(session, user.id, old_level, user.expertise_level)
+        cognitive_load_rollups.move_user_expertise(session, user.id, old_level, user.expertise_level)
+        session.info[_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def clear_cached_class_data(session):
+    # Cached /class responses filtered by either level are stale once committed
+    if session.info.pop(_CHANGED, False):
+        response_cache.clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_rolled_back_change(session):
+    session.info.pop(_CHANGED, None)
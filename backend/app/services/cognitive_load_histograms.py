@@ -0,0 +1,183 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+
+from ..models import (
+    CognitiveLoadAssessment,
+    CognitiveLoadHistogramBucket,
+    Task,
+    User,
+    UserCognitiveLoadHistogramBucket,
+)
+from .cognitive_load_stats import SEQ_DIMENSIONS
+from .counters import increment_rows
+
+# Histogram bins: SEQ scores 1-9
+SCORES = list(range(1, 10))
+
+CLASS_KEY = ("dimension", "score", "config_type", "task_type", "module_id", "expertise_level")
+USER_KEY = ("user_id", "dimension", "score", "config_type", "task_type", "module_id")
+
+
+def _context(config_type, task_type, module_id, expertise_level=None):
+    # Missing values are stored as "" / 0 (see the bucket models)
+    return config_type or "", task_type or "", module_id or 0, expertise_level or ""
+
+
+def record_assessments(db, user, rows: Iterable[Dict], weight: int = 1):
+    """
+    Count new assessments into the histogram buckets.
+
+    `rows` are dicts with the SEQ scores, config_type, task_type and
+    module_id of assessments by `user` (with user None, each row carries
+    user_id and expertise_level). Call it in the transaction that inserts
+    the assessments so counters and rows are committed together.
+    weight=-1 removes archived assessments.
+    """
+    class_counts = Counter()
+    user_counts = Counter()
+    for row in rows:
+        user_id = user.id if user else row["user_id"]
+        config_type, task_type, module_id, expertise_level = _context(
+            row.get("config_type"), row.get("task_type"), row.get("module_id"),
+            user.expertise_level if user else row.get("expertise_level")
+        )
+        for dimension in SEQ_DIMENSIONS:
+            score = row[dimension]
+            class_counts[(dimension, score, config_type, task_type, module_id, expertise_level)] += weight
+            user_counts[(user_id, dimension, score, config_type, task_type, module_id)] += weight
+
+    increment_rows(db, CognitiveLoadHistogramBucket, CLASS_KEY, {key: {"count": n} for key, n in class_counts.items()})
+    increment_rows(db, UserCognitiveLoadHistogramBucket, USER_KEY, {key: {"count": n} for key, n in user_counts.items()})
+
+
+def move_user_expertise(db, user_id: int, old_level: Optional[str], new_level: Optional[str]):
+    """
+    Move a user's counts in the class buckets from `old_level` to
+    `new_level`, in the caller's transaction. The user's own buckets hold
+    exactly what the user added to the class buckets.
+    """
+    model = UserCognitiveLoadHistogramBucket
+    rows = db.query(model.dimension, model.score, model.config_type, model.task_type, model.module_id, model.count).filter(
+        model.user_id == user_id, model.count != 0
+    )
+    increments = {}
+    for *context, count in rows:
+        increments[tuple(context) + (old_level or "",)] = {"count": -count}
+        increments[tuple(context) + (new_level or "",)] = {"count": count}
+    increment_rows(db, CognitiveLoadHistogramBucket, CLASS_KEY, increments)
+
+
+def _filter_buckets(query, model, task_type, config_type, module_id):
+    if task_type:
+        query = query.filter(model.task_type == task_type)
+    if config_type:
+        query = query.filter(model.config_type == config_type)
+    if module_id:
+        query = query.filter(model.module_id == module_id)
+    return query
+
+
+def _empty_bins() -> Dict[str, List[int]]:
+    return {dimension: [0] * len(SCORES) for dimension in SEQ_DIMENSIONS}
+
+
+def _add_bin(bins, dimension, score, count):
+    if dimension in bins and score in SCORES:
+        bins[dimension][score - 1] += count
+
+
+def _total(bins) -> int:
+    # Every assessment adds one count to each dimension
+    return sum(bins[SEQ_DIMENSIONS[0]])
+
+
+def query_user_histogram(db, user_id: int, task_type: Optional[str] = None, config_type: Optional[str] = None, module_id: Optional[int] = None) -> Dict:
+    """Per-dimension score counts of one user, read from the bucket counters"""
+    model = UserCognitiveLoadHistogramBucket
+    query = db.query(model.dimension, model.score, func.sum(model.count)).filter(model.user_id == user_id)
+    query = _filter_buckets(query, model, task_type, config_type, module_id)
+
+    bins = _empty_bins()
+    for dimension, score, count in query.group_by(model.dimension, model.score):
+        _add_bin(bins, dimension, score, int(count))
+
+    return {
+        "labels": SCORES,
+        "total": _total(bins),
+        "dimensions": bins
+    }
+
+
+def query_class_histogram(db, task_type: Optional[str] = None, config_type: Optional[str] = None, module_id: Optional[int] = None, expertise_level: Optional[str] = None) -> Dict:
+    """Per-dimension score counts of the class, overall and per expertise level"""
+    model = CognitiveLoadHistogramBucket
+    query = db.query(model.expertise_level, model.dimension, model.score, func.sum(model.count))
+    query = _filter_buckets(query, model, task_type, config_type, module_id)
+    if expertise_level:
+        query = query.filter(model.expertise_level == expertise_level)
+
+    bins = _empty_bins()
+    by_expertise = {}
+    for level, dimension, score, count in query.group_by(model.expertise_level, model.dimension, model.score):
+        _add_bin(bins, dimension, score, int(count))
+        if level not in by_expertise:
+            by_expertise[level] = _empty_bins()
+        _add_bin(by_expertise[level], dimension, score, int(count))
+
+    return {
+        "labels": SCORES,
+        "total": _total(bins),
+        "dimensions": bins,
+        "byExpertise": {level or "unknown": level_bins for level, level_bins in by_expertise.items()}
+    }
+
+
+def backfill_histograms(db):
+    """
+    Rebuild every bucket counter from the stored assessments.
+
+    Runs as one transaction; assessments inserted while it runs may be
+    missed, so run it with submissions paused (e.g. after a deploy).
+    """
+    db.query(CognitiveLoadHistogramBucket).delete(synchronize_session=False)
+    db.query(UserCognitiveLoadHistogramBucket).delete(synchronize_session=False)
+
+    config_type = func.coalesce(CognitiveLoadAssessment.config_type, "")
+    task_type = func.coalesce(Task.task_type, "")
+    module_id = func.coalesce(Task.module_id, 0)
+    expertise_level = func.coalesce(User.expertise_level, "")
+
+    for dimension in SEQ_DIMENSIONS:
+        score = getattr(CognitiveLoadAssessment, dimension)
+        count = func.count(CognitiveLoadAssessment.id)
+
+        class_rows = db.query(score, config_type, task_type, module_id, expertise_level, count).join(
+            Task, CognitiveLoadAssessment.task_id == Task.id
+        ).join(
+            User, CognitiveLoadAssessment.user_id == User.id
+        ).group_by(score, config_type, task_type, module_id, expertise_level)
+        db.bulk_insert_mappings(CognitiveLoadHistogramBucket, [
+            dict(zip(CLASS_KEY, (dimension,) + tuple(row[:-1])), count=row[-1]) for row in class_rows
+        ])
+
+        user_rows = db.query(CognitiveLoadAssessment.user_id, score, config_type, task_type, module_id, count).join(
+            Task, CognitiveLoadAssessment.task_id == Task.id
+        ).group_by(CognitiveLoadAssessment.user_id, score, config_type, task_type, module_id)
+        db.bulk_insert_mappings(UserCognitiveLoadHistogramBucket, [
+            dict(zip(USER_KEY, (row[0], dimension) + tuple(row[1:-1])), count=row[-1]) for row in user_rows
+        ])
+
+    db.commit()
+
+
+if __name__ == "__main__":
+    # Backfill job: python -m app.services.cognitive_load_histograms
+    from ..database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        backfill_histograms(session)
+    finally:
+        session.close()
@@ -0,0 +1,220 @@
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, func
+
+from ..models import (
+    CognitiveLoadAssessment,
+    ModuleExpertiseCognitiveLoadRollup,
+    StudentModuleCognitiveLoadRollup,
+    Task,
+    User,
+)
+from .cognitive_load_stats import OVERLOAD_THRESHOLD, SEQ_DIMENSIONS
+from .counters import increment_rows
+
+MEASURES = ["count"] + [f"{dimension}_sum" for dimension in SEQ_DIMENSIONS] + ["effort_squared_sum", "overload_count"]
+
+STUDENT_KEY = ("user_id", "module_id", "config_type")
+MODULE_KEY = ("module_id", "expertise_level", "config_type")
+
+
+def _measures(scores: Dict) -> Dict[str, int]:
+    """Rollup increments for one assessment"""
+    measures = {"count": 1}
+    for dimension in SEQ_DIMENSIONS:
+        measures[f"{dimension}_sum"] = scores[dimension]
+    measures["effort_squared_sum"] = scores["effort"] ** 2
+    measures["overload_count"] = int(scores["effort"] >= OVERLOAD_THRESHOLD)
+    return measures
+
+
+def _raw_measures():
+    """The same measures as SQL aggregates over raw assessments"""
+    effort = CognitiveLoadAssessment.effort
+    return [
+        func.count(CognitiveLoadAssessment.id),
+        *[func.sum(getattr(CognitiveLoadAssessment, dimension)) for dimension in SEQ_DIMENSIONS],
+        func.sum(effort * effort),
+        func.sum(case((effort >= OVERLOAD_THRESHOLD, 1), else_=0))
+    ]
+
+
+def record_rollups(db, user, rows: Iterable[Dict], weight: int = 1):
+    """
+    Add new assessments to both rollups, in the caller's transaction.
+
+    `rows` are dicts with the SEQ scores, config_type and module_id of
+    assessments by `user` (with user None, each row carries user_id and
+    expertise_level). weight=-1 removes archived assessments.
+    """
+    student = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    module = defaultdict(lambda: dict.fromkeys(MEASURES, 0))
+    for row in rows:
+        user_id = user.id if user else row["user_id"]
+        expertise_level = (user.expertise_level if user else row.get("expertise_level")) or ""
+        config_type = row.get("config_type") or ""
+        module_id = row.get("module_id") or 0
+        for measure, amount in _measures(row).items():
+            student[(user_id, module_id, config_type)][measure] += amount * weight
+            module[(module_id, expertise_level, config_type)][measure] += amount * weight
+
+    increment_rows(db, StudentModuleCognitiveLoadRollup, STUDENT_KEY, student)
+    increment_rows(db, ModuleExpertiseCognitiveLoadRollup, MODULE_KEY, module)
+
+
+def move_user_expertise(db, user_id: int, old_level: Optional[str], new_level: Optional[str]):
+    """
+    Move a user's share of the module rollup from `old_level` to
+    `new_level`, in the caller's transaction. The user's student rollup rows
+    hold exactly what the user added to the module rollup.
+    """
+    model = StudentModuleCognitiveLoadRollup
+    rows = db.query(model.module_id, model.config_type, *[getattr(model, measure) for measure in MEASURES]).filter(
+        model.user_id == user_id, model.count != 0
+    )
+    increments = {}
+    for module_id, config_type, *sums in rows:
+        measures = dict(zip(MEASURES, sums))
+        increments[(module_id, old_level or "", config_type)] = {measure: -value for measure, value in measures.items()}
+        increments[(module_id, new_level or "", config_type)] = measures
+    increment_rows(db, ModuleExpertiseCognitiveLoadRollup, MODULE_KEY, increments)
+
+
+def _raw_student_rows(db):
+    module_id = func.coalesce(Task.module_id, 0)
+    config_type = func.coalesce(CognitiveLoadAssessment.config_type, "")
+    return db.query(CognitiveLoadAssessment.user_id, module_id, config_type, *_raw_measures()).join(
+        Task, CognitiveLoadAssessment.task_id == Task.id
+    ).group_by(CognitiveLoadAssessment.user_id, module_id, config_type)
+
+
+def _raw_module_rows(db):
+    module_id = func.coalesce(Task.module_id, 0)
+    expertise_level = func.coalesce(User.expertise_level, "")
+    config_type = func.coalesce(CognitiveLoadAssessment.config_type, "")
+    return db.query(module_id, expertise_level, config_type, *_raw_measures()).join(
+        Task, CognitiveLoadAssessment.task_id == Task.id
+    ).join(
+        User, CognitiveLoadAssessment.user_id == User.id
+    ).group_by(module_id, expertise_level, config_type)
+
+
+def _rollup_sources(db):
+    return [
+        (StudentModuleCognitiveLoadRollup, STUDENT_KEY, _raw_student_rows(db)),
+        (ModuleExpertiseCognitiveLoadRollup, MODULE_KEY, _raw_module_rows(db)),
+    ]
+
+
+def rebuild_rollups(db):
+    """
+    Recompute both rollups from the raw assessments in one transaction.
+
+    Assessments inserted while it runs may be missed, so run it with
+    submissions paused.
+    """
+    for model, key_columns, raw_rows in _rollup_sources(db):
+        db.query(model).delete(synchronize_session=False)
+        width = len(key_columns)
+        db.bulk_insert_mappings(model, [
+            dict(zip(key_columns, row[:width]), **dict(zip(MEASURES, [value or 0 for value in row[width:]])))
+            for row in raw_rows
+        ])
+    db.commit()
+
+
+def check_rollups(db) -> List[Dict]:
+    """Compare both rollups with raw aggregates; returns one entry per mismatching row"""
+    mismatches = []
+    for model, key_columns, raw_rows in _rollup_sources(db):
+        width = len(key_columns)
+        expected = {tuple(row[:width]): [value or 0 for value in row[width:]] for row in raw_rows}
+        columns = [getattr(model, column) for column in key_columns + tuple(MEASURES)]
+        actual = {
+            tuple(row[:width]): list(row[width:])
+            for row in db.query(*columns)
+            if row[width]  # rows left at zero count
+        }
+        for key in expected.keys() | actual.keys():
+            if expected.get(key) != actual.get(key):
+                mismatches.append({
+                    "table": model.__tablename__,
+                    "key": dict(zip(key_columns, key)),
+                    "expected": dict(zip(MEASURES, expected.get(key) or [0] * len(MEASURES))),
+                    "actual": dict(zip(MEASURES, actual.get(key) or [0] * len(MEASURES)))
+                })
+    return mismatches
+
+
+def _sum_measures(query, model):
+    return query.with_entities(*[func.sum(getattr(model, measure)) for measure in MEASURES]).one()
+
+
+def _aggregates(sums) -> Dict:
+    """Rollup sums in the shape of routes.cognitive_load.query_class_aggregates"""
+    totals = dict(zip(MEASURES, [value or 0 for value in sums]))
+    count = totals["count"]
+    return {
+        "count": count,
+        "averages": {
+            dimension: totals[f"{dimension}_sum"] / count if count else 0.0
+            for dimension in SEQ_DIMENSIONS
+        },
+        "effort_squared_mean": totals["effort_squared_sum"] / count if count else 0.0,
+        "overload_count": totals["overload_count"]
+    }
+
+
+def query_module_rollup_aggregates(db, config_type: Optional[str] = None, module_id: Optional[int] = None, expertise_level: Optional[str] = None) -> Dict:
+    """Class aggregates from the module x expertise x config_type rollup"""
+    model = ModuleExpertiseCognitiveLoadRollup
+    query = db.query(model)
+    if config_type:
+        query = query.filter(model.config_type == config_type)
+    if module_id:
+        query = query.filter(model.module_id == module_id)
+    if expertise_level:
+        query = query.filter(model.expertise_level == expertise_level)
+    return _aggregates(_sum_measures(query, model))
+
+
+def query_student_rollups(db, config_type: Optional[str] = None, module_id: Optional[int] = None) -> List[Dict]:
+    """Per-student averages from the student x module x config_type rollup"""
+    model = StudentModuleCognitiveLoadRollup
+    query = db.query(model.user_id, *[func.sum(getattr(model, measure)) for measure in MEASURES])
+    if config_type:
+        query = query.filter(model.config_type == config_type)
+    if module_id:
+        query = query.filter(model.module_id == module_id)
+
+    students = []
+    for user_id, *sums in query.group_by(model.user_id).order_by(model.user_id):
+        aggregates = _aggregates(sums)
+        if not aggregates["count"]:
+            continue
+        students.append({
+            "userId": user_id,
+            "count": aggregates["count"],
+            "radarData": [round(aggregates["averages"][dimension], 1) for dimension in SEQ_DIMENSIONS],
+            "overload": round(aggregates["overload_count"] / aggregates["count"] * 100)
+        })
+    return students
+
+
+if __name__ == "__main__":
+    # python -m app.services.cognitive_load_rollups [--rebuild]
+    from ..database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        if "--rebuild" in sys.argv:
+            rebuild_rollups(session)
+        problems = check_rollups(session)
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} rollup rows differ from the raw aggregates")
+        sys.exit(1 if problems else 0)
+    finally:
+        session.close()
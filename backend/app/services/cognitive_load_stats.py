@@ -0,0 +1,231 @@
+import threading
+from itertools import product
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import func
+
+from ..models import CognitiveLoadAssessment, Task
+
+# SEQ dimensions in radar chart order
+SEQ_DIMENSIONS = ["complexity", "usability", "effort", "confidence", "frustration", "germane", "transfer"]
+
+# Effort score from which a student is considered overloaded
+OVERLOAD_THRESHOLD = 7
+
+# Reported quantiles
+QUANTILES = {"p25": 0.25, "median": 0.5, "p75": 0.75, "p90": 0.9}
+
+# Stands for "any value" in a key; distinct from None, which is a NULL column
+ANY = object()
+
+# (task_type, config_type, module_id), each possibly ANY
+StatsKey = Tuple[object, object, object]
+
+
+class RunningStats:
+    """
+    Streaming summary of one SEQ dimension.
+
+    Mean and variance use Welford's algorithm (weighted, so a score seen
+    `weight` times is one update). Quantiles come from the count of each
+    score: on the 1-9 SEQ scale this nine-counter sketch is exact and
+    smaller than a t-digest or KLL sketch would be.
+    """
+
+    __slots__ = ("count", "mean", "m2", "counts")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.counts: Dict[int, int] = {}
+
+    def add(self, value: int, weight: int = 1):
+        self.count += weight
+        delta = value - self.mean
+        self.mean += delta * weight / self.count
+        self.m2 += weight * delta * (value - self.mean)
+        self.counts[value] = self.counts.get(value, 0) + weight
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    def _value_at(self, rank: int) -> int:
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if rank < seen:
+                return value
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation between order statistics (as numpy's default)."""
+        if not self.count:
+            return 0
+        position = q * (self.count - 1)
+        lower_rank = int(position)
+        lower = self._value_at(lower_rank)
+        upper = self._value_at(min(lower_rank + 1, self.count - 1))
+        return lower + (upper - lower) * (position - lower_rank)
+
+    def at_least(self, threshold: int) -> int:
+        return sum(count for value, count in self.counts.items() if value >= threshold)
+
+    def to_dict(self) -> Dict[str, float]:
+        summary = {
+            "count": self.count,
+            "mean": round(self.mean, 2),
+            "variance": round(self.variance, 2),
+            "stdDev": round(self.variance ** 0.5, 2),
+        }
+        for name, q in QUANTILES.items():
+            summary[name] = self.quantile(q)
+        return summary
+
+
+class CognitiveLoadStatsEngine:
+    """
+    Incrementally maintained statistics per (task_type, config_type, module_id).
+
+    Every assessment updates the 8 generalizations of its key (each filter
+    either set or ANY), so any combination of /stats filters is one
+    dictionary lookup, independent of the number of assessments.
+
+    The engine is loaded from the database on first use, counting the rows
+    up to a high-water mark (the largest assessment id), and kept current by
+    the insert paths, which skip rows at or below the mark. Each worker
+    process keeps its own copy; catch_up, called by /stats, counts the rows
+    above the mark that other workers inserted, with one range query on the
+    primary key. Ids are assumed to be allocated in commit order (true on
+    SQLite); elsewhere, a row whose transaction commits after a larger id
+    was counted is missed until the engine is reset.
+    """
+
+    def __init__(self):
+        self._stats: Dict[StatsKey, Dict[str, RunningStats]] = {}
+        self._loaded = False
+        self._high_water = 0  # Largest assessment id counted by the load or a catch-up
+        self._added: Set[int] = set()  # Ids above the mark already counted by add_assessment
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _generalizations(task_type, config_type, module_id):
+        return product((task_type, ANY), (config_type, ANY), (module_id, ANY))
+
+    def _add(self, key_values, scores: Dict[str, int], weight: int = 1, dimensions=SEQ_DIMENSIONS):
+        for key in self._generalizations(*key_values):
+            entry = self._stats.get(key)
+            if entry is None:
+                entry = self._stats[key] = {dimension: RunningStats() for dimension in SEQ_DIMENSIONS}
+            for dimension in dimensions:
+                entry[dimension].add(scores[dimension], weight)
+
+    def add_assessment(self, assessment_id: int, task_type: Optional[str], config_type: Optional[str], module_id: Optional[int], scores: Dict[str, int]):
+        """
+        Account for a newly committed assessment. No-op until the engine is
+        loaded, and for rows the load or a catch-up already counted.
+        """
+        with self._lock:
+            if not self._loaded or assessment_id <= self._high_water or assessment_id in self._added:
+                return
+            self._added.add(assessment_id)
+            self._add((task_type, config_type, module_id), scores)
+
+    def ensure_loaded(self, db):
+        """Build the statistics from the database, once per process."""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._stats = {}
+            self._added = set()
+            # All seven queries count the same rows, whatever is inserted meanwhile
+            self._high_water = db.query(func.max(CognitiveLoadAssessment.id)).scalar() or 0
+            for dimension in SEQ_DIMENSIONS:
+                score = getattr(CognitiveLoadAssessment, dimension)
+                rows = db.query(
+                    Task.task_type,
+                    CognitiveLoadAssessment.config_type,
+                    Task.module_id,
+                    score,
+                    func.count(CognitiveLoadAssessment.id)
+                ).join(Task).filter(
+                    CognitiveLoadAssessment.id <= self._high_water
+                ).group_by(
+                    Task.task_type, CognitiveLoadAssessment.config_type, Task.module_id, score
+                ).all()
+                for task_type, config_type, module_id, value, count in rows:
+                    self._add((task_type, config_type, module_id), {dimension: value}, count, [dimension])
+            self._loaded = True
+
+    def catch_up(self, db):
+        """Count the assessments committed above the high-water mark, by any process (no-op until loaded)."""
+        if not self._loaded:
+            return
+        with self._lock:
+            if not self._loaded:
+                return
+            rows = db.query(
+                CognitiveLoadAssessment.id,
+                Task.task_type,
+                CognitiveLoadAssessment.config_type,
+                Task.module_id,
+                *[getattr(CognitiveLoadAssessment, dimension) for dimension in SEQ_DIMENSIONS]
+            ).join(Task).filter(
+                CognitiveLoadAssessment.id > self._high_water
+            ).order_by(CognitiveLoadAssessment.id).all()
+            for assessment_id, task_type, config_type, module_id, *scores in rows:
+                if assessment_id not in self._added:
+                    self._add((task_type, config_type, module_id), dict(zip(SEQ_DIMENSIONS, scores)))
+                self._high_water = assessment_id
+            self._added = {assessment_id for assessment_id in self._added if assessment_id > self._high_water}
+
+    def sync(self, db):
+        """Load the statistics if needed, then catch up with inserts made since."""
+        self.ensure_loaded(db)
+        self.catch_up(db)
+
+    def get(self, task_type: Optional[str] = None, config_type: Optional[str] = None, module_id: Optional[int] = None) -> Optional[Dict[str, RunningStats]]:
+        # Unset filters (None or empty, as in the routes) match any value
+        return self._stats.get((task_type or ANY, config_type or ANY, module_id or ANY))
+
+    def summary(self, task_type: Optional[str] = None, config_type: Optional[str] = None, module_id: Optional[int] = None) -> Dict:
+        """Statistics for all SEQ dimensions plus the effort overload ratio."""
+        with self._lock:
+            entry = self.get(task_type, config_type, module_id)
+            if entry is None or not entry["effort"].count:
+                return {
+                    "mean": 0,
+                    "median": 0,
+                    "stdDev": 0,
+                    "overload": 0,
+                    "overloadRatio": 0,
+                    "count": 0,
+                    "dimensions": {}
+                }
+            dimensions = {dimension: stats.to_dict() for dimension, stats in entry.items()}
+            effort = entry["effort"]
+            overload_ratio = effort.at_least(OVERLOAD_THRESHOLD) / effort.count
+
+        return {
+            # Effort summary, as returned by the basic statistics
+            "mean": dimensions["effort"]["mean"],
+            "median": dimensions["effort"]["median"],
+            "stdDev": dimensions["effort"]["stdDev"],
+            "overload": round(overload_ratio * 100),
+            "overloadRatio": round(overload_ratio, 4),
+            "count": effort.count,
+            "dimensions": dimensions
+        }
+
+    def reset(self):
+        """Drop everything; the next request reloads from the database."""
+        with self._lock:
+            self._stats = {}
+            self._loaded = False
+            self._high_water = 0
+            self._added = set()
+
+# Global engine shared by the cognitive load routes
+stats_engine = CognitiveLoadStatsEngine()
@@ -0,0 +1,56 @@
+from typing import Dict, Sequence, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+# Counter rows per upsert statement (keeps SQLite under its bound-parameter limit)
+UPSERT_BATCH = 500
+
+
+def increment_rows(db, model, key_columns: Sequence[str], increments: Dict[Tuple, Dict[str, int]]):
+    """
+    Add `increments` ({key tuple: {column: amount}}) to counter rows of `model`.
+
+    Rows are identified by `key_columns`, which must carry a unique
+    constraint (see app.migrations.add_cognitive_load_counters); missing
+    rows are created. On PostgreSQL and SQLite this is one INSERT ... ON
+    CONFLICT DO UPDATE per UPSERT_BATCH keys. Runs in the caller's transaction.
+    """
+    if not increments:
+        return
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        _increment_each(db, model, key_columns, increments)
+        return
+
+    table = model.__table__
+    amount_columns = sorted({column for amounts in increments.values() for column in amounts})
+    rows = [
+        dict(zip(key_columns, key), **{column: amounts.get(column, 0) for column in amount_columns})
+        for key, amounts in increments.items()
+    ]
+    for start in range(0, len(rows), UPSERT_BATCH):
+        statement = insert(table).values(rows[start:start + UPSERT_BATCH])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: table.c[column] + statement.excluded[column] for column in amount_columns}
+        ))
+
+
+def _increment_each(db, model, key_columns: Sequence[str], increments: Dict[Tuple, Dict[str, int]]):
+    # Other dialects: UPDATE, then INSERT in a savepoint when no row matched
+    for key, amounts in increments.items():
+        values = dict(zip(key_columns, key))
+        rows = db.query(model).filter_by(**values)
+        update = {getattr(model, column): getattr(model, column) + amount for column, amount in amounts.items()}
+        if rows.update(update, synchronize_session=False):
+            continue
+        try:
+            with db.begin_nested():
+                db.add(model(**values, **amounts))
+        except IntegrityError:
+            # Created concurrently by another request
+            rows.update(update, synchronize_session=False)
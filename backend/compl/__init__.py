@@ -0,0 +1,34 @@
+# Computational load (CompL) metrics collection for the dashboard API
+from .sampler import RingBuffer, MetricsSampler
+from .timeseries import MultiResolutionStore
+from .stream import MetricsBroadcaster, compute_delta
+from .probes import (
+    GPUProbe,
+    NVMLProbe,
+    GPUtilProbe,
+    SysfsProbe,
+    FakeGPUProbe,
+    CachedProbe,
+    select_gpu_probe,
+    read_ram
+)
+from .tasks import TaskConflict, TaskRegistry, task_registry
+
+__all__ = [
+    'RingBuffer',
+    'MetricsSampler',
+    'MultiResolutionStore',
+    'MetricsBroadcaster',
+    'compute_delta',
+    'GPUProbe',
+    'NVMLProbe',
+    'GPUtilProbe',
+    'SysfsProbe',
+    'FakeGPUProbe',
+    'CachedProbe',
+    'select_gpu_probe',
+    'read_ram',
+    'TaskConflict',
+    'TaskRegistry',
+    'task_registry',
+]
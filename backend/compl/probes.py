@@ -0,0 +1,193 @@
+import asyncio
+import glob
+import logging
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Readings are dicts with VRAM in bytes and GPU load in percent:
+# {"total": int, "used": int, "usage": float}; None means no GPU.
+NO_GPU = {"total": 0, "used": 0, "usage": 0.0}
+
+
+class GPUProbe:
+    """Base class for GPU backends. `read` is blocking."""
+
+    name = "none"
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        return None
+
+
+class NVMLProbe(GPUProbe):
+    """Reads the first NVIDIA GPU through NVML, without spawning nvidia-smi."""
+
+    name = "nvml"
+
+    def __init__(self, index: int = 0):
+        import pynvml
+        pynvml.nvmlInit()
+        self._nvml = pynvml
+        self._handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        memory = self._nvml.nvmlDeviceGetMemoryInfo(self._handle)
+        utilization = self._nvml.nvmlDeviceGetUtilizationRates(self._handle)
+        return {
+            "total": int(memory.total),
+            "used": int(memory.used),
+            "usage": float(utilization.gpu)
+        }
+
+
+class GPUtilProbe(GPUProbe):
+    """Reads the first GPU through GPUtil (one nvidia-smi subprocess per read)."""
+
+    name = "gputil"
+
+    def __init__(self):
+        import GPUtil
+        self._gputil = GPUtil
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        gpus = self._gputil.getGPUs()
+        if not gpus:
+            return None
+        return {
+            "total": int(gpus[0].memoryTotal * 1024 * 1024),  # MB to bytes
+            "used": int(gpus[0].memoryUsed * 1024 * 1024),
+            "usage": gpus[0].load * 100  # fraction to percent
+        }
+
+
+class SysfsProbe(GPUProbe):
+    """Reads amdgpu counters from /sys/class/drm (AMD GPUs on Linux)."""
+
+    name = "sysfs"
+
+    def __init__(self, device_dir: Optional[str] = None):
+        if device_dir is None:
+            candidates = sorted(glob.glob("/sys/class/drm/card*/device/mem_info_vram_total"))
+            if not candidates:
+                raise RuntimeError("No GPU exposes VRAM counters in sysfs")
+            device_dir = os.path.dirname(candidates[0])
+        self.device_dir = device_dir
+
+    def _read_int(self, name: str) -> int:
+        with open(os.path.join(self.device_dir, name)) as f:
+            return int(f.read().strip())
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        try:
+            usage = float(self._read_int("gpu_busy_percent"))
+        except OSError:
+            usage = 0.0
+        return {
+            "total": self._read_int("mem_info_vram_total"),
+            "used": self._read_int("mem_info_vram_used"),
+            "usage": usage
+        }
+
+
+class FakeGPUProbe(GPUProbe):
+    """Deterministic probe for tests and benchmarks; `delay` simulates probe cost."""
+
+    name = "fake"
+
+    def __init__(self, total: int = 8 * 1024**3, used: int = 2 * 1024**3, usage: float = 25.0, delay: float = 0.0):
+        self.reading = {"total": total, "used": used, "usage": usage}
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        return dict(self.reading)
+
+
+GPU_PROBES = {
+    "nvml": NVMLProbe,
+    "gputil": GPUtilProbe,
+    "sysfs": SysfsProbe,
+    "fake": FakeGPUProbe,
+}
+
+
+def select_gpu_probe(name: Optional[str] = None) -> GPUProbe:
+    """
+    Instantiate the GPU backend named `name` (or $COMPL_GPU_PROBE).
+
+    With "auto" (the default), NVML, GPUtil and sysfs are tried in that
+    order and the first one available is used. An unknown name is logged
+    and treated as "auto", so a typo in the environment does not stop the
+    app from starting.
+    """
+    name = (name or os.environ.get("COMPL_GPU_PROBE", "auto")).lower()
+    if name == "none":
+        return GPUProbe()
+    if name in GPU_PROBES:
+        return GPU_PROBES[name]()
+    if name != "auto":
+        valid = ", ".join(["auto", "none"] + sorted(GPU_PROBES))
+        logger.warning(f"Unknown GPU probe backend {name!r} (valid: {valid}); falling back to auto")
+    for candidate in ("nvml", "gputil", "sysfs"):
+        try:
+            probe = GPU_PROBES[candidate]()
+            logger.info(f"Using GPU probe backend: {candidate}")
+            return probe
+        except Exception:
+            continue
+    return GPUProbe()
+
+
+def read_ram() -> Dict[str, int]:
+    ram_info = psutil.virtual_memory()
+    return {"total": ram_info.total, "used": ram_info.used}
+
+
+class CachedProbe:
+    """
+    TTL cache with single-flight refresh around a blocking probe.
+
+    The probe runs in a worker thread, so the event loop is never blocked.
+    While a refresh is in flight, every caller awaits that same refresh
+    instead of starting its own. Errors are not cached.
+    """
+
+    def __init__(self, probe: Callable[[], Any], ttl: float):
+        self.probe = probe
+        self.ttl = ttl
+        self._value: Any = None
+        self._fetched_at: Optional[float] = None
+        self._inflight: Optional[Awaitable[Any]] = None
+
+    def _is_fresh(self) -> bool:
+        return self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    async def get(self) -> Any:
+        if self._is_fresh():
+            return self._value
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._refresh())
+        # Shield so a cancelled caller does not cancel the shared refresh
+        return await asyncio.shield(self._inflight)
+
+    async def _refresh(self) -> Any:
+        try:
+            value = await asyncio.to_thread(self.probe)
+            self._value = value
+            self._fetched_at = time.monotonic()
+            return value
+        finally:
+            self._inflight = None
+
+    def invalidate(self):
+        self._fetched_at = None
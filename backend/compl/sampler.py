@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RingBuffer:
+    """Fixed-size circular buffer that keeps the most recent samples."""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._items: List[Any] = [None] * capacity
+        self._next = 0
+        self._count = 0
+
+    def append(self, item: Any):
+        """Store an item, overwriting the oldest one when the buffer is full."""
+        self._items[self._next] = item
+        self._next = (self._next + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def latest(self) -> Optional[Any]:
+        """Return the most recent item, or None if the buffer is empty."""
+        if self._count == 0:
+            return None
+        return self._items[(self._next - 1) % self.capacity]
+
+    def items(self) -> List[Any]:
+        """Return the stored items ordered from oldest to newest."""
+        if self._count < self.capacity:
+            return self._items[:self._count]
+        return self._items[self._next:] + self._items[:self._next]
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class MetricsSampler:
+    """
+    Background task that reads system metrics at a fixed interval.
+
+    Readings are kept in a ring buffer and the dashboard payload is rebuilt
+    once per tick, so serving it to any number of clients costs nothing.
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], Dict[str, Any]],
+        interval: float = 1.0,
+        capacity: int = 20
+    ):
+        """
+        Args:
+            probe: Function returning a dict of current readings; blocking
+                functions run in a worker thread, coroutine functions are awaited
+            interval: Seconds between two samples
+            capacity: Number of samples kept for the time series
+        """
+        self.probe = probe
+        self.interval = interval
+        self.buffer = RingBuffer(capacity)
+        self._payload: Dict[str, Any] = {"current": {}, "timeSeries": []}
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def add_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """Register a callback invoked with every new sample."""
+        self._listeners.append(callback)
+
+    async def start(self):
+        """Take a first sample and start the sampling loop."""
+        if self._task is not None:
+            return
+        await self.sample_once()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the sampling loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def sample_once(self) -> Dict[str, Any]:
+        """Read the probe off the event loop and record the result."""
+        start_time = time.perf_counter()
+        if asyncio.iscoroutinefunction(self.probe):
+            metrics = await self.probe()
+        else:
+            metrics = await asyncio.to_thread(self.probe)
+        # Time spent collecting the readings, in ms
+        metrics["execution_time"] = (time.perf_counter() - start_time) * 1000
+        self.record(metrics)
+        return metrics
+
+    def record(self, metrics: Dict[str, Any]):
+        """Append a sample and rebuild the cached payload."""
+        self.buffer.append(metrics)
+        time_series = []
+        for i, sample in enumerate(self.buffer.items()):
+            time_series.append({
+                "time": i,
+                "vramUsage": sample.get("vram_used", 0),
+                "cpuUsage": sample.get("cpu_usage", 0),
+                "executionTime": sample.get("execution_time", 0)
+            })
+        self._payload = {
+            "current": metrics,
+            "timeSeries": time_series
+        }
+        for callback in self._listeners:
+            try:
+                callback(metrics)
+            except Exception as e:
+                logger.error(f"Error in metrics listener: {e}")
+
+    def payload(self) -> Dict[str, Any]:
+        """Return the latest `current`/`timeSeries` payload."""
+        return self._payload
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time() + self.interval
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            next_tick += self.interval
+            if next_tick < loop.time():
+                # Skip missed ticks instead of sampling in a burst
+                next_tick = loop.time() + self.interval
+            try:
+                await self.sample_once()
+            except Exception as e:
+                logger.error(f"Error sampling system metrics: {e}")
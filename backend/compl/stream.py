@@ -0,0 +1,175 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from .sampler import MetricsSampler
+
+logger = logging.getLogger(__name__)
+
+# Bounds for the per-client update interval, in seconds
+MIN_STREAM_INTERVAL = 0.1
+MAX_STREAM_INTERVAL = 60.0
+
+
+def compute_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Tuple[Dict[str, Any], List[List[str]]]:
+    """
+    Return the fields of `current` that differ from `previous`.
+
+    Nested dicts are diffed recursively, so `changed` only contains the
+    modified leaves. `removed` lists the key paths that no longer exist.
+    """
+    changed: Dict[str, Any] = {}
+    removed: List[List[str]] = []
+    for key, value in current.items():
+        if key not in previous:
+            changed[key] = value
+        elif isinstance(value, dict) and isinstance(previous[key], dict):
+            sub_changed, sub_removed = compute_delta(previous[key], value)
+            if sub_changed:
+                changed[key] = sub_changed
+            removed.extend([key] + path for path in sub_removed)
+        elif value != previous[key]:
+            changed[key] = value
+    for key in previous:
+        if key not in current:
+            removed.append([key])
+    return changed, removed
+
+
+def clamp_interval(interval: float) -> float:
+    return min(max(interval, MIN_STREAM_INTERVAL), MAX_STREAM_INTERVAL)
+
+
+class MetricsBroadcaster:
+    """
+    Fans one stream of metric snapshots out to any number of clients.
+
+    Each client gets a full snapshot on connect and then, at its own rate,
+    only the fields that changed since the last message it received. Deltas
+    are cached per (from, to) version so clients in step share the work.
+    When built around a sampler it owns, the sampler only runs while at
+    least one client is connected.
+    """
+
+    def __init__(self, sampler: Optional[MetricsSampler] = None, owns_sampler: bool = False):
+        self.sampler = sampler
+        self.owns_sampler = owns_sampler
+        self._snapshot: Dict[str, Any] = {}
+        self._version = 0
+        self._changed = asyncio.Event()
+        self._delta_cache: Dict[int, str] = {}
+        self._clients = 0
+        if sampler is not None:
+            sampler.add_listener(self.publish)
+
+    @property
+    def client_count(self) -> int:
+        return self._clients
+
+    def publish(self, snapshot: Dict[str, Any]):
+        """Make `snapshot` the current state and wake up waiting clients."""
+        self._snapshot = dict(snapshot)
+        self._version += 1
+        self._delta_cache = {}
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _snapshot_message(self) -> str:
+        return json.dumps({"type": "snapshot", "seq": self._version, "data": self._snapshot})
+
+    def _delta_message(self, since_version: int, since_snapshot: Dict[str, Any]) -> Optional[str]:
+        if since_version not in self._delta_cache:
+            changed, removed = compute_delta(since_snapshot, self._snapshot)
+            message = None
+            if changed or removed:
+                message = json.dumps({
+                    "type": "delta",
+                    "seq": self._version,
+                    "since": since_version,
+                    "changed": changed,
+                    "removed": removed
+                })
+            self._delta_cache[since_version] = message
+        return self._delta_cache[since_version]
+
+    async def _acquire(self):
+        self._clients += 1
+        if self.owns_sampler and self._clients == 1:
+            await self.sampler.start()
+
+    async def _release(self):
+        self._clients -= 1
+        if self.owns_sampler and self._clients == 0:
+            await self.sampler.stop()
+
+    async def messages(self, rate: "StreamRate") -> AsyncIterator[Tuple[str, str]]:
+        """
+        Yield `(event, message)` pairs: a snapshot first, then deltas no more
+        often than `rate.interval`.
+        """
+        await self._acquire()
+        try:
+            if self._version == 0:
+                await self._changed.wait()
+            sent_version, sent_snapshot = self._version, self._snapshot
+            yield "snapshot", self._snapshot_message()
+            while True:
+                await asyncio.sleep(rate.interval)
+                if self._version == sent_version:
+                    await self._changed.wait()
+                message = self._delta_message(sent_version, sent_snapshot)
+                sent_version, sent_snapshot = self._version, self._snapshot
+                if message is not None:
+                    yield "delta", message
+        finally:
+            await self._release()
+
+    async def serve_websocket(self, websocket: WebSocket, interval: float):
+        """
+        Stream to an accepted WebSocket until it disconnects.
+
+        The client may change its rate at any time by sending
+        `{"interval": <seconds>}`.
+        """
+        rate = StreamRate(interval)
+
+        async def read_commands():
+            while True:
+                data = await websocket.receive_text()
+                try:
+                    command = json.loads(data)
+                    if "interval" in command:
+                        rate.interval = clamp_interval(float(command["interval"]))
+                except (ValueError, TypeError, AttributeError) as e:
+                    logger.warning(f"Invalid metrics stream command: {e}")
+
+        async def write_messages():
+            async for _, message in self.messages(rate):
+                await websocket.send_text(message)
+
+        tasks = {asyncio.create_task(read_commands()), asyncio.create_task(write_messages())}
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is not None and not isinstance(error, WebSocketDisconnect):
+                    logger.error(f"Metrics stream closed with error: {error}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def sse_events(self, interval: float) -> AsyncIterator[str]:
+        """Server-Sent Events framing of the stream."""
+        async for event, message in self.messages(StreamRate(interval)):
+            yield f"event: {event}\ndata: {message}\n\n"
+
+
+class StreamRate:
+    """Per-client update interval, adjustable while streaming."""
+
+    def __init__(self, interval: float):
+        self.interval = clamp_interval(interval)
@@ -0,0 +1,142 @@
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Weight of the newest throughput observation in the moving averages
+DEFAULT_EWMA_ALPHA = 0.3
+
+
+class TaskConflict(ValueError):
+    """start_task was given the id of a task that is still registered."""
+
+
+class _Task:
+    def __init__(self, task_id: str, task_type: str, quantization: str, total_units: float, now: float):
+        self.task_id = task_id
+        self.task_type = task_type
+        self.quantization = quantization
+        self.total_units = total_units
+        self.completed_units = 0.0
+        self.started_at = now
+        self.updated_at = now
+        self.throughput: Optional[float] = None  # units per second, EWMA
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.task_type, self.quantization
+
+    @property
+    def remaining_units(self) -> float:
+        return max(self.total_units - self.completed_units, 0.0)
+
+
+class TaskRegistry:
+    """
+    Registry of running generations and fine-tuning jobs.
+
+    Tasks report progress in their own units (tokens produced, steps
+    completed). Each report updates an EWMA of the task's throughput and of
+    the throughput of its (task_type, quantization) class, so new tasks get
+    an estimate before their first report. The aggregate ETA is the time
+    until every active task with a known throughput is done.
+    """
+
+    def __init__(self, alpha: float = DEFAULT_EWMA_ALPHA, clock: Callable[[], float] = time.monotonic):
+        self.alpha = alpha
+        self.clock = clock
+        self._tasks: Dict[str, _Task] = {}
+        self._class_throughput: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def _ewma(self, previous: Optional[float], value: float) -> float:
+        if previous is None:
+            return value
+        return self.alpha * value + (1 - self.alpha) * previous
+
+    def start_task(
+        self,
+        task_type: str,
+        quantization: str,
+        total_units: float,
+        task_id: Optional[str] = None
+    ) -> str:
+        """
+        Register a task, e.g. ("generation", "q4", 512 tokens).
+
+        Raises TaskConflict if `task_id` is still registered; to restart a
+        task, finish it first.
+        """
+        if total_units <= 0:
+            raise ValueError("total_units must be positive")
+        task_id = task_id or uuid.uuid4().hex
+        with self._lock:
+            if task_id in self._tasks:
+                raise TaskConflict(f"Task {task_id} is already running")
+            self._tasks[task_id] = _Task(task_id, task_type, quantization, total_units, self.clock())
+        return task_id
+
+    def report_progress(self, task_id: str, completed_units: float):
+        """
+        Record the total number of units completed so far. A report without
+        progress changes nothing, so the time it covers counts towards the
+        interval of the next report that does progress.
+        """
+        with self._lock:
+            task = self._tasks[task_id]
+            now = self.clock()
+            completed_units = min(completed_units, task.total_units)
+            done = completed_units - task.completed_units
+            if done <= 0:
+                return
+            elapsed = now - task.updated_at
+            if elapsed > 0:
+                rate = done / elapsed
+                task.throughput = self._ewma(task.throughput, rate)
+                self._class_throughput[task.key] = self._ewma(self._class_throughput.get(task.key), rate)
+            task.completed_units = completed_units
+            task.updated_at = now
+
+    def finish_task(self, task_id: str):
+        with self._lock:
+            self._tasks.pop(task_id, None)
+
+    def _eta(self, task: _Task) -> Optional[float]:
+        throughput = task.throughput or self._class_throughput.get(task.key)
+        if not throughput:
+            return None
+        # Time since the last report has already been spent on the remaining work
+        since_update = self.clock() - task.updated_at
+        return max(task.remaining_units / throughput - since_update, 0.0)
+
+    def estimate(self, task_id: str) -> Optional[float]:
+        """Seconds until `task_id` finishes, or None if no throughput is known yet."""
+        with self._lock:
+            return self._eta(self._tasks[task_id])
+
+    def aggregate_eta(self) -> float:
+        """Seconds until all active tasks with a known throughput finish."""
+        with self._lock:
+            etas = [eta for eta in map(self._eta, self._tasks.values()) if eta is not None]
+        return max(etas, default=0.0)
+
+    def throughput_table(self) -> Dict[str, float]:
+        """Learned throughput per "task_type/quantization" class, in units per second."""
+        with self._lock:
+            return {f"{task_type}/{quantization}": rate
+                    for (task_type, quantization), rate in self._class_throughput.items()}
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{
+                "task_id": task.task_id,
+                "task_type": task.task_type,
+                "quantization": task.quantization,
+                "total_units": task.total_units,
+                "completed_units": task.completed_units,
+                "throughput": task.throughput,
+                "eta": self._eta(task)
+            } for task in self._tasks.values()]
+
+# Global registry shared by the API and in-process jobs
+task_registry = TaskRegistry()
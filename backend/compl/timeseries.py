@@ -0,0 +1,201 @@
+import math
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# (bucket width in seconds, number of buckets kept)
+DEFAULT_RESOLUTIONS: List[Tuple[int, int]] = [
+    (1, 3600),       # 1s for the last hour
+    (10, 8640),      # 10s for the last day
+    (60, 10080),     # 1min for the last week
+    (3600, 2160),    # 1h for the last 90 days
+]
+
+# Numeric fields of a sampler reading that are stored
+DEFAULT_FIELDS = ["cpu_usage", "memory_usage", "vram_used", "execution_time"]
+
+# Number of points a range query aims for when no step is given
+DEFAULT_MAX_POINTS = 300
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Compute the min/max/avg/p95 rollup of raw values."""
+    ordered = sorted(values)
+    return {
+        "min": ordered[0],
+        "max": ordered[-1],
+        "avg": sum(ordered) / len(ordered),
+        "p95": percentile(ordered, 95),
+        "count": len(ordered)
+    }
+
+
+def merge_rollups(rollups: Iterable[Dict[str, float]]) -> Dict[str, float]:
+    """
+    Merge rollups of adjacent buckets.
+
+    min, max and avg are exact; p95 is the maximum of the merged p95 values,
+    an upper bound of the true percentile.
+    """
+    rollups = list(rollups)
+    count = sum(r["count"] for r in rollups)
+    return {
+        "min": min(r["min"] for r in rollups),
+        "max": max(r["max"] for r in rollups),
+        "avg": sum(r["avg"] * r["count"] for r in rollups) / count,
+        "p95": max(r["p95"] for r in rollups),
+        "count": count
+    }
+
+
+class _Series:
+    """Closed buckets of one resolution, ordered by start time."""
+
+    def __init__(self, width: int, retention: int):
+        self.width = width
+        self.retention = retention
+        self.starts: List[float] = []
+        self.rows: List[Dict[str, Any]] = []
+        # Bucket being filled, with the raw values needed for an exact p95
+        self.open_start: Optional[float] = None
+        self.open_values: Dict[str, List[float]] = {}
+
+    def add(self, ts: float, values: Dict[str, float]):
+        start = ts - ts % self.width
+        if self.open_start is not None and start != self.open_start:
+            self._close()
+        if self.open_start is None:
+            self.open_start = start
+        for name, value in values.items():
+            self.open_values.setdefault(name, []).append(value)
+
+    def _close(self):
+        if self.open_values:
+            self.starts.append(self.open_start)
+            self.rows.append({
+                name: summarize(raw) for name, raw in self.open_values.items()
+            })
+            # Trim in chunks so retention costs amortized O(1) per bucket
+            excess = len(self.starts) - self.retention
+            if excess > max(1, self.retention // 8):
+                del self.starts[:excess]
+                del self.rows[:excess]
+        self.open_start = None
+        self.open_values = {}
+
+    def covers(self, ts: float) -> bool:
+        """Whether no bucket at or after `ts` has been dropped by retention."""
+        if len(self.starts) < self.retention:
+            return True
+        return self.starts[len(self.starts) - self.retention] <= ts
+
+    def range(self, start: float, end: float) -> Tuple[List[float], List[Dict[str, Any]]]:
+        lo = bisect_left(self.starts, start)
+        lo = max(lo, len(self.starts) - self.retention)
+        hi = bisect_right(self.starts, end)
+        return self.starts[lo:hi], self.rows[lo:hi]
+
+
+class MultiResolutionStore:
+    """
+    Embedded time-series store for CompL readings.
+
+    Every sample feeds one open bucket per resolution; when a bucket closes it
+    is reduced to min/max/avg/p95 per field and kept for a bounded number of
+    buckets. Range queries read the coarsest resolution that satisfies the
+    requested step, so long ranges return a few hundred rows.
+    """
+
+    def __init__(
+        self,
+        resolutions: Optional[List[Tuple[int, int]]] = None,
+        fields: Optional[List[str]] = None,
+        max_points: int = DEFAULT_MAX_POINTS
+    ):
+        resolutions = sorted(resolutions or DEFAULT_RESOLUTIONS)
+        self.fields = fields or DEFAULT_FIELDS
+        self.max_points = max_points
+        self.series = [_Series(width, retention) for width, retention in resolutions]
+        self._lock = threading.Lock()
+
+    def add_sample(self, metrics: Dict[str, Any], ts: Optional[float] = None):
+        """Record one reading; `ts` defaults to the current epoch time."""
+        ts = time.time() if ts is None else ts
+        values = {
+            name: float(metrics[name])
+            for name in self.fields
+            if isinstance(metrics.get(name), (int, float))
+        }
+        if not values:
+            return
+        with self._lock:
+            for series in self.series:
+                series.add(ts, values)
+
+    def pick_series(self, start: float, step: float) -> _Series:
+        """Return the coarsest resolution whose width does not exceed the step."""
+        chosen = self.series[0]
+        for series in self.series:
+            if series.width > step:
+                break
+            chosen = series
+        # Fall back to a coarser resolution if the chosen one no longer covers `start`
+        index = self.series.index(chosen)
+        for series in self.series[index:]:
+            if series.covers(start):
+                return series
+        return self.series[-1]
+
+    def query(self, start: float, end: float, step: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Return the rollups between `start` and `end` (epoch seconds).
+
+        Without a `step`, one is derived so that about `max_points` rows are
+        returned. When the step is coarser than the selected resolution,
+        adjacent buckets are merged so that each row covers one step.
+        """
+        if step is None:
+            step = (end - start) / self.max_points
+        with self._lock:
+            series = self.pick_series(start, step)
+            starts, rows = series.range(start, end)
+
+        # Round the step to a whole number of buckets
+        step = series.width * max(1, math.ceil(step / series.width))
+        points = []
+        window_start = None
+        window_rows: List[Dict[str, Any]] = []
+        for bucket_start, row in zip(starts, rows):
+            bucket_window = bucket_start - bucket_start % step
+            if window_start is not None and bucket_window != window_start:
+                points.append(self._merge_window(window_start, window_rows))
+                window_rows = []
+            window_start = bucket_window
+            window_rows.append(row)
+        if window_rows:
+            points.append(self._merge_window(window_start, window_rows))
+
+        return {
+            "from": start,
+            "to": end,
+            "resolution": series.width,
+            "step": step,
+            "series": points
+        }
+
+    def _merge_window(self, window_start: float, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        point: Dict[str, Any] = {"time": window_start}
+        for name in self.fields:
+            rollups = [row[name] for row in rows if name in row]
+            if rollups:
+                point[name] = rollups[0] if len(rollups) == 1 else merge_rollups(rollups)
+        return point
@@ -0,0 +1,23 @@
+# Durable storage for cognitive load (CL) readings
+from .write_behind import (
+    WriteBehindStore,
+    SQLiteSink,
+    SegmentFileSink,
+    StoreFull,
+    open_store_from_env,
+    shared_store
+)
+from .bulk import iter_row_chunks, validate_chunk, BulkReport, DEFAULT_CHUNK_SIZE
+
+__all__ = [
+    'WriteBehindStore',
+    'SQLiteSink',
+    'SegmentFileSink',
+    'StoreFull',
+    'open_store_from_env',
+    'shared_store',
+    'iter_row_chunks',
+    'validate_chunk',
+    'BulkReport',
+    'DEFAULT_CHUNK_SIZE',
+]
@@ -0,0 +1,145 @@
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+from fastapi import Request
+from pydantic import BaseModel, ValidationError
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Longest line kept in memory; a longer one is skipped and reported as a row error
+MAX_LINE_BYTES = 1024 * 1024
+
+# (1-based row number in the body, parsed row or parse error)
+ParsedRow = Tuple[int, Any]
+
+
+class RowError(Exception):
+    """A row that could not be parsed."""
+
+
+async def _iter_lines(request: Request) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split the request body into (1-based line number, raw line) without
+    buffering it whole. Only the unfinished line is kept between chunks; a
+    line over MAX_LINE_BYTES is dropped as it arrives and yielded as None.
+    """
+    partial = bytearray()
+    too_long = False
+    line_number = 0
+    async for chunk in request.stream():
+        start = 0
+        while (end := chunk.find(b"\n", start)) >= 0:
+            line_number += 1
+            if too_long or len(partial) + end - start > MAX_LINE_BYTES:
+                yield line_number, None
+            else:
+                partial += chunk[start:end]
+                yield line_number, bytes(partial).rstrip(b"\r")
+            partial.clear()
+            too_long = False
+            start = end + 1
+        if not too_long:
+            partial += chunk[start:]
+            if len(partial) > MAX_LINE_BYTES:
+                partial.clear()
+                too_long = True
+    if too_long:
+        yield line_number + 1, None
+    elif partial.strip():
+        yield line_number + 1, bytes(partial).rstrip(b"\r")
+
+
+def _decode(line_number: int, raw: Optional[bytes]) -> str:
+    if raw is None:
+        raise RowError(f"Line {line_number} is longer than {MAX_LINE_BYTES} bytes")
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise RowError(f"Line {line_number} is not valid UTF-8 (byte {e.start})")
+
+
+def is_csv(request: Request) -> bool:
+    return "csv" in request.headers.get("content-type", "")
+
+
+async def iter_row_chunks(request: Request, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[List[ParsedRow]]:
+    """
+    Yield the rows of an NDJSON or CSV body in chunks of `chunk_size`.
+
+    The format follows the Content-Type (text/csv or application/x-ndjson).
+    CSV bodies need a header line and one record per line; empty CSV cells
+    become None. A row that is too long or cannot be decoded or parsed is
+    yielded as a RowError; if the CSV header cannot be decoded every row is.
+    """
+    csv_body = is_csv(request)
+    header = None
+    chunk: List[ParsedRow] = []
+    row_number = 0
+    async for line_number, raw in _iter_lines(request):
+        if raw is not None and not raw.strip():
+            continue
+        if csv_body and header is None:
+            try:
+                header = next(csv.reader([_decode(line_number, raw)]))
+            except RowError as e:
+                header = RowError(f"Invalid CSV header: {e}")
+            continue
+        row_number += 1
+        try:
+            if isinstance(header, RowError):
+                raise header
+            line = _decode(line_number, raw)
+            if csv_body:
+                values = next(csv.reader([line]))
+                if len(values) != len(header):
+                    raise RowError(f"Expected {len(header)} columns, got {len(values)}")
+                row = {key: (value if value != "" else None) for key, value in zip(header, values)}
+            else:
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise RowError("Each line must be a JSON object")
+        except (ValueError, RowError) as e:
+            row = RowError(str(e))
+        chunk.append((row_number, row))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_chunk(model: Type[BaseModel], chunk: List[ParsedRow]) -> Tuple[List[Tuple[int, BaseModel]], List[Dict[str, Any]]]:
+    """Validate a chunk with `model`; returns the valid rows and per-row error reports."""
+    valid = []
+    errors = []
+    for row_number, row in chunk:
+        if isinstance(row, RowError):
+            errors.append({"row": row_number, "errors": [{"msg": str(row)}]})
+            continue
+        try:
+            valid.append((row_number, model(**row)))
+        except ValidationError as e:
+            errors.append({
+                "row": row_number,
+                "errors": [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            })
+    return valid, errors
+
+
+class BulkReport:
+    """Accumulates the outcome of a bulk upload."""
+
+    def __init__(self):
+        self.accepted = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def reject(self, row_number: int, message: str):
+        self.errors.append({"row": row_number, "errors": [{"msg": message}]})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "accepted": self.accepted,
+            "rejected": len(self.errors),
+            "errors": sorted(self.errors, key=lambda e: e["row"])
+        }
@@ -0,0 +1,366 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# fsync policies:
+#   "always"   - every batch is fsynced before the next one is written
+#   "interval" - fsync at most once per `fsync_interval` seconds
+#   "never"    - leave it to the OS
+FSYNC_POLICIES = ("always", "interval", "never")
+
+# (source, received_at, payload)
+Record = Tuple[str, float, Dict[str, Any]]
+
+# Records a store may hold in memory before it refuses new ones
+DEFAULT_MAX_PENDING = 100_000
+
+
+class StoreFull(Exception):
+    """The store's queue is full (the sink is failing or too slow); the records were not accepted."""
+
+
+class SQLiteSink:
+    """Stores batches in a SQLite database in WAL mode, one transaction per batch."""
+
+    def __init__(self, path: str, fsync: str = "interval", fsync_interval: float = 1.0):
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._last_checkpoint = time.monotonic()
+        self._conn = self._connect()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cognitive_load_readings ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " source TEXT NOT NULL,"
+            " received_at REAL NOT NULL,"
+            " payload TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # FULL syncs the WAL on every commit; NORMAL only on checkpoints
+        synchronous = {"always": "FULL", "interval": "NORMAL", "never": "OFF"}[self.fsync]
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+        return conn
+
+    def count(self) -> int:
+        # A separate connection, as in read(), so the count never waits on a batch commit.
+        # Rows are never deleted, so the largest AUTOINCREMENT id is the row count (an index lookup)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM cognitive_load_readings").fetchone()[0]
+        finally:
+            conn.close()
+
+    def write_batch(self, records: List[Record]):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO cognitive_load_readings (source, received_at, payload) VALUES (?, ?, ?)",
+                [(source, received_at, json.dumps(payload)) for source, received_at, payload in records]
+            )
+        if self.fsync == "interval" and time.monotonic() - self._last_checkpoint >= self.fsync_interval:
+            # A checkpoint syncs the WAL to the database file
+            self._conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            self._last_checkpoint = time.monotonic()
+
+    def read(self, after_id: int = 0, limit: Optional[int] = None, source: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        # A separate connection so reads never wait on the writer
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            query = "SELECT id, source, received_at, payload FROM cognitive_load_readings WHERE id > ?"
+            params: List[Any] = [after_id]
+            if source:
+                query += " AND source = ?"
+                params.append(source)
+            query += " ORDER BY id"
+            if limit:
+                query += " LIMIT ?"
+                params.append(limit)
+            for row_id, row_source, received_at, payload in conn.execute(query, params):
+                yield {"id": row_id, "source": row_source, "received_at": received_at, "data": json.loads(payload)}
+        finally:
+            conn.close()
+
+    def close(self):
+        self._conn.close()
+
+
+class SegmentFileSink:
+    """
+    Appends batches as NDJSON lines to segment files.
+
+    Each process writes its own segments (the PID is part of the name), so
+    several uvicorn workers never interleave writes. Segments roll over once
+    they reach `segment_size` bytes. Record ids are "<segment>:<offset>".
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fsync: str = "interval",
+        fsync_interval: float = 1.0,
+        segment_size: int = 64 * 1024 * 1024
+    ):
+        self.directory = directory
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.segment_size = segment_size
+        self._last_fsync = time.monotonic()
+        self._file = None
+        # segment path -> (bytes counted, complete lines in them)
+        self._counted: Dict[str, Tuple[int, int]] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def _segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.directory, "segment-*.ndjson")))
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+        name = f"segment-{time.time_ns():020d}-{os.getpid()}.ndjson"
+        self._file = open(os.path.join(self.directory, name), "ab")
+
+    def count(self) -> int:
+        """Complete lines in every segment, including other processes'; only bytes added since the last call are read."""
+        total = 0
+        for path in self._segments():
+            offset, lines = self._counted.get(path, (0, 0))
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+            # A trailing partial line is counted once it is complete
+            end = data.rfind(b"\n") + 1
+            offset, lines = offset + end, lines + data.count(b"\n", 0, end)
+            self._counted[path] = (offset, lines)
+            total += lines
+        return total
+
+    def write_batch(self, records: List[Record]):
+        if self._file is None or self._file.tell() >= self.segment_size:
+            self._open_segment()
+        data = b"".join(
+            json.dumps({"source": source, "received_at": received_at, "data": payload}).encode() + b"\n"
+            for source, received_at, payload in records
+        )
+        self._file.write(data)
+        self._file.flush()
+        now = time.monotonic()
+        if self.fsync == "always" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def read(self, after_id: Optional[str] = None, limit: Optional[int] = None, source: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        start_segment, start_offset = "", -1
+        if after_id:
+            start_segment, _, offset = str(after_id).rpartition(":")
+            start_offset = int(offset)
+        returned = 0
+        for path in self._segments():
+            segment = os.path.basename(path)
+            if segment < start_segment:
+                continue
+            with open(path, "rb") as f:
+                if segment == start_segment:
+                    f.seek(start_offset)
+                    f.readline()
+                while True:
+                    offset = f.tell()
+                    line = f.readline()
+                    # Skip a trailing partial line still being written
+                    if not line.endswith(b"\n"):
+                        break
+                    record = json.loads(line)
+                    if source and record["source"] != source:
+                        continue
+                    record["id"] = f"{segment}:{offset}"
+                    yield record
+                    returned += 1
+                    if limit and returned >= limit:
+                        return
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+
+class WriteBehindStore:
+    """
+    In-memory queue of readings flushed in batches to a sink.
+
+    `put` only appends to the queue, so requests never wait for a commit.
+    A background task writes a batch as soon as `batch_size` records are
+    pending or `flush_interval` seconds have passed, in a worker thread.
+    While the sink fails, batches stay queued and are retried; once
+    `max_pending` records are queued, `put` raises StoreFull instead of
+    growing the queue. Records still queued when the process dies are
+    lost; `close` flushes everything that is pending.
+
+    `count` does no I/O: the sink is counted in the worker thread after
+    each batch and every `flush_interval` while idle, so records written
+    by other processes show up within about one interval.
+    """
+
+    def __init__(self, sink, batch_size: int = 500, flush_interval: float = 0.5, max_pending: int = DEFAULT_MAX_PENDING):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._write_lock = threading.Lock()
+        # Sink count as of the last batch or refresh, and records taken from the queue but not yet written
+        self._written = sink.count()
+        self._in_flight = 0
+        self.closed = False
+        self.accepted = 0
+        self.shed = 0
+
+    def _ensure_started(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def put(self, source: str, payload: Dict[str, Any]):
+        """Queue one reading; must be called from the event loop."""
+        self.put_many(source, [payload])
+
+    def put_many(self, source: str, payloads: List[Dict[str, Any]]):
+        """Queue readings, all or none; raises StoreFull when they do not fit in the queue."""
+        if len(self._pending) + len(payloads) > self.max_pending:
+            self.shed += len(payloads)
+            raise StoreFull(f"{len(self._pending)} records are waiting to be written")
+        self._ensure_started()
+        received_at = time.time()
+        self._pending.extend((source, received_at, payload) for payload in payloads)
+        self.accepted += len(payloads)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def count(self) -> int:
+        """Records written by every process sharing the sink (as last counted), plus this process's queued ones."""
+        return self._written + self._in_flight + len(self._pending)
+
+    def _take_batch(self) -> List[Record]:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        return batch
+
+    def _write(self, batch: List[Record]) -> int:
+        with self._write_lock:
+            self.sink.write_batch(batch)
+            return self.sink.count()
+
+    def _count_sink(self) -> int:
+        with self._write_lock:
+            return self.sink.count()
+
+    async def flush(self):
+        """Write every pending record."""
+        while self._pending:
+            batch = self._take_batch()
+            self._in_flight = len(batch)
+            try:
+                written = await asyncio.to_thread(self._write, batch)
+            except Exception as e:
+                logger.error(f"Error writing cognitive load batch: {e}")
+                # Put the batch back so it is retried on the next flush
+                self._pending.extendleft(reversed(batch))
+                raise
+            finally:
+                self._in_flight = 0
+            self._written = written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                if self._pending:
+                    await self.flush()
+                else:
+                    # Nothing of ours to write: pick up what other processes wrote
+                    self._written = await asyncio.to_thread(self._count_sink)
+            except Exception:
+                await asyncio.sleep(self.flush_interval)
+
+    def read(self, *args, **kwargs) -> Iterator[Dict[str, Any]]:
+        return self.sink.read(*args, **kwargs)
+
+    async def close(self):
+        """Flush what is pending and close the sink; later calls do nothing."""
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        finally:
+            self.sink.close()
+
+
+def open_store_from_env() -> WriteBehindStore:
+    """
+    Build the store from environment variables:
+
+    CL_STORE_BACKEND        "sqlite" (default) or "segment"
+    CL_STORE_PATH           database file or segment directory
+    CL_STORE_BATCH_SIZE     records per batch (default 500)
+    CL_STORE_FLUSH_INTERVAL seconds between flushes (default 0.5)
+    CL_STORE_FSYNC          "always", "interval" (default) or "never"
+    CL_STORE_MAX_PENDING    records queued before new ones are refused (default 100000)
+    """
+    backend = os.environ.get("CL_STORE_BACKEND", "sqlite")
+    fsync = os.environ.get("CL_STORE_FSYNC", "interval")
+    if fsync not in FSYNC_POLICIES:
+        raise ValueError(f"CL_STORE_FSYNC must be one of {FSYNC_POLICIES}")
+    if backend == "segment":
+        sink = SegmentFileSink(os.environ.get("CL_STORE_PATH", "data/cognitive_load"), fsync=fsync)
+    else:
+        path = os.environ.get("CL_STORE_PATH", "data/cognitive_load.db")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        sink = SQLiteSink(path, fsync=fsync)
+    return WriteBehindStore(
+        sink,
+        batch_size=int(os.environ.get("CL_STORE_BATCH_SIZE", "500")),
+        flush_interval=float(os.environ.get("CL_STORE_FLUSH_INTERVAL", "0.5")),
+        max_pending=int(os.environ.get("CL_STORE_MAX_PENDING", str(DEFAULT_MAX_PENDING)))
+    )
+
+
+_shared_store: Optional[WriteBehindStore] = None
+
+
+def shared_store() -> WriteBehindStore:
+    """
+    The process-wide store from open_store_from_env. Every router uses this
+    one, so a process never runs two stores (and writers) on the same path.
+    """
+    global _shared_store
+    if _shared_store is None or _shared_store.closed:
+        _shared_store = open_store_from_env()
+    return _shared_store
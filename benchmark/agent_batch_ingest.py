@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+import httpx
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+
+from services.agent_monitor_service import AgentMonitorService, parse_state_records
+
+
+class CountingClient:
+    """Stands in for a dashboard WebSocket; counts the messages it is sent."""
+
+    def __init__(self):
+        self.messages = 0
+
+    async def send_text(self, message):
+        self.messages += 1
+
+    async def close(self, code=None):
+        pass
+
+
+def create_app(monitor: AgentMonitorService) -> FastAPI:
+    """Stand-in for the agent state endpoints of routes/ws_routes.py, on the real service."""
+    app = FastAPI()
+
+    @app.post("/api/agents/{agent_id}/state")
+    async def single(agent_id: str, state: Dict[str, Any]):
+        await monitor.update_agent_state(agent_id, state)
+        return {"success": True}
+
+    @app.post("/api/agents/states")
+    async def batch(records: List[Dict[str, Any]]):
+        try:
+            applied = await monitor.publish_state_records(parse_state_records(records))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"success": True, "applied": applied}
+
+    @app.websocket("/ws/agents/ingest")
+    async def ingest(websocket: WebSocket):
+        await websocket.accept()
+        try:
+            while True:
+                await monitor.publish_state_records(parse_state_records(json.loads(await websocket.receive_text())))
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+
+async def stream_frames(app: FastAPI, path: str, frames: List[str]):
+    """Drives one WebSocket session through the ASGI app: connect, send every frame, disconnect."""
+    incoming = asyncio.Queue()
+    incoming.put_nowait({"type": "websocket.connect"})
+    for frame in frames:
+        incoming.put_nowait({"type": "websocket.receive", "text": frame})
+    incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "headers": [], "subprotocols": [],
+        "server": ("bench", 80), "client": ("bench", 1234)
+    }
+
+    async def send(message):
+        pass
+
+    await app(scope, incoming.get, send)
+
+
+def step_records(step: int, agents: int) -> List[Dict[str, Any]]:
+    timestamp = datetime.utcnow().isoformat()
+    return [{"agent_id": f"agent-{index}", "state": {"status": "running", "step": step, "tokens": step * 17},
+             "client_timestamp": timestamp} for index in range(agents)]
+
+
+async def measure(label: str, args, run):
+    monitor = AgentMonitorService()
+    clients = [CountingClient() for _ in range(args.clients)]
+    for client in clients:
+        await monitor.register_client(client)
+    app = create_app(monitor)
+    start = time.perf_counter()
+    updates = await run(app)
+    await monitor.flush_pending()
+    elapsed = time.perf_counter() - start
+    # Let the writer tasks drain before counting what subscribers received
+    while monitor.get_fanout_stats()["queued"]:
+        await asyncio.sleep(0.001)
+    print(f"{label:>28}: {updates:>6} updates in {elapsed:.2f}s -> {updates / elapsed:>9,.0f} updates/s | "
+          f"{clients[0].messages} messages per subscriber")
+    for client in clients:
+        await monitor.unregister_client(client)
+    return updates / elapsed
+
+
+async def main_async(args):
+    steps = args.updates // args.agents
+    print(f"{args.agents} agents x {steps} steps, {args.clients} subscribers")
+
+    async def single_posts(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for step in range(steps):
+                for record in step_records(step, args.agents):
+                    await client.post(f"/api/agents/{record['agent_id']}/state", json=record["state"])
+        return steps * args.agents
+
+    async def batch_posts(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for step in range(steps):
+                response = await client.post("/api/agents/states", json=step_records(step, args.agents))
+                response.raise_for_status()
+        return steps * args.agents
+
+    async def stream_batches(app):
+        await stream_frames(app, "/ws/agents/ingest", [json.dumps(step_records(step, args.agents)) for step in range(steps)])
+        return steps * args.agents
+
+    async def stream_records(app):
+        frames = [json.dumps(record) for step in range(steps) for record in step_records(step, args.agents)]
+        await stream_frames(app, "/ws/agents/ingest", frames)
+        return len(frames)
+
+    baseline = await measure("POST per update", args, single_posts)
+    for label, run in (("POST batch per step", batch_posts), ("WS ingest, batch per frame", stream_batches),
+                       ("WS ingest, record per frame", stream_records)):
+        rate = await measure(label, args, run)
+        print(f"{'':>28}  {rate / baseline:.1f}x the single-update path")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-update POSTs with batched and streamed agent state ingestion")
+    parser.add_argument("--agents", type=int, default=50, help="Agents driven by the orchestrator (records per batch)")
+    parser.add_argument("--updates", type=int, default=5000, help="Total state updates sent by each path")
+    parser.add_argument("--clients", type=int, default=20, help="Subscribed dashboard WebSockets")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
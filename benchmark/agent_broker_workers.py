@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from services.agent_broker import create_broker
+from services.agent_monitor_service import AgentMonitorService
+
+
+class CountingClient:
+    """Stands in for a browser WebSocket; records delivery latency of every state_update."""
+
+    def __init__(self, done, expected):
+        self.latencies = []
+        self.done = done
+        self.expected = expected
+
+    async def send_text(self, message):
+        update = json.loads(message)
+        if update["type"] == "state_update":
+            # CLOCK_MONOTONIC is system-wide, so publish times compare across processes
+            self.latencies.append(time.monotonic() - update["data"]["state"]["published"])
+            if len(self.latencies) == self.expected:
+                self.done()
+
+    async def close(self, code=None):
+        pass
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else float("nan")
+
+
+async def worker(index, args, broker_url, ready, start, results):
+    monitor = AgentMonitorService(queue_size=args.updates + 16, batch_window=0, broker=create_broker(broker_url))
+    finished = asyncio.Event()
+    remaining = [args.clients // args.workers]
+
+    def client_done():
+        remaining[0] -= 1
+        if not remaining[0]:
+            finished.set()
+
+    clients = [CountingClient(client_done, args.updates) for _ in range(remaining[0])]
+    for client in clients:
+        await monitor.register_client(client)
+    # Barriers wait in a thread: the hub's loop must keep serving workers that are still joining
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, ready.wait)
+    await loop.run_in_executor(None, start.wait)
+
+    # Each worker publishes its share, as a load balancer would spread agents' POSTs
+    began = time.monotonic()
+    for i in range(index, args.updates, args.workers):
+        await monitor.update_agent_state(f"agent-{i % args.agents}", {"status": "running", "step": i, "published": time.monotonic()})
+        if i % 50 == 0:
+            await asyncio.sleep(0)
+    await asyncio.wait_for(finished.wait(), args.timeout)
+    elapsed = time.monotonic() - began
+    results.put((elapsed, [latency for client in clients for latency in client.latencies]))
+    # Keep the hub up until every worker has its updates
+    await loop.run_in_executor(None, start.wait)
+    await monitor.close()
+
+
+def run_worker(index, args, broker_url, ready, start, results):
+    asyncio.run(worker(index, args, broker_url, ready, start, results))
+
+
+def measure(args, workers, broker_url):
+    args.workers = workers
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(workers + 1)
+    start = context.Barrier(workers + 1)
+    results = context.Queue()
+    processes = [context.Process(target=run_worker, args=(index, args, broker_url, ready, start, results))
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    start.wait()
+    outcomes = [results.get(timeout=args.timeout + 30) for _ in processes]
+    start.wait()
+    for process in processes:
+        process.join()
+    elapsed = max(outcome[0] for outcome in outcomes)
+    latencies = [latency for outcome in outcomes for latency in outcome[1]]
+    print(f"{workers:>2} workers ({broker_url.split(':')[0]}): {len(latencies) / elapsed:>10,.0f} deliveries/s "
+          f"in {elapsed:.2f}s | latency p50={statistics.median(latencies) * 1000:.1f}ms "
+          f"p99={percentile(latencies, 0.99) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure agent state fan-out across worker processes sharing a broker")
+    parser.add_argument("--workers", type=lambda value: [int(v) for v in value.split(",")], default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=1000, help="WebSocket clients, split evenly across workers")
+    parser.add_argument("--updates", type=int, default=300)
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--broker", default=None,
+                        help="Broker URL for multi-worker runs (default: a Unix socket hub in a temp dir)")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    broker_url = args.broker or f"unix://{os.path.join(tempfile.mkdtemp(), 'agents.sock')}"
+    print(f"{args.clients} clients, {args.updates} updates of {args.agents} agents")
+    for workers in args.workers:
+        measure(args, workers, "memory" if workers == 1 else broker_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from services.agent_monitor_service import AgentMonitorService, OVERFLOW_POLICIES
+
+
+class SimulatedClient:
+    """Stands in for a browser WebSocket; slow clients take `delay` seconds per send."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.latencies = []
+        self.messages = 0
+        self.closed = False
+
+    async def send_text(self, message):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.messages += 1
+        update = json.loads(message)
+        # The publish time travels in the message, as a real client would see it
+        if update["type"] == "state_update":
+            self.latencies.append(time.perf_counter() - update["data"]["state"]["published"])
+        elif update["type"] == "state_batch":
+            received = time.perf_counter()
+            self.latencies.extend(received - state["state"]["published"] for state in update["data"].values())
+
+    async def close(self, code=None):
+        self.closed = True
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))] if values else float("nan")
+
+
+def make_clients(args, delay):
+    slow = int(args.clients * args.slow_fraction)
+    return [SimulatedClient(delay if i < slow else 0.0) for i in range(args.clients)]
+
+
+async def sequential_run(args, delay, updates):
+    """What broadcast_update did before: await every client's send in turn."""
+    clients = make_clients(args, delay)
+    producer = []
+    for i in range(updates):
+        start = time.perf_counter()
+        state = {"state": {"status": "running", "step": i, "published": start}}
+        message = json.dumps({"type": "state_update", "agent_id": f"agent-{i % args.agents}", "data": state})
+        for client in clients:
+            await client.send_text(message)
+        producer.append(time.perf_counter() - start)
+    return producer, clients, None
+
+
+async def queued_run(args, delay, policy):
+    monitor = AgentMonitorService(queue_size=args.queue_size, overflow_policy=policy,
+                                  send_timeout=args.send_timeout, batch_window=args.batch_window)
+    clients = make_clients(args, delay)
+    for client in clients:
+        await monitor.register_client(client)
+
+    producer = []
+    next_tick = time.perf_counter()
+    for i in range(args.updates):
+        next_tick += args.interval
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+        start = time.perf_counter()
+        await monitor.update_agent_state(f"agent-{i % args.agents}", {"status": "running", "step": i, "published": start})
+        producer.append(time.perf_counter() - start)
+
+    # Let the last batch go out and fast clients drain before reading their latencies
+    await asyncio.sleep(max(args.interval * 5, args.batch_window * 2))
+    stats = monitor.get_fanout_stats()
+    for client in list(monitor.connected_clients):
+        await monitor.unregister_client(client)
+    return producer, clients, stats
+
+
+def report(label, producer, clients, stats, args):
+    fast = [latency for client in clients if not client.delay for latency in client.latencies]
+    slow_received = sum(len(client.latencies) for client in clients if client.delay)
+    line = (f"{label:>24}: producer p50={statistics.median(producer) * 1000:.2f}ms "
+            f"p99={percentile(producer, 0.99) * 1000:.2f}ms max={max(producer) * 1000:.2f}ms | "
+            f"fast clients p99={percentile(fast, 0.99) * 1000:.1f}ms "
+            f"messages={statistics.mean(client.messages for client in clients if not client.delay):.0f} | "
+            f"slow clients received={slow_received}")
+    if stats:
+        line += f" dropped={stats['dropped']} disconnected={stats['disconnected_slow_clients']}"
+    print(line)
+
+
+async def main_async(args):
+    for delay in args.slow_delays:
+        print(f"{args.clients} clients, {args.slow_fraction:.0%} slow at {delay * 1000:.0f}ms per send")
+        if args.sequential_updates:
+            producer, clients, stats = await sequential_run(args, delay, args.sequential_updates)
+            report("sequential (before)", producer, clients, stats, args)
+        for policy in args.policies:
+            producer, clients, stats = await queued_run(args, delay, policy)
+            report(f"queued, {policy}", producer, clients, stats, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure agent state fan-out latency with slow WebSocket clients")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slow-fraction", type=float, default=0.1)
+    parser.add_argument("--slow-delays", type=lambda value: [float(v) for v in value.split(",")], default=[0.01, 0.1, 1.0],
+                        help="Comma-separated seconds per send of the slow clients")
+    parser.add_argument("--agents", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between agent updates")
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--send-timeout", type=float, default=5.0)
+    parser.add_argument("--batch-window", type=float, default=0.0,
+                        help="Seconds updates are coalesced into state_batch messages (0 sends each update)")
+    parser.add_argument("--policies", type=lambda value: value.split(","), default=list(OVERFLOW_POLICIES))
+    parser.add_argument("--sequential-updates", type=int, default=3, help="Updates timed with the sequential broadcast (0 to skip)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
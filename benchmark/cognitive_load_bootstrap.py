@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# app.database and the base app.models (User, Task) belong to the full backend and are
+# not part of this tree; the benchmark runs only where the whole backend is installed
+from app.database import Base
+from app.services import bootstrap
+from app.services.cognitive_load_analysis import fetch_assessment_arrays, analyze_cohort
+from app.services.cognitive_load_stats import SEQ_DIMENSIONS
+
+from cognitive_load_query_plans import load_data
+
+
+def synthetic_samples(times, effort, seed):
+    """One CompL sample per assessment, VRAM loosely following effort."""
+    rng = np.random.default_rng(seed)
+    vram = 2.0 + 0.3 * effort + rng.normal(0, 1.0, len(times))
+    latency = rng.gamma(2.0, 0.5, len(times))
+    return [
+        {"time": float(t), "vram_used": float(v), "execution_time": float(l)}
+        for t, v, l in zip(times, vram, latency)
+    ]
+
+
+def resample_loop(scores, compl, resamples, seed):
+    """The per-resample loop the vectorized bootstrap replaces."""
+    rng = np.random.default_rng(seed)
+    p = scores.shape[1]
+    for _ in range(resamples):
+        idx = rng.integers(0, len(scores), len(scores))
+        np.corrcoef(scores[idx].T, compl[idx].T)[:p, p:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the CL-CompL effect size and correlation bootstrap")
+    parser.add_argument("--rows", type=int, default=100000, help="Synthetic assessments to load")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--processes", type=int, default=bootstrap.BOOTSTRAP_PROCESSES, help="Bootstrap worker processes")
+    parser.add_argument("--loop-resamples", type=int, default=50, help="Resamples timed for the per-resample loop baseline (0 to skip)")
+    args = parser.parse_args()
+    bootstrap.BOOTSTRAP_PROCESSES = args.processes
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(engine)
+        load_data(engine, args.rows, args.users, args.tasks, args.modules, seed=1)
+        Session = sessionmaker(bind=engine)
+
+        with Session() as db:
+            start = time.perf_counter()
+            arrays = fetch_assessment_arrays(db)
+            print(f"columnar fetch of {len(arrays['scores'])} assessments: {time.perf_counter() - start:.2f}s")
+        engine.dispose()
+
+    effort = arrays["scores"][:, SEQ_DIMENSIONS.index("effort")]
+    samples = synthetic_samples(arrays["time"], effort, seed=2)
+
+    start = time.perf_counter()
+    result = analyze_cohort(arrays, samples, resamples=args.resamples, seed=3)
+    elapsed = time.perf_counter() - start
+    print(f"{args.resamples} resamples, {args.processes} processes: {elapsed:.2f}s "
+          f"({result['matchedSamples']} rows matched to CompL samples)")
+
+    effort_effect = result["effectSizes"]["effort"]["hedgesG"]
+    effort_vram = result["correlations"]["vram_used"]["effort"]
+    print(f"effort q8-q4 Hedges' g = {effort_effect['value']} {effort_effect['ci']}, "
+          f"r(effort, vram_used) = {effort_vram['r']} {effort_vram['ci']}")
+
+    if args.loop_resamples:
+        compl = np.array([[s["vram_used"], s["execution_time"]] for s in samples])
+        start = time.perf_counter()
+        resample_loop(arrays["scores"].astype(np.float64), compl, args.loop_resamples, seed=4)
+        per_resample = (time.perf_counter() - start) / args.loop_resamples
+        print(f"per-resample loop (correlations only): {per_resample * args.resamples:.1f}s estimated for {args.resamples} resamples")
+
+    bootstrap.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+import httpx
+from fastapi import FastAPI, Request
+from pydantic import BaseModel
+
+from persistence.bulk import iter_row_chunks, validate_chunk, BulkReport
+
+SCORES = ["complexity", "usability", "effort", "confidence", "frustration", "germane", "transfer"]
+
+
+class AssessmentIn(BaseModel):
+    # Same fields as CognitiveLoadAssessmentCreate in routes/cognitive_load.py
+    task_id: int
+    complexity: int
+    usability: int
+    effort: int
+    confidence: int
+    frustration: int
+    germane: int
+    transfer: int
+    config_type: Optional[str] = None
+    notes: Optional[str] = None
+
+
+COLUMNS = ["user_id", "task_id"] + SCORES + ["config_type", "notes", "timestamp"]
+INSERT = (f"INSERT INTO cognitive_load_assessments ({', '.join(COLUMNS)}) "
+          f"VALUES ({', '.join('?' for _ in COLUMNS)})")
+
+
+def create_app(db_path: str) -> FastAPI:
+    """Stand-in for the assessment endpoints, writing to SQLite like the real routes."""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE cognitive_load_assessments (id INTEGER PRIMARY KEY, user_id INTEGER, task_id INTEGER, "
+        + ", ".join(f"{name} INTEGER" for name in SCORES)
+        + ", config_type TEXT, notes TEXT, timestamp TEXT)"
+    )
+    app = FastAPI()
+
+    def row(assessment: AssessmentIn):
+        data = assessment.dict()
+        return [1, data["task_id"]] + [data[name] for name in SCORES] + [
+            data["config_type"], data["notes"], datetime.utcnow().isoformat()]
+
+    @app.post("/assessment")
+    async def single(assessment: AssessmentIn):
+        conn.execute(INSERT, row(assessment))
+        conn.commit()
+        return {"success": True}
+
+    @app.post("/assessment/bulk")
+    async def bulk(request: Request):
+        report = BulkReport()
+        async for chunk in iter_row_chunks(request):
+            valid, errors = validate_chunk(AssessmentIn, chunk)
+            report.errors.extend(errors)
+            with conn:
+                conn.executemany(INSERT, [row(assessment) for _, assessment in valid])
+            report.accepted += len(valid)
+        return report.to_dict()
+
+    return app
+
+
+def make_readings(count: int):
+    return [dict({name: random.randint(1, 9) for name in SCORES},
+                 task_id=random.randint(1, 50), config_type=random.choice(["q4", "q8"]))
+            for _ in range(count)]
+
+
+async def run(args):
+    readings = make_readings(args.rows)
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(os.path.join(directory, "bench.db"))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            start = time.perf_counter()
+            for reading in readings[:args.single_rows]:
+                await client.post("/assessment", json=reading)
+            single_elapsed = time.perf_counter() - start
+            single_rate = args.single_rows / single_elapsed
+
+            body = "\n".join(json.dumps(r) for r in readings)
+            start = time.perf_counter()
+            response = await client.post("/assessment/bulk", content=body,
+                                         headers={"content-type": "application/x-ndjson"})
+            bulk_elapsed = time.perf_counter() - start
+            report = response.json()
+
+    print(f"single-row: {args.single_rows} rows in {single_elapsed:.2f}s -> {single_rate:.0f} rows/s")
+    print(f"bulk NDJSON: {report['accepted']} rows in {bulk_elapsed:.2f}s -> "
+          f"{report['accepted'] / bulk_elapsed:.0f} rows/s ({report['rejected']} rejected)")
+    print(f"speed-up: {report['accepted'] / bulk_elapsed / single_rate:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-row and bulk NDJSON ingestion of cognitive load assessments")
+    parser.add_argument("--rows", type=int, default=20000, help="Rows sent through the bulk endpoint")
+    parser.add_argument("--single-rows", type=int, default=2000, help="Rows sent one request at a time")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import os
+import re
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+# app.database and the base app.models (User, Task) belong to the full backend and are
+# not part of this tree; the benchmark runs only where the whole backend is installed
+from app.database import Base
+from app.models import User, Task, CognitiveLoadAssessment
+from app.migrations import add_cognitive_load_indexes
+from app.routes import cognitive_load as routes
+from app.services.cognitive_load_histograms import backfill_histograms
+from app.services.cognitive_load_rollups import rebuild_rollups
+from app.services.cognitive_load_stats import stats_engine, SEQ_DIMENSIONS
+
+CONFIG_TYPES = ["q4", "q8", "fp16", None]
+TASK_TYPES = ["lmas", "qlora", "prompting", "evaluation"]
+EXPERTISE_LEVELS = ["beginner", "intermediate", "advanced"]
+
+# Plan lines that read a whole table, per dialect
+FULL_SCAN = {
+    "sqlite": re.compile(r"^SCAN (TABLE )?(?P<table>\w+)"),
+    "postgresql": re.compile(r"Seq Scan on (?P<table>\w+)"),
+}
+
+# Tables whose full scan counts as a regression
+WATCHED_TABLES = {CognitiveLoadAssessment.__tablename__, "user_cognitive_load_histogram_buckets"}
+
+
+def load_data(engine, rows, users, tasks, modules, seed):
+    """Insert synthetic users, tasks and `rows` assessments in chunks."""
+    random.seed(seed)
+    start = datetime(2025, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i, "expertise_level": random.choice(EXPERTISE_LEVELS)} for i in range(1, users + 1)
+        ])
+        conn.execute(Task.__table__.insert(), [
+            {"id": i, "task_type": random.choice(TASK_TYPES), "module_id": random.randint(1, modules)}
+            for i in range(1, tasks + 1)
+        ])
+    chunk_size = 50000
+    for offset in range(0, rows, chunk_size):
+        chunk = []
+        for i in range(offset, min(offset + chunk_size, rows)):
+            row = {dimension: random.randint(1, 9) for dimension in SEQ_DIMENSIONS}
+            row.update(
+                user_id=random.randint(1, users),
+                task_id=random.randint(1, tasks),
+                config_type=random.choice(CONFIG_TYPES),
+                timestamp=start + timedelta(seconds=i * 30)
+            )
+            chunk.append(row)
+        with engine.begin() as conn:
+            conn.execute(CognitiveLoadAssessment.__table__.insert(), chunk)
+
+
+class StatementRecorder:
+    """Collects the SQL statements (with parameters) run while enabled."""
+
+    def __init__(self, engine):
+        self.enabled = False
+        self.statements = []
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled and not executemany:
+            self.statements.append((statement, parameters))
+
+
+def explain(engine, statement, parameters):
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    # SQLite rows are (id, parent, notused, detail); Postgres rows are one text column
+    return [row[-1] for row in rows]
+
+
+def full_scans(dialect, plan):
+    pattern = FULL_SCAN[dialect]
+    scans = set()
+    for line in plan:
+        match = pattern.search(line.strip())
+        if match and match.group("table") in WATCHED_TABLES:
+            scans.add(match.group("table"))
+    return scans
+
+
+def endpoint_cases(args):
+    """(name, coroutine factory, may_scan) for every cognitive load endpoint query."""
+    user_id = args.users // 2
+    module_id = args.modules // 2
+    cursor = routes.encode_history_cursor(datetime(2025, 1, 1) + timedelta(seconds=args.rows * 15), args.rows // 2)
+
+    filters = dict(task_type=None, config_type=None, module_id=None)
+
+    def call(endpoint, **params):
+        def run_endpoint(db):
+            return endpoint(**params, current_user=db.get(User, user_id), db=db)
+        return run_endpoint
+
+    def user(**kwargs):
+        return call(routes.get_user_cognitive_data, **dict(filters, **kwargs))
+
+    def history(**kwargs):
+        return call(routes.get_user_cognitive_history, **dict(dict(filters, cursor=None, limit=50), **kwargs))
+
+    def klass(**kwargs):
+        return call(routes.get_class_cognitive_data, **dict(dict(filters, expertise_level=None), **kwargs))
+
+    def stats(**kwargs):
+        return call(routes.get_cognitive_load_stats, **dict(filters, **kwargs))
+
+    return [
+        ("user", user(), False),
+        ("user?config_type", user(config_type="q4"), False),
+        ("user?task_type&module_id", user(task_type="qlora", module_id=module_id), False),
+        ("user/history", history(), False),
+        ("user/history?cursor", history(cursor=cursor), False),
+        ("user/history?config_type&cursor", history(cursor=cursor, config_type="q8"), False),
+        ("class", klass(), False),
+        ("class?config_type", klass(config_type="q4"), False),
+        ("class?module_id&config_type", klass(module_id=module_id, config_type="q8"), False),
+        # task_type is not in the rollups: these aggregate raw assessments, and without
+        # a module filter they read most of the table
+        ("class?task_type", klass(task_type="qlora"), True),
+        ("class?task_type&module_id", klass(task_type="qlora", module_id=module_id), False),
+        ("stats", stats(), False),
+        ("stats?task_type&config_type&module_id", stats(task_type="qlora", config_type="q8", module_id=module_id), False),
+    ]
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_engine(url)
+        Session = sessionmaker(bind=engine)
+        dialect = engine.dialect.name
+        if dialect not in FULL_SCAN:
+            raise SystemExit(f"Unsupported database: {dialect}")
+
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        if args.without_indexes:
+            add_cognitive_load_indexes.downgrade(engine)
+
+        start = time.perf_counter()
+        load_data(engine, args.rows, args.users, args.tasks, args.modules, args.seed)
+        with Session() as db:
+            backfill_histograms(db)
+            rebuild_rollups(db)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        print(f"loaded {args.rows} assessments into {dialect} in {time.perf_counter() - start:.1f}s")
+
+        # Load the statistics engine up front; its one-off GROUP BY scan is not a per-request cost
+        stats_engine.reset()
+        with Session() as db:
+            stats_engine.ensure_loaded(db)
+
+        recorder = StatementRecorder(engine)
+        regressions = []
+        print(f"{'endpoint':<40} {'p50':>9} {'p95':>9}  plan")
+        for name, call, may_scan in endpoint_cases(args):
+            latencies = []
+            for repeat in range(args.repeats):
+                with Session() as db:
+                    recorder.statements = []
+                    recorder.enabled = repeat == 0
+                    t0 = time.perf_counter()
+                    asyncio.run(call(db))
+                    latencies.append(time.perf_counter() - t0)
+                    recorder.enabled = False
+                if repeat == 0:
+                    statements = list(recorder.statements)
+
+            scans = set()
+            plans = []
+            for statement, parameters in statements:
+                plan = explain(engine, statement, parameters)
+                plans.append(plan)
+                scans |= full_scans(dialect, plan)
+
+            latencies.sort()
+            p95 = latencies[int(0.95 * (len(latencies) - 1))]
+            status = "ok" if not scans else ("full scan (expected)" if may_scan else "FULL SCAN: " + ", ".join(sorted(scans)))
+            print(f"{name:<40} {statistics.median(latencies) * 1000:>7.1f}ms {p95 * 1000:>7.1f}ms  {status}")
+            if args.verbose:
+                for (statement, _), plan in zip(statements, plans):
+                    print("    " + " ".join(statement.split())[:160])
+                    for line in plan:
+                        print("      " + line)
+            if scans and not may_scan:
+                regressions.append(name)
+
+        engine.dispose()
+
+    if regressions:
+        print(f"plan regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load synthetic cognitive load assessments, time every endpoint query and check its plan for full scans")
+    parser.add_argument("--rows", type=int, default=1000000, help="Assessments to generate")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--tasks", type=int, default=400)
+    parser.add_argument("--modules", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=20, help="Timed calls per endpoint")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="SQLAlchemy URL of an empty Postgres database (default: temporary SQLite file)")
+    parser.add_argument("--without-indexes", action="store_true", help="Drop the composite indexes to see the plans regress")
+    parser.add_argument("--verbose", action="store_true", help="Print every statement with its plan")
+    args = parser.parse_args()
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
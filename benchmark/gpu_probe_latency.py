@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from compl.probes import CachedProbe, FakeGPUProbe, select_gpu_probe
+
+
+def summarize(name, latencies, elapsed, probe_calls, loop_lag):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{name:>8}: requests={len(latencies)} "
+          f"p50={statistics.median(latencies) * 1000:.1f}ms "
+          f"p95={p95 * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms "
+          f"throughput={len(latencies) / elapsed:.0f} req/s probe_calls={probe_calls} "
+          f"max_loop_lag={loop_lag * 1000:.1f}ms")
+
+
+async def run_clients(handler, clients, requests_per_client):
+    """Latency includes the time a request waits for a blocked event loop."""
+    latencies = []
+    max_lag = 0.0
+    running = True
+
+    async def lag_monitor():
+        nonlocal max_lag
+        while running:
+            expected = time.perf_counter() + 0.01
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.perf_counter() - expected)
+
+    async def client():
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            # The request "arrives" and waits to be scheduled, like a real connection
+            await asyncio.sleep(0)
+            await handler()
+            latencies.append(time.perf_counter() - start)
+
+    monitor = asyncio.create_task(lag_monitor())
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(clients)])
+    elapsed = time.perf_counter() - start
+    running = False
+    await monitor
+    return latencies, elapsed, max_lag
+
+
+async def main_async(args):
+    if args.backend == "fake":
+        probe = FakeGPUProbe(delay=args.probe_delay)
+    else:
+        probe = select_gpu_probe(args.backend)
+    calls = {"legacy": 0, "cached": 0}
+
+    # Current path: blocking probe called inline in the async handler
+    async def legacy_handler():
+        calls["legacy"] += 1
+        return probe.read()
+
+    cached = CachedProbe(probe.read, ttl=args.ttl)
+    original_read = probe.read
+
+    def counted_read():
+        calls["cached"] += 1
+        return original_read()
+
+    cached.probe = counted_read
+
+    async def cached_handler():
+        return await cached.get()
+
+    print(f"Backend: {probe.name}, clients: {args.clients}, requests/client: {args.requests}, TTL: {args.ttl}s")
+    latencies, elapsed, lag = await run_clients(legacy_handler, args.clients, args.requests)
+    summarize("legacy", latencies, elapsed, calls["legacy"], lag)
+    latencies, elapsed, lag = await run_clients(cached_handler, args.clients, args.requests)
+    summarize("cached", latencies, elapsed, calls["cached"], lag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare GPU probe latency: inline probe vs single-flight TTL cache")
+    parser.add_argument("--backend", default="fake",
+                        help="GPU probe backend (fake, nvml, gputil, sysfs, auto)")
+    parser.add_argument("--probe-delay", type=float, default=0.15,
+                        help="Simulated probe cost in seconds for the fake backend")
+    parser.add_argument("--clients", type=int, default=50,
+                        help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=4,
+                        help="Requests per client")
+    parser.add_argument("--ttl", type=float, default=2.0,
+                        help="Cache TTL in seconds")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# app.database and the base app.models (User, Task) belong to the full backend and are
+# not part of this tree; the benchmark runs only where the whole backend is installed
+from app.database import Base
+from app.routes import cognitive_load as routes
+from app.services.cognitive_load_cache import response_cache
+from services.agent_monitor_service import AgentMonitorService
+
+from cognitive_load_query_plans import load_data
+
+
+class RecordingClient:
+    """Stands in for a WebSocket; records how late each broadcast arrives."""
+
+    def __init__(self):
+        self.latencies = []
+
+    async def send_text(self, message):
+        received = time.perf_counter()
+        update = json.loads(message)
+        if update["type"] == "state_update":
+            # The scheduled time travels in the message, as a real client would see it
+            self.latencies.append(received - update["data"]["state"]["scheduled"])
+
+
+async def broadcast(monitor, deadline, interval):
+    """Publish an agent update every `interval` seconds until `deadline`."""
+    next_tick = time.perf_counter()
+    while next_tick < deadline:
+        next_tick += interval
+        await asyncio.sleep(max(0.0, next_tick - time.perf_counter()))
+        await monitor.update_agent_state("agent-1", {"status": "running", "scheduled": next_tick})
+
+
+async def poll_class(Session, mode, deadline, durations):
+    """Request an uncached /class response until `deadline`."""
+    # A task_type filter is answered from the raw assessments, not the rollups
+    filters = dict(task_type="qlora", config_type=None, module_id=None, expertise_level=None)
+    with Session() as db:
+        while time.perf_counter() < deadline:
+            response_cache.clear()
+            start = time.perf_counter()
+            if mode == "blocking":
+                # What the route did before: the query runs on the event loop
+                routes.compute_class_cognitive_data(db, **filters)
+            else:
+                await routes.get_class_cognitive_data(**filters, current_user=None, db=db)
+            durations.append(time.perf_counter() - start)
+            await asyncio.sleep(0)
+
+
+async def run_mode(Session, mode, args):
+    # Without the batch window every update is broadcast on its own, as measured before
+    monitor = AgentMonitorService(batch_window=0)
+    clients = [RecordingClient() for _ in range(args.clients)]
+    for client in clients:
+        await monitor.register_client(client)
+
+    deadline = time.perf_counter() + args.duration
+    durations = []
+    pollers = [] if mode == "idle" else [
+        asyncio.create_task(poll_class(Session, mode, deadline, durations)) for _ in range(args.pollers)
+    ]
+    await asyncio.gather(broadcast(monitor, deadline, args.interval), *pollers)
+
+    latencies = sorted(latency for client in clients for latency in client.latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    queries = f"{len(durations)} /class queries, p50 {statistics.median(durations) * 1000:.0f}ms" if durations else "no queries"
+    print(f"{mode:>9}: broadcast latency p50={statistics.median(latencies) * 1000:.1f}ms "
+          f"p95={p95 * 1000:.1f}ms max={latencies[-1] * 1000:.1f}ms ({queries})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure agent WebSocket broadcast latency while heavy /class queries run")
+    parser.add_argument("--rows", type=int, default=200000, help="Synthetic assessments to load")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--modules", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=50, help="Connected WebSocket clients")
+    parser.add_argument("--pollers", type=int, default=4, help="Concurrent /class pollers")
+    parser.add_argument("--interval", type=float, default=0.02, help="Seconds between agent updates")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(engine)
+        load_data(engine, args.rows, args.users, args.tasks, args.modules, seed=1)
+        Session = sessionmaker(bind=engine)
+
+        for mode in ("idle", "blocking", "executor"):
+            asyncio.run(run_mode(Session, mode, args))
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,46 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
+import json
 import logging
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, List, Optional
 
-from ..services.agent_monitor_service import monitor_service
+from ..services.agent_monitor_service import monitor_service, parse_state_records
+from ..services.resource_attribution_service import attribution_service
 from ..auth.jwt_handler import verify_token
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+@router.on_event("startup")
+async def start_monitor_service():
+    # Índice do histórico em disco e conexão ao broker prontos antes das primeiras atualizações
+    await monitor_service.start()
+
+@router.on_event("shutdown")
+async def close_monitor_service():
+    # Solta o hub/lock do broker e o lock de escrita do histórico para outro worker assumir
+    await monitor_service.close()
+
 @router.websocket("/ws/agents")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     
+    # Inscrições iniciais opcionais: /ws/agents?topics=pattern:team-3-*,role:planner
+    # e encoding=delta para receber patches em vez do estado completo
+    topics = websocket.query_params.get("topics")
+    encoding = websocket.query_params.get("encoding", "full")
     try:
         # Registra o cliente no serviço de monitoramento
-        await monitor_service.register_client(websocket)
-        
+        await monitor_service.register_client(websocket, topics.split(",") if topics else None, encoding)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    
+    try:
         while True:
-            # Espera por comandos do cliente (como filtros ou solicitações de histórico)
+            # Comandos do cliente: inscrição e cancelamento de tópicos
             data = await websocket.receive_text()
-            # Processar comandos do cliente aqui se necessário
+            await monitor_service.handle_client_message(websocket, data)
             
     except WebSocketDisconnect:
         await monitor_service.unregister_client(websocket)
@@ -31,21 +52,126 @@ async def websocket_endpoint(websocket: WebSocket):
 async def update_agent_state(
     agent_id: str, 
     state: Dict[str, Any],
+    immediate: bool = False,
 ):
-    """Endpoint para atualizar o estado de um agente."""
+    """Endpoint para atualizar o estado de um agente (immediate=true ignora a janela de agrupamento)."""
     try:
-        await monitor_service.update_agent_state(agent_id, state)
+        register_agent_process(agent_id, state)
+        await monitor_service.update_agent_state(agent_id, state, immediate=immediate)
         return {"success": True}
     except Exception as e:
         logger.error(f"Erro ao atualizar estado: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def register_agent_process(agent_id: str, state: Dict[str, Any]):
+    # Agentes que informam seu PID passam a ter o consumo atribuído
+    if isinstance(state.get("pid"), int):
+        try:
+            attribution_service.register_process(agent_id, state["pid"])
+        except ValueError as e:
+            # O estado é aplicado mesmo assim; só a atribuição é recusada
+            logger.warning(f"PID recusado para o agente {agent_id}: {e}")
+
+def register_agent_processes(records: List[Dict[str, Any]]):
+    for record in records:
+        register_agent_process(record["agent_id"], record["state"])
+
+@router.post("/api/agents/states")
+async def update_agent_states(records: List[Dict[str, Any]], immediate: bool = False):
+    """
+    Endpoint para atualizar vários agentes num só pedido.
+    
+    Corpo: [{"agent_id": "a1", "state": {...}, "client_timestamp": "..."}, ...].
+    O lote é aplicado inteiro (ou nada, se algum registro for inválido) e
+    os clientes o recebem num mesmo state_batch (immediate=true ignora a
+    janela de agrupamento).
+    """
+    try:
+        records = parse_state_records(records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        register_agent_processes(records)
+        applied = await monitor_service.publish_state_records(records, immediate=immediate)
+        return {"success": True, "applied": applied}
+    except Exception as e:
+        logger.error(f"Erro ao atualizar estados: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.websocket("/ws/agents/ingest")
+async def ingest_endpoint(websocket: WebSocket):
+    """
+    Ingestão contínua para produtores de estado (ex.: um orquestrador).
+    
+    Cada mensagem é um registro, uma lista de registros ou
+    {"id": ..., "records": [...], "immediate": false}, aplicada como um
+    lote. Não há resposta para mensagens aceitas; uma inválida recebe
+    {"type": "error", "id", "message"}. Uma falha ao aplicar (ex.: broker
+    fora do ar) fecha a conexão com 1011 para o produtor reconectar.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            data = await websocket.receive_text()
+            frame_id, immediate = None, False
+            try:
+                frame = json.loads(data)
+                if isinstance(frame, dict):
+                    frame_id, immediate = frame.get("id"), frame.get("immediate") is True
+                records = parse_state_records(frame)
+            except ValueError as e:
+                await websocket.send_text(json.dumps({"type": "error", "id": frame_id, "message": str(e)}))
+                continue
+            try:
+                register_agent_processes(records)
+                await monitor_service.publish_state_records(records, immediate=immediate)
+            except Exception as e:
+                logger.error(f"Erro ao aplicar mensagem da ingestão {frame_id}: {e}")
+                await websocket.close(code=1011)
+                return
+            
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Erro na ingestão WebSocket: {e}")
+
 @router.get("/api/agents/{agent_id}/history")
-async def get_agent_history(agent_id: str, limit: int = 20):
-    """Endpoint para obter histórico de estados de um agente."""
+async def get_agent_history(
+    agent_id: str,
+    limit: int = Query(20, gt=0, le=1000),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None, description="nextCursor da página anterior")
+):
+    """
+    Endpoint para obter histórico de estados de um agente.
+    
+    Retorna os `limit` estados mais recentes em [since, until), em ordem
+    cronológica; com `cursor`, a página anterior a uma já lida.
+    """
+    if cursor is not None and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Cursor inválido")
     try:
-        history = monitor_service.get_agent_history(agent_id, limit)
-        return {"agent_id": agent_id, "history": history}
+        page = await monitor_service.query_agent_history(agent_id, limit, since, until, int(cursor) if cursor else None)
+        return {"agent_id": agent_id, **page}
     except Exception as e:
         logger.error(f"Erro ao obter histórico: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/agents/resources")
+async def get_agents_resources():
+    """Endpoint para obter o consumo de recursos (RAM, CPU, IO) por agente."""
+    try:
+        breakdown = await attribution_service.get_breakdown()
+        return {"agents": list(breakdown.values())}
+    except Exception as e:
+        logger.error(f"Erro ao obter consumo por agente: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/agents/{agent_id}/resources")
+async def get_agent_resources(agent_id: str):
+    """Endpoint para obter o consumo de recursos de um agente."""
+    breakdown = await attribution_service.get_breakdown()
+    if agent_id not in breakdown:
+        raise HTTPException(status_code=404, detail="Nenhum processo ativo atribuído ao agente")
+    return breakdown[agent_id]
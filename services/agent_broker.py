@@ -0,0 +1,474 @@
+import os
+import abc
+import json
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from urllib.parse import unquote, urlparse
+
+try:
+    import fcntl
+except ImportError:
+    # Sem flock não há eleição do hub; só os brokers "memory" e Redis funcionam
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Broker das atualizações de estado: "memory" (um processo), "unix:///caminho.sock"
+# (workers da mesma máquina) ou "redis://[:senha@]host:6379/0" (qualquer máquina)
+DEFAULT_BROKER_URL = os.environ.get("AGENT_BROKER", "memory")
+
+# Tamanho máximo de uma mensagem e bytes pendentes para um worker antes de o hub desconectá-lo
+MAX_FRAME = 16 * 1024 * 1024
+MAX_PEER_BUFFER = 64 * 1024 * 1024
+
+# Espera (s) entre tentativas de conexão e máxima de uma publicação sem conexão
+RECONNECT_DELAY = 0.05
+PUBLISH_TIMEOUT = 5.0
+
+# Redis: estado de um agente sem publicação há STATE_TTL segundos sai do hash,
+# em limpezas feitas no máximo a cada TRIM_INTERVAL segundos
+STATE_TTL = int(os.environ.get("AGENT_BROKER_STATE_TTL", 24 * 3600))
+TRIM_INTERVAL = 60.0
+TRIM_BATCH = 1000
+
+# Remove do hash e do índice de última publicação os agentes mais antigos que ARGV[1]
+TRIM_SCRIPT = """
+local stale = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #stale > 0 then
+  redis.call('HDEL', KEYS[1], unpack(stale))
+  redis.call('ZREM', KEYS[2], unpack(stale))
+end
+return #stale
+"""
+
+Message = Dict[str, Any]
+Deliver = Callable[[Message], Awaitable[None]]
+Snapshot = Callable[[], List[Message]]
+
+def updates_of(message: Message) -> List[Message]:
+    """Os estados de uma mensagem: um lote ({"updates": [...]}) ou uma atualização só"""
+    return message["updates"] if "updates" in message else [message]
+
+class AgentBroker(abc.ABC):
+    """
+    Canal das atualizações de estado entre os workers.
+
+    Cada estado (ou lote, {"updates": [...]}) é publicado uma vez, pelo
+    worker que recebeu o POST, e entregue a `deliver` em todos os workers,
+    inclusive o que publicou, na mesma ordem em todos. `snapshot` devolve
+    os estados atuais do worker; quem entra depois os recebe, um por
+    agente, com "replay": True.
+    """
+
+    async def start(self, deliver: Deliver, snapshot: Snapshot):
+        self._deliver = deliver
+        self._snapshot = snapshot
+
+    @abc.abstractmethod
+    async def publish(self, message: Message):
+        """Publica o estado ou lote para todos os workers"""
+
+    async def close(self):
+        pass
+
+    async def _deliver_safely(self, message: Message):
+        try:
+            await self._deliver(message)
+        except Exception as e:
+            logger.error(f"Erro ao aplicar atualização do broker: {e}")
+
+class InProcessBroker(AgentBroker):
+    """Um único processo: a publicação é entregue na hora, antes de publish retornar."""
+
+    async def publish(self, message: Message):
+        await self._deliver(message)
+
+class UnixSocketBroker(AgentBroker):
+    """
+    Workers da mesma máquina ligados por um socket Unix.
+
+    O worker que pega o lock `path + ".lock"` vira o hub: escuta em `path`
+    e repassa cada linha publicada, na ordem em que chega, a todos os
+    workers e a si mesmo. Os demais se conectam ao hub; se ele cai, eles
+    reconectam e o primeiro a pegar o lock assume.
+    """
+
+    def __init__(self, path: str):
+        if fcntl is None:
+            raise RuntimeError("O broker unix precisa de fcntl.flock")
+        self.path = path
+        self._lock_file = None
+        self._server = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+        self._latest: Dict[str, bytes] = {}  # No hub: última linha de cada agente, para quem entra
+        self._seqs: Dict[str, int] = {}  # No hub: último seq de cada agente
+        self._hub: Optional[asyncio.StreamWriter] = None
+        self._connected = asyncio.Event()
+        self._inbox: Optional[asyncio.Queue] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._closed = False
+
+    @property
+    def is_hub(self) -> bool:
+        return self._server is not None
+
+    async def start(self, deliver: Deliver, snapshot: Snapshot):
+        await super().start(deliver, snapshot)
+        self._inbox = asyncio.Queue()
+        self._spawn(self._dispatch())
+        await self._join()
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _join(self):
+        # Hub se conseguir o lock; senão, cliente do hub atual
+        while not self._closed:
+            if self._try_lock():
+                await self._serve()
+                return
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_FRAME)
+                # Estados atuais do hub até a linha vazia; depois, as publicações
+                while (line := await reader.readline()) != b"\n":
+                    if not line:
+                        raise ConnectionResetError("Hub fechou a conexão")
+                    self._inbox.put_nowait(json.loads(line))
+            except (FileNotFoundError, ConnectionError):
+                # Hub eleito mas ainda sem escutar, ou socket de um hub morto
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            self._hub = writer
+            self._connected.set()
+            self._spawn(self._read_hub(reader))
+            return
+
+    def _try_lock(self) -> bool:
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    async def _serve(self):
+        # Com o lock, um socket existente é de um hub que já morreu
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        snapshot = self._snapshot()
+        self._latest = {
+            message["agent_id"]: (json.dumps({**message, "replay": True}) + "\n").encode()
+            for message in snapshot
+        }
+        self._seqs = {message["agent_id"]: message["state"]["seq"] for message in snapshot}
+        self._server = await asyncio.start_unix_server(self._handle_peer, path=self.path, limit=MAX_FRAME)
+        self._connected.set()
+        logger.info(f"Hub de estados dos agentes escutando em {self.path}")
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._handlers.add(asyncio.current_task())
+        # Registrado e com os estados atuais sem await no meio: o worker que
+        # entra não perde nenhuma publicação
+        self._peers.add(writer)
+        writer.write(b"".join(self._latest.values()) + b"\n")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._relay(line)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Worker desconectado do hub: {e}")
+        finally:
+            self._peers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    def _relay(self, line: bytes):
+        message = json.loads(line)
+        # O hub ordena: um seq já usado (dois workers publicando o mesmo
+        # agente ao mesmo tempo) vira o próximo, igual para todos
+        renumbered = False
+        for update in updates_of(message):
+            agent_id, state = update["agent_id"], update["state"]
+            latest = self._seqs.get(agent_id, 0)
+            if state["seq"] <= latest:
+                update["state"] = {**state, "seq": latest + 1}
+                renumbered = True
+            self._seqs[agent_id] = update["state"]["seq"]
+            self._latest[agent_id] = (json.dumps({"agent_id": agent_id, "state": update["state"], "replay": True}) + "\n").encode()
+        if renumbered:
+            line = (json.dumps(message) + "\n").encode()
+        # Sem await entre as escritas: todos os workers veem a mesma ordem
+        for peer in list(self._peers):
+            if peer.transport.get_write_buffer_size() > MAX_PEER_BUFFER:
+                logger.warning("Worker não acompanha o hub; desconectando")
+                self._peers.discard(peer)
+                peer.close()
+                continue
+            peer.write(line)
+        self._inbox.put_nowait(message)
+
+    async def _dispatch(self):
+        while True:
+            await self._deliver_safely(await self._inbox.get())
+
+    async def _read_hub(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._inbox.put_nowait(json.loads(line))
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Conexão com o hub perdida: {e}")
+        self._connected.clear()
+        self._hub = None
+        if not self._closed:
+            await self._join()
+
+    async def publish(self, message: Message):
+        line = (json.dumps(message) + "\n").encode()
+        if not self.is_hub:
+            try:
+                await asyncio.wait_for(self._connected.wait(), PUBLISH_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise ConnectionError(f"Sem conexão com o hub em {self.path}")
+        if self.is_hub:
+            self._relay(line)
+            return
+        self._hub.write(line)
+        await self._hub.drain()
+
+    async def close(self):
+        self._closed = True
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Fechar as conexões encerra os handlers do hub pelo fim da leitura
+        for writer in list(self._peers) + ([self._hub] if self._hub else []):
+            writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        self._peers.clear()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+class RedisError(RuntimeError):
+    """Resposta de erro ("-ERR ...") do Redis; a conexão continua utilizável."""
+
+class _RespConnection:
+    """Conexão mínima no protocolo RESP2 do Redis."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self.writer.write(b"".join(parts))
+
+    async def _read_reply(self):
+        # Erros voltam como RedisError, sem levantar: a resposta inteira é
+        # consumida e a próxima leitura começa na resposta seguinte
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Conexão com o Redis fechada")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            return RedisError(f"Redis: {body.decode()}")
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            return None if size < 0 else (await self.reader.readexactly(size + 2))[:-2]
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [await self._read_reply() for _ in range(size)]
+        raise ConnectionError(f"Resposta RESP inválida: {line!r}")
+
+    async def read(self):
+        reply = await self._read_reply()
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    async def command(self, *args):
+        self.send(*args)
+        return await self.read()
+
+    async def transaction(self, *commands):
+        """
+        Executa os comandos entre MULTI e EXEC. Todas as respostas, até a
+        do EXEC, são lidas antes de levantar o primeiro erro (de enfileiramento,
+        EXECABORT ou de um comando executado).
+        """
+        for command in (("MULTI",), *commands, ("EXEC",)):
+            self.send(*command)
+        await self.writer.drain()
+        replies = [await self._read_reply() for _ in range(len(commands) + 2)]
+        results = replies[-1] if isinstance(replies[-1], list) else []
+        for reply in replies + results:
+            if isinstance(reply, RedisError):
+                raise reply
+        return results
+
+    def close(self):
+        self.writer.close()
+
+class RedisBroker(AgentBroker):
+    """
+    Workers em qualquer máquina, via PUBLISH/SUBSCRIBE de um servidor
+    compatível com Redis.
+
+    O último estado de cada agente também vai para um hash, gravado com a
+    publicação numa transação; quem entra (ou reconecta) o lê depois de se
+    inscrever e começa do estado atual. Um sorted set guarda quando cada
+    agente publicou pela última vez: os que ficam `state_ttl` segundos sem
+    publicar saem do hash, e os dois expiram juntos se nada for publicado
+    nesse tempo. Fala RESP direto, sem depender de um cliente Redis.
+    """
+
+    def __init__(self, url: str, prefix: str = "agent_monitor", state_ttl: int = STATE_TTL):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.ssl = parsed.scheme == "rediss"
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.channel = f"{prefix}:updates"
+        self.states_key = f"{prefix}:states"
+        self.seen_key = f"{prefix}:seen"
+        self.state_ttl = state_ttl
+        self._next_trim = 0.0
+        self._publisher: Optional[_RespConnection] = None
+        self._publish_lock = asyncio.Lock()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def _connect(self) -> _RespConnection:
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None, limit=MAX_FRAME)
+        connection = _RespConnection(reader, writer)
+        if self.password is not None:
+            await connection.command("AUTH", *([self.username] if self.username else []), self.password)
+        if self.db:
+            await connection.command("SELECT", self.db)
+        return connection
+
+    async def start(self, deliver: Deliver, snapshot: Snapshot):
+        await super().start(deliver, snapshot)
+        subscriber = await self._subscribe()
+        self._listener = asyncio.create_task(self._listen(subscriber))
+
+    async def _subscribe(self) -> _RespConnection:
+        subscriber = await self._connect()
+        await subscriber.command("SUBSCRIBE", self.channel)
+        # Estados atuais lidos depois da inscrição: nada publicado no meio se perde
+        async with self._publish_lock:
+            try:
+                states = await (await self._publisher_connection()).command("HGETALL", self.states_key)
+            except (OSError, asyncio.IncompleteReadError):
+                self._drop_publisher()
+                subscriber.close()
+                raise
+        for data in states[1::2]:
+            await self._deliver_safely({**json.loads(data), "replay": True})
+        return subscriber
+
+    async def _publisher_connection(self) -> _RespConnection:
+        if self._publisher is None:
+            self._publisher = await self._connect()
+        return self._publisher
+
+    async def _listen(self, subscriber: _RespConnection):
+        while True:
+            try:
+                while True:
+                    reply = await subscriber.read()
+                    if reply[0] == b"message":
+                        await self._deliver_safely(json.loads(reply[2]))
+            except (ConnectionError, asyncio.IncompleteReadError) as e:
+                logger.warning(f"Conexão de inscrição com o Redis perdida: {e}")
+                subscriber.close()
+            # Reconecta e reinscreve até conseguir
+            while True:
+                await asyncio.sleep(RECONNECT_DELAY)
+                try:
+                    subscriber = await self._subscribe()
+                    break
+                except (OSError, RuntimeError, asyncio.IncompleteReadError) as e:
+                    logger.warning(f"Falha ao reconectar ao Redis: {e}")
+
+    async def publish(self, message: Message):
+        data = json.dumps(message)
+        latest = {}
+        for update in updates_of(message):
+            latest[update["agent_id"]] = json.dumps({"agent_id": update["agent_id"], "state": update["state"]})
+        fields = [item for pair in latest.items() for item in pair]
+        now = time.time()
+        commands = [
+            ("HSET", self.states_key, *fields),
+            ("ZADD", self.seen_key, *[item for agent_id in latest for item in (now, agent_id)]),
+            ("EXPIRE", self.states_key, self.state_ttl),
+            ("EXPIRE", self.seen_key, self.state_ttl),
+        ]
+        async with self._publish_lock:
+            if now >= self._next_trim:
+                self._next_trim = now + TRIM_INTERVAL
+                commands.append(("EVAL", TRIM_SCRIPT, 2, self.states_key, self.seen_key, now - self.state_ttl, TRIM_BATCH))
+            commands.append(("PUBLISH", self.channel, data))
+            try:
+                await asyncio.wait_for(self._transaction(commands), PUBLISH_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Respostas podem chegar depois: a conexão não serve mais
+                self._drop_publisher()
+                raise ConnectionError(f"Redis sem resposta em {PUBLISH_TIMEOUT}s")
+            except (OSError, asyncio.IncompleteReadError) as e:
+                self._drop_publisher()
+                raise ConnectionError(f"Falha ao publicar no Redis: {e}")
+
+    async def _transaction(self, commands):
+        connection = await self._publisher_connection()
+        return await connection.transaction(*commands)
+
+    def _drop_publisher(self):
+        if self._publisher is not None:
+            self._publisher.close()
+            self._publisher = None
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        self._drop_publisher()
+
+def create_broker(url: str = DEFAULT_BROKER_URL) -> AgentBroker:
+    """Broker a partir de uma URL: "memory", "unix:///caminho.sock" ou "redis://host:porta/db"."""
+    if url in ("", "memory"):
+        return InProcessBroker()
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return UnixSocketBroker(parsed.path)
+    if parsed.scheme in ("redis", "rediss"):
+        return RedisBroker(url)
+    raise ValueError(f"Broker desconhecido: {url}")
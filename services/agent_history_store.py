@@ -0,0 +1,527 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .agent_state_delta import Patch, apply_patch
+
+try:
+    import fcntl
+except ImportError:
+    # Sem flock (Windows) o log supõe um único processo escritor
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Diretório do log (vazio desativa a persistência), tamanho de cada segmento e retenção
+DEFAULT_HISTORY_DIR = os.environ.get("AGENT_HISTORY_DIR", os.path.join("data", "agent_history"))
+SEGMENT_BYTES = int(os.environ.get("AGENT_HISTORY_SEGMENT_BYTES", str(16 * 1024 * 1024)))
+MAX_AGE = float(os.environ.get("AGENT_HISTORY_MAX_AGE", str(7 * 24 * 3600)))
+MAX_BYTES = int(os.environ.get("AGENT_HISTORY_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Registros entre keyframes de um agente no log
+KEYFRAME_INTERVAL = 50
+
+# Intervalo (s) entre verificações de retenção por idade
+RETENTION_CHECK_INTERVAL = 60.0
+
+# Intervalo (s) entre tentativas de um leitor de assumir a escrita do log
+WRITER_RETRY_INTERVAL = 1.0
+
+# Registros aguardando a thread escritora; além disso, novos registros são descartados
+WRITE_QUEUE_SIZE = int(os.environ.get("AGENT_HISTORY_QUEUE_SIZE", "100000"))
+
+# Registros gravados de uma vez (um flush) pela thread escritora
+WRITE_BATCH = 512
+
+WRITER_LOCK = ".writer.lock"
+
+KEYFRAME = "k"
+PATCH = "p"
+
+def to_epoch(timestamp: str) -> float:
+    """Timestamps dos estados são ISO em UTC sem fuso"""
+    return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp()
+
+def datetime_to_epoch(moment: Optional[datetime]) -> Optional[float]:
+    if moment is None:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+class _AgentIndex:
+    """Posições dos registros de um agente, em ordem de escrita (e de seq e timestamp)."""
+
+    __slots__ = ("times", "seqs", "segments", "offsets", "lengths", "keyframes")
+
+    def __init__(self):
+        self.times = array("d")
+        self.seqs = array("q")
+        self.segments = array("q")
+        self.offsets = array("q")
+        self.lengths = array("q")
+        self.keyframes = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.seqs)
+
+    def add(self, epoch: float, seq: int, segment: int, offset: int, length: int, keyframe: bool):
+        # Relógio que volta não quebra a busca binária: o índice nunca decresce
+        self.times.append(max(epoch, self.times[-1]) if self.times else epoch)
+        self.seqs.append(seq)
+        self.segments.append(segment)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.keyframes.append(keyframe)
+
+    def drop_segment(self, segment: int):
+        count = bisect_right(self.segments, segment)
+        for column in self.__slots__:
+            del getattr(self, column)[:count]
+
+class AgentHistoryLog:
+    """
+    Histórico persistente dos estados dos agentes.
+
+    Os registros vão para um log append-only em segmentos; cada linha é
+    `agent_id<TAB>seq<TAB>timestamp<TAB>tipo<TAB>json[<TAB>client_timestamp]`,
+    com o estado completo (keyframe) ou o patch do registro anterior do
+    agente. Um índice em
+    memória por agente, ordenado por (timestamp, seq), localiza qualquer
+    intervalo com busca binária; ao abrir, ele é reconstruído lendo os
+    segmentos inteiros, mas só os cabeçalhos das linhas são decodificados.
+    O primeiro registro de um agente em cada segmento
+    é um keyframe, então a retenção apaga segmentos inteiros sem deixar
+    patches órfãos.
+    
+    Vários processos (workers) podem abrir o mesmo diretório: só quem tem o
+    lock de escrita grava; os demais são leitores, que acompanham os
+    segmentos a cada consulta e assumem a escrita se o escritor sair.
+    
+    `append` só enfileira: uma thread escritora grava os registros, então
+    quem chama (o loop do serviço) nunca espera pelo disco nem pelo lock do
+    índice. `load` (reconstrução do índice) e `query` também são feitos
+    para rodar fora do loop.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = SEGMENT_BYTES,
+        max_age: Optional[float] = MAX_AGE,
+        max_bytes: Optional[int] = MAX_BYTES,
+        keyframe_interval: int = KEYFRAME_INTERVAL
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.keyframe_interval = keyframe_interval
+        self._agents: Dict[str, _AgentIndex] = {}
+        self._last_seq: Dict[str, int] = {}
+        self._since_keyframe: Dict[str, Tuple[int, int]] = {}  # agente -> (segmento, registros desde o keyframe)
+        self._segments: "OrderedDict[int, List[float]]" = OrderedDict()  # segmento -> [bytes, último timestamp]
+        self._file = None
+        self._segment = 0
+        self._retention_checked = 0.0
+        self._loaded = False
+        self._lock_file = None
+        self._writer_checked = 0.0
+        self.writable = False
+        self._lock = threading.RLock()
+        self._pending: "queue.Queue" = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        # Registros enfileirados (pelo loop) e já processados (pela thread escritora)
+        self._enqueued = 0
+        self._written = 0
+        self._written_changed = threading.Condition()
+        self.dropped = 0
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:08d}.log")
+
+    def load(self):
+        """
+        Reconstrói o índice a partir dos segmentos em disco (lê todos, até
+        `max_bytes`, e decodifica o cabeçalho de cada linha); bloqueia, então
+        o serviço o chama numa thread ao iniciar.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            
+    def _ensure_loaded(self):
+        # Carregado no primeiro uso, não na importação do serviço
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._try_lock()
+        segments = self._segment_files()
+        for segment in segments:
+            self._load_segment(segment, truncate=self.writable)
+        self._segment = segments[-1] if segments else 1
+        if self.writable:
+            self._open_current()
+        self._loaded = True
+            
+    def _segment_files(self) -> List[int]:
+        return sorted(int(name[:-4]) for name in os.listdir(self.directory) if name.endswith(".log") and name[:-4].isdigit())
+        
+    def _try_lock(self) -> bool:
+        self._writer_checked = time.monotonic()
+        if fcntl is not None:
+            lock_file = open(os.path.join(self.directory, WRITER_LOCK), "a")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+        self.writable = True
+        return True
+        
+    def _open_current(self):
+        # O último registro em disco de cada agente pode não ser a base dos
+        # patches que chegarem (escritor anterior caiu, estado veio de outro
+        # worker): o próximo registro de cada um é keyframe
+        self._since_keyframe.clear()
+        self._segments.setdefault(self._segment, [0, 0.0])
+        self._file = open(self._path(self._segment), "ab")
+        self._enforce_retention()
+        
+    def _sync(self):
+        # Leitor: incorpora o que o escritor gravou (ou apagou) desde a última leitura
+        if self.writable:
+            return
+        segments = self._segment_files()
+        for segment in [segment for segment in self._segments if segment not in segments]:
+            self._forget_segment(segment)
+        for segment in segments:
+            offset = int(self._segments[segment][0]) if segment in self._segments else 0
+            self._load_segment(segment, offset, truncate=False)
+        if segments:
+            self._segment = segments[-1]
+            
+    def _take_over(self) -> bool:
+        # Leitor tenta, no máximo a cada WRITER_RETRY_INTERVAL, assumir a escrita
+        if time.monotonic() - self._writer_checked < WRITER_RETRY_INTERVAL or not self._try_lock():
+            return False
+        self.writable = False
+        self._sync()
+        self.writable = True
+        # O fim incompleto que o escritor anterior deixou é descartado
+        if self._segment in self._segments:
+            self._load_segment(self._segment, int(self._segments[self._segment][0]), truncate=True)
+        self._open_current()
+        logger.info(f"Escrita do histórico assumida em {self.directory}")
+        return True
+        
+    def _load_segment(self, segment: int, offset: int = 0, truncate: bool = True):
+        """
+        Indexa as linhas do segmento a partir de `offset`. O arquivo é lido
+        inteiro, mas só o cabeçalho de cada linha é decodificado. A leitura
+        para na primeira linha incompleta ou inválida; com `truncate`, o
+        arquivo é cortado ali.
+        """
+        path = self._path(segment)
+        last_time = self._segments[segment][1] if segment in self._segments else 0.0
+        try:
+            log = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with log:
+            log.seek(offset)
+            for line in log:
+                if not line.endswith(b"\n"):
+                    # Escrita interrompida (ou, para um leitor, ainda em curso)
+                    if truncate:
+                        logger.warning(f"Registro incompleto descartado em {path}")
+                    break
+                try:
+                    agent, seq, timestamp, kind, _ = line.split(b"\t", 4)
+                    agent_id, seq, epoch = json.loads(agent), int(seq), to_epoch(timestamp.decode())
+                    if not isinstance(agent_id, str):
+                        raise ValueError(f"agent_id inválido: {agent_id!r}")
+                except ValueError as e:
+                    # Linha corrompida: o resto do segmento é descartado como um fim incompleto
+                    if truncate:
+                        logger.warning(f"Registro inválido em {path} (byte {offset}): {e}; descartado com o resto do segmento")
+                    break
+                self._index(agent_id, seq, epoch, segment, offset, len(line), kind == KEYFRAME.encode())
+                offset += len(line)
+                last_time = max(last_time, epoch)
+        if truncate and offset != os.path.getsize(path):
+            with open(path, "r+b") as log:
+                log.truncate(offset)
+        self._segments[segment] = [offset, last_time]
+        
+    def _index(self, agent_id: str, seq: int, epoch: float, segment: int, offset: int, length: int, keyframe: bool):
+        if agent_id not in self._agents:
+            self._agents[agent_id] = _AgentIndex()
+        self._agents[agent_id].add(epoch, seq, segment, offset, length, keyframe)
+        self._last_seq[agent_id] = seq
+        _, count = self._since_keyframe.get(agent_id, (None, 0))
+        self._since_keyframe[agent_id] = (segment, 0 if keyframe else count + 1)
+
+    def last_seq(self, agent_id: str) -> int:
+        """
+        Último seq gravado do agente (0 se nenhum), para continuar a sequência
+        após reiniciar. Depois de `load`, só lê o índice, sem lock nem disco.
+        """
+        if not self._loaded:
+            self.load()
+        # Num leitor, agentes novos de outros workers chegam pelo broker, não pelo disco
+        return self._last_seq.get(agent_id, 0)
+
+    def append(self, agent_id: str, state_with_meta: Dict[str, Any], patch: Optional[Patch], base_seq: Optional[int] = None):
+        """
+        Enfileira um estado para a thread escritora e retorna sem esperar.
+        
+        `patch` leva do estado `base_seq` do agente ao novo; se o último
+        registro gravado do agente não for esse (ou `patch` for None), grava
+        um keyframe. Num processo leitor o registro é descartado: o escritor
+        recebe o mesmo estado e o grava. Com a fila cheia (disco lento), o
+        registro é descartado e contado em `dropped`. Chamado de uma só
+        thread (o loop do serviço).
+        """
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="agent-history-writer", daemon=True)
+            self._writer.start()
+        try:
+            self._pending.put_nowait((agent_id, state_with_meta, patch, base_seq))
+            self._enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 10000 == 0:
+                logger.warning(f"Fila do histórico cheia: {self.dropped} registros descartados em {self.directory}")
+
+    def flush(self):
+        """
+        Espera a thread escritora gravar o que já foi enfileirado. Registros
+        enfileirados depois da chamada não a prolongam.
+        """
+        target = self._enqueued
+        with self._written_changed:
+            self._written_changed.wait_for(lambda: self._written >= target or self._writer is None)
+
+    def _write_loop(self):
+        # Thread escritora: grava em lotes o que estiver na fila, com um flush por lote
+        while True:
+            batch = [self._pending.get()]
+            while batch[-1] is not None and len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            with self._lock:
+                for item in batch:
+                    try:
+                        if item is not None:
+                            self._append(*item)
+                    except Exception:
+                        logger.exception(f"Erro ao gravar o histórico em {self.directory}")
+                try:
+                    if self._file is not None:
+                        self._file.flush()
+                except OSError:
+                    logger.exception(f"Erro ao gravar o histórico em {self.directory}")
+            with self._written_changed:
+                self._written += sum(item is not None for item in batch)
+                self._written_changed.notify_all()
+            if batch[-1] is None:
+                return
+
+    def _append(self, agent_id: str, state_with_meta: Dict[str, Any], patch: Optional[Patch], base_seq: Optional[int]):
+        self._ensure_loaded()
+        if not self.writable and not self._take_over():
+            return
+        segment, count = self._since_keyframe.get(agent_id, (None, 0))
+        keyframe = (
+            patch is None or segment != self._segment or count + 1 >= self.keyframe_interval
+            # A base do patch não foi gravada (registro descartado ou de outro escritor)
+            or (base_seq is not None and self._last_seq.get(agent_id) != base_seq)
+        )
+        payload = state_with_meta["state"] if keyframe else patch
+        timestamp = state_with_meta["timestamp"]
+        fields = [
+            json.dumps(agent_id), str(state_with_meta["seq"]), timestamp,
+            KEYFRAME if keyframe else PATCH, json.dumps(payload)
+        ]
+        if state_with_meta.get("client_timestamp") is not None:
+            fields.append(json.dumps(state_with_meta["client_timestamp"]))
+        line = "\t".join(fields).encode() + b"\n"
+
+        info = self._segments[self._segment]
+        offset = int(info[0])
+        self._file.write(line)
+        epoch = to_epoch(timestamp)
+        info[0] += len(line)
+        info[1] = max(info[1], epoch)
+        self._index(agent_id, state_with_meta["seq"], epoch, self._segment, offset, len(line), keyframe)
+
+        if info[0] >= self.segment_bytes:
+            self._rotate()
+        elif time.monotonic() - self._retention_checked >= RETENTION_CHECK_INTERVAL:
+            self._enforce_retention()
+
+    def _rotate(self):
+        self._file.close()
+        self._segment += 1
+        self._segments[self._segment] = [0, 0.0]
+        self._file = open(self._path(self._segment), "ab")
+        self._enforce_retention()
+
+    def enforce_retention(self, now: Optional[float] = None):
+        """Apaga os segmentos mais antigos além de `max_bytes` ou mais velhos que `max_age` (nunca o atual)."""
+        self.flush()
+        self._enforce_retention(now)
+
+    def _enforce_retention(self, now: Optional[float] = None):
+        with self._lock:
+            if not self.writable:
+                return
+            self._retention_checked = time.monotonic()
+            now = time.time() if now is None else now
+            total = sum(info[0] for info in self._segments.values())
+            while len(self._segments) > 1:
+                segment, (size, last_time) = next(iter(self._segments.items()))
+                too_big = self.max_bytes is not None and total > self.max_bytes
+                too_old = self.max_age is not None and last_time < now - self.max_age
+                if not (too_big or too_old):
+                    break
+                self._drop_segment(segment)
+                total -= size
+
+    def _drop_segment(self, segment: int):
+        self._forget_segment(segment)
+        try:
+            os.remove(self._path(segment))
+        except FileNotFoundError:
+            pass
+            
+    def _forget_segment(self, segment: int):
+        del self._segments[segment]
+        for agent_id in list(self._agents):
+            index = self._agents[agent_id]
+            index.drop_segment(segment)
+            if not len(index):
+                del self._agents[agent_id]
+                
+    def query(
+        self,
+        agent_id: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        before_seq: Optional[int] = None,
+        limit: int = 20
+    ) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Os `limit` estados mais recentes do agente com timestamp em
+        [since, until) e seq menor que `before_seq`, em ordem cronológica,
+        e se há estados mais antigos no intervalo. Espera os registros já
+        enfileirados serem gravados e pode ler o disco: rode fora do loop.
+        """
+        self.flush()
+        with self._lock:
+            self._ensure_loaded()
+            self._sync()
+            index = self._agents.get(agent_id)
+            if index is None:
+                return [], False
+            low = bisect_left(index.times, since) if since is not None else 0
+            high = bisect_left(index.times, until) if until is not None else len(index)
+            if before_seq is not None:
+                high = min(high, bisect_left(index.seqs, before_seq))
+            if high <= low:
+                return [], False
+            start = max(low, high - limit) if limit > 0 else low
+            # Reconstrução a partir do keyframe anterior ao início da página
+            first = start
+            while first > 0 and not index.keyframes[first]:
+                first -= 1
+            positions = [
+                (index.segments[i], index.offsets[i], index.lengths[i]) for i in range(first, high)
+            ]
+
+        states = []
+        state = None
+        for position, record in enumerate(self._read(positions)):
+            if record is None:
+                # Segmento apagado pela retenção durante a leitura
+                state = None
+                continue
+            agent, seq, timestamp, kind, payload, client_timestamp = record
+            if kind == KEYFRAME:
+                state = payload
+            elif state is not None:
+                state = apply_patch(state, payload)
+            if state is not None and first + position >= start:
+                entry = {"state": state, "timestamp": timestamp, "seq": seq}
+                if client_timestamp is not None:
+                    entry["client_timestamp"] = client_timestamp
+                states.append(entry)
+        return states, start > low
+
+    def _read(self, positions: List[Tuple[int, int, int]]):
+        # Leitura fora do lock: só os bytes de cada registro pedido
+        handles = {}
+        try:
+            for segment, offset, length in positions:
+                if segment not in handles:
+                    try:
+                        handles[segment] = open(self._path(segment), "rb")
+                    except FileNotFoundError:
+                        handles[segment] = None
+                log = handles[segment]
+                if log is None:
+                    yield None
+                    continue
+                log.seek(offset)
+                agent, seq, timestamp, kind, payload, *client = log.read(length).split(b"\t", 5)
+                yield (json.loads(agent), int(seq), timestamp.decode(), kind.decode(), json.loads(payload),
+                       json.loads(client[0]) if client else None)
+        finally:
+            for log in handles.values():
+                if log is not None:
+                    log.close()
+
+    def stats(self) -> Dict[str, Any]:
+        self.flush()
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "bytes": int(sum(info[0] for info in self._segments.values())),
+                "agents": len(self._agents),
+                "records": sum(len(index) for index in self._agents.values()),
+                "dropped": self.dropped
+            }
+
+    def close(self):
+        """
+        Grava o que estiver na fila, para a thread escritora, fecha o segmento
+        atual e solta o lock de escrita; o próximo uso recarrega o índice do disco.
+        """
+        if self._writer is not None:
+            self._pending.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            self.writable = False
+            self._agents.clear()
+            self._last_seq.clear()
+            self._since_keyframe.clear()
+            self._segments.clear()
+            self._loaded = False
@@ -1,96 +1,673 @@
+import os
 import json
 import asyncio
 import logging
+from functools import partial
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterable, Optional, Sequence, Set
+
+from .agent_broker import DEFAULT_BROKER_URL, AgentBroker, InProcessBroker, create_broker
+from .agent_history_store import DEFAULT_HISTORY_DIR, AgentHistoryLog, datetime_to_epoch, to_epoch
+from .agent_state_delta import DeltaHistory, diff_state
+from .agent_subscriptions import ALL, SubscriptionIndex, format_topic, parse_topic
 
 logger = logging.getLogger(__name__)
 
+# Políticas para quando a fila de envio de um cliente está cheia
+DROP_OLDEST = "drop_oldest"   # descarta a mensagem mais antiga da fila
+COALESCE = "coalesce"         # substitui a atualização pendente do mesmo agente
+DISCONNECT = "disconnect"     # desconecta o cliente lento
+OVERFLOW_POLICIES = (DROP_OLDEST, COALESCE, DISCONNECT)
+
+# Mensagens pendentes por cliente, política de estouro e tempo máximo (s) de um envio
+DEFAULT_QUEUE_SIZE = int(os.environ.get("AGENT_WS_QUEUE_SIZE", "256"))
+DEFAULT_OVERFLOW_POLICY = os.environ.get("AGENT_WS_OVERFLOW", DROP_OLDEST)
+DEFAULT_SEND_TIMEOUT = float(os.environ.get("AGENT_WS_SEND_TIMEOUT", "10"))
+
+# Janela (s) em que atualizações de um agente são agrupadas num state_batch; 0 desativa
+DEFAULT_BATCH_WINDOW = float(os.environ.get("AGENT_WS_BATCH_WINDOW", "0.1"))
+
+# Campos cuja mudança é enviada na hora, sem esperar a janela
+URGENT_FIELDS = ("status",)
+
+# Codificação das atualizações por cliente: estado completo ou patches com número de sequência
+FULL = "full"
+DELTA = "delta"
+ENCODINGS = (FULL, DELTA)
+
+# Estados guardados em memória por agente (a cauda do histórico) e intervalo entre keyframes
+HISTORY_SIZE = 100
+HISTORY_KEYFRAME_INTERVAL = int(os.environ.get("AGENT_HISTORY_KEYFRAME_INTERVAL", "20"))
+
+# Registros aceitos num lote (POST /api/agents/states ou uma mensagem da ingestão websocket)
+MAX_BATCH_RECORDS = int(os.environ.get("AGENT_MAX_BATCH_RECORDS", "1000"))
+
+_MISSING = object()
+
+def parse_state_records(payload: Any) -> List[Dict[str, Any]]:
+    """
+    Valida um lote de estados: uma lista de {"agent_id", "state", "client_timestamp"?},
+    um único registro, ou {"records": [...]}. Levanta ValueError, sem aplicar
+    nada, se algum registro for inválido.
+    """
+    if isinstance(payload, dict):
+        payload = payload["records"] if "records" in payload else [payload]
+    if not isinstance(payload, list):
+        raise ValueError("Esperada uma lista de registros")
+    if len(payload) > MAX_BATCH_RECORDS:
+        raise ValueError(f"Lote com {len(payload)} registros; máximo {MAX_BATCH_RECORDS}")
+    for position, record in enumerate(payload):
+        if not isinstance(record, dict):
+            raise ValueError(f"Registro {position}: esperado um objeto")
+        if not isinstance(record.get("agent_id"), str) or not record["agent_id"]:
+            raise ValueError(f"Registro {position}: agent_id ausente ou inválido")
+        if not isinstance(record.get("state"), dict):
+            raise ValueError(f"Registro {position}: state deve ser um objeto")
+        client_timestamp = record.get("client_timestamp")
+        if client_timestamp is not None and (isinstance(client_timestamp, bool) or not isinstance(client_timestamp, (str, int, float))):
+            raise ValueError(f"Registro {position}: client_timestamp inválido")
+    return payload
+
+class ClientConnection:
+    """
+    Fila de envio limitada de um cliente websocket, esvaziada por uma tarefa
+    escritora própria. Quem publica só enfileira, então um cliente lento
+    atrasa apenas a si mesmo.
+    """
+    
+    def __init__(self, websocket, on_failure, queue_size: int, overflow_policy: str, send_timeout: float, encoding: str = FULL):
+        self.websocket = websocket
+        self.encoding = encoding
+        self.queue = deque()  # (agent_id, mensagem serializada)
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        # Clientes delta: última versão enviada de cada agente, base do próximo patch.
+        # Com inscrições por campo ou papel ela não é a última difundida
+        self.sent: Dict[str, Dict] = {}
+        self.dropped = 0
+        self.closed = False
+        self._on_failure = on_failure
+        self._ready = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_loop())
+        
+    def enqueue(self, message: str, agent_id: Optional[str] = None) -> bool:
+        """Enfileira sem bloquear; retorna False se o cliente deve ser desconectado."""
+        if self.closed:
+            return False
+        if len(self.queue) >= self.queue_size:
+            if self.overflow_policy == DISCONNECT:
+                return False
+            self.dropped += 1
+            if not self._coalesce(agent_id):
+                self.queue.popleft()
+        self.queue.append((agent_id, message))
+        self._ready.set()
+        return True
+        
+    def _coalesce(self, agent_id: Optional[str]) -> bool:
+        # O estado mais novo de um agente torna o pendente obsoleto
+        if self.overflow_policy != COALESCE or agent_id is None:
+            return False
+        for index, (queued_agent, _) in enumerate(self.queue):
+            if queued_agent == agent_id:
+                del self.queue[index]
+                return True
+        return False
+        
+    async def _write_loop(self):
+        try:
+            while True:
+                while not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                _, message = self.queue.popleft()
+                await self._send(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao enviar mensagem: {e}")
+            await self._on_failure(self.websocket)
+            
+    async def _send(self, message: str):
+        # asyncio.wait em vez de wait_for: este pode engolir o cancelamento da
+        # tarefa escritora quando ele chega junto com o fim do envio
+        send = asyncio.ensure_future(self.websocket.send_text(message))
+        try:
+            done, _ = await asyncio.wait({send}, timeout=self.send_timeout)
+        finally:
+            if not send.done():
+                send.cancel()
+        if not done:
+            raise asyncio.TimeoutError(f"Envio excedeu {self.send_timeout}s")
+        send.result()
+        
+    async def close(self, code: Optional[int] = None):
+        """Para a tarefa escritora; com `code`, também fecha o websocket."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+        if code is not None:
+            try:
+                await asyncio.wait_for(self.websocket.close(code=code), timeout=self.send_timeout)
+            except Exception:
+                pass
+
 class AgentMonitorService:
     """Serviço para monitorar estados dos agentes e enviar atualizações em tempo real."""
     
-    def __init__(self):
-        self.connected_clients = set()
+    def __init__(
+        self,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        overflow_policy: str = DEFAULT_OVERFLOW_POLICY,
+        send_timeout: float = DEFAULT_SEND_TIMEOUT,
+        batch_window: float = DEFAULT_BATCH_WINDOW,
+        urgent_fields: Sequence[str] = URGENT_FIELDS,
+        history_dir: Optional[str] = None,
+        broker: Optional[AgentBroker] = None
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Política de estouro desconhecida: {overflow_policy}")
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self.batch_window = batch_window
+        self.urgent_fields = tuple(urgent_fields)
+        self.pending_updates: Dict[str, Dict] = {}  # Último estado de cada agente ainda não enviado
+        self.pending_fields: Dict[str, Set[str]] = {}  # Campos alterados desde o último envio
+        self._flush_task: Optional[asyncio.Task] = None
+        self.connected_clients: Dict[Any, ClientConnection] = {}
+        self.subscriptions = SubscriptionIndex()
+        self._default_subscribers: Set[Any] = set()  # Clientes que ainda recebem tudo por padrão
         self.agent_states = {}
-        self.state_history = {}  # Armazena histórico de estados para cada agente
+        self.broadcast_states: Dict[str, Dict] = {}  # Última versão de cada agente enviada aos clientes
+        self.state_history: Dict[str, DeltaHistory] = {}  # Armazena histórico de estados para cada agente
+        # Histórico completo em disco; sem diretório, só a cauda em memória
+        self.history_log = AgentHistoryLog(history_dir) if history_dir else None
+        # Atualizações passam pelo broker, que as entrega a todos os workers (este incluído)
+        self.broker = broker or InProcessBroker()
+        self._broker_started: Optional[asyncio.Future] = None
+        self._published_seqs: Dict[str, int] = {}  # Último seq publicado por este worker, por agente
+        self.disconnected_slow_clients = 0
+        
+    async def start(self):
+        """Carrega o índice do histórico em disco e conecta ao broker (também feito no primeiro uso)."""
+        await self._ensure_broker()
+        
+    async def _ensure_broker(self):
+        # Iniciado no primeiro uso, já com um loop rodando
+        if self._broker_started is None:
+            self._broker_started = asyncio.ensure_future(self._start())
+        try:
+            await asyncio.shield(self._broker_started)
+        except Exception:
+            self._broker_started = None
+            raise
+            
+    async def _start(self):
+        if self.history_log:
+            # O índice é reconstruído lendo os segmentos (até AGENT_HISTORY_MAX_BYTES): numa thread
+            await asyncio.get_running_loop().run_in_executor(None, self.history_log.load)
+        await self.broker.start(self._apply_update, self._broker_snapshot)
+            
+    def _broker_snapshot(self) -> List[Dict[str, Any]]:
+        return [{"agent_id": agent_id, "state": state} for agent_id, state in self.agent_states.items()]
+        
+    async def close(self):
+        """Para o broker e fecha o histórico em disco."""
+        if self._broker_started is not None:
+            self._broker_started = None
+            await self.broker.close()
+        if self.history_log:
+            # Grava a fila pendente e fecha o segmento numa thread
+            await asyncio.get_running_loop().run_in_executor(None, self.history_log.close)
         
-    async def register_client(self, websocket):
-        """Registra um novo cliente websocket."""
-        self.connected_clients.add(websocket)
+    async def register_client(self, websocket, topics: Optional[Iterable[str]] = None, encoding: str = FULL):
+        """
+        Registra um novo cliente websocket.
+        
+        Sem `topics` o cliente recebe todos os agentes até sua primeira
+        inscrição; com `topics` (ex.: ["pattern:team-3-*"]) recebe só esses.
+        Com encoding="delta" as atualizações chegam como patches (state_delta).
+        Levanta ValueError para tópicos ou codificação inválidos.
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Codificação desconhecida: {encoding}")
+        parsed = None if topics is None else [parse_topic(topic) for topic in topics]
+        await self._ensure_broker()
+        self.connected_clients[websocket] = ClientConnection(
+            websocket, self.unregister_client, self.queue_size, self.overflow_policy, self.send_timeout, encoding
+        )
+        self.subscriptions.add_client(websocket, parsed)
+        if parsed is None:
+            self._default_subscribers.add(websocket)
         # Envia o estado atual para o novo cliente
         await self.send_current_states(websocket)
         logger.info(f"Cliente registrado. Total de clientes: {len(self.connected_clients)}")
         
-    async def unregister_client(self, websocket):
-        """Remove um cliente websocket."""
-        self.connected_clients.remove(websocket)
+    async def unregister_client(self, websocket, code: Optional[int] = None):
+        """Remove um cliente websocket (chamadas repetidas são ignoradas)."""
+        connection = self.connected_clients.pop(websocket, None)
+        if connection is None:
+            return
+        self.subscriptions.remove_client(websocket)
+        self._default_subscribers.discard(websocket)
+        await connection.close(code)
         logger.info(f"Cliente desconectado. Total de clientes: {len(self.connected_clients)}")
         
-    async def update_agent_state(self, agent_id: str, state: Dict):
-        """Atualiza o estado de um agente e notifica os clientes."""
+    async def handle_client_message(self, websocket, text: str):
+        """
+        Processa um comando do cliente:
+        {"action": "subscribe" | "unsubscribe", "topics": ["agent:a1", "pattern:team-3-*", "role:planner", "field:status"]}
+        {"action": "resync", "agents": ["a1"]}
+        
+        A primeira inscrição de um cliente que recebia tudo restringe o que
+        ele recebe aos tópicos pedidos ("all" volta a receber tudo). Após uma
+        inscrição, o cliente recebe o estado atual dos agentes recém-cobertos.
+        "resync" reenvia o estado completo dos agentes pedidos (todos os
+        inscritos, sem "agents"), usado quando um cliente delta vê um salto
+        na sequência.
+        """
+        connection = self.connected_clients.get(websocket)
+        if connection is None:
+            return
+        try:
+            command = json.loads(text)
+            action = command.get("action")
+            if action == "resync":
+                agents = command.get("agents")
+                await self.resync_client(websocket, [agents] if isinstance(agents, str) else agents)
+                return
+            topics = command.get("topics", [])
+            if isinstance(topics, str):
+                topics = [topics]
+            parsed = [parse_topic(topic) for topic in topics]
+            if action not in ("subscribe", "unsubscribe"):
+                raise ValueError(f"Ação desconhecida: {action!r}")
+        except (ValueError, AttributeError, TypeError) as e:
+            connection.enqueue(json.dumps({"type": "error", "message": str(e)}))
+            return
+        
+        if action == "subscribe":
+            if websocket in self._default_subscribers:
+                self._default_subscribers.discard(websocket)
+                self.subscriptions.unsubscribe(websocket, [(ALL, "")])
+            added = self.subscriptions.subscribe(websocket, parsed)
+            if added:
+                await self.send_current_states(websocket, added)
+        else:
+            self._default_subscribers.discard(websocket)
+            self.subscriptions.unsubscribe(websocket, parsed)
+        
+        connection.enqueue(json.dumps({
+            "type": "subscriptions",
+            "topics": sorted(format_topic(topic) for topic in self.subscriptions.client_topics[websocket])
+        }))
+        
+    async def update_agent_state(self, agent_id: str, state: Dict, immediate: bool = False):
+        """
+        Atualiza o estado de um agente e notifica os clientes.
+        
+        O estado é publicado no broker, que o entrega a todos os workers;
+        cada um notifica os próprios clientes. A notificação espera a janela
+        de agrupamento, a menos que `immediate` seja True ou que algum dos
+        campos urgentes (ex.: status) tenha mudado.
+        """
+        await self._ensure_broker()
+        await self.broker.publish({
+            "agent_id": agent_id,
+            "state": self._stamp(agent_id, state, datetime.utcnow().isoformat()),
+            "immediate": immediate
+        })
+        
+    async def update_agent_states(self, records: Sequence[Dict[str, Any]], immediate: bool = False) -> int:
+        """
+        Aplica um lote de estados, de um ou vários agentes, como uma unidade.
+        
+        O lote é validado inteiro antes (ValueError se algum registro for
+        inválido) e vai ao broker numa única publicação. Cada worker aplica
+        todos os registros sem ceder o loop, em ordem, e os clientes recebem
+        o último estado de cada agente num mesmo state_batch; o histórico
+        guarda todos. O envio segue a regra de update_agent_state: na hora
+        se `immediate` ou se algum campo urgente mudou, senão ao fim da
+        janela. `client_timestamp`, se houver, acompanha o estado.
+        Retorna quantos registros foram aplicados.
+        """
+        return await self.publish_state_records(parse_state_records(list(records)), immediate)
+
+    async def publish_state_records(self, records: List[Dict[str, Any]], immediate: bool = False) -> int:
+        """Como update_agent_states, para registros já validados por parse_state_records."""
+        if not records:
+            return 0
+        await self._ensure_broker()
         timestamp = datetime.utcnow().isoformat()
+        await self.broker.publish({"updates": [
+            {
+                "agent_id": record["agent_id"],
+                "state": self._stamp(record["agent_id"], record["state"], timestamp, record.get("client_timestamp"))
+            }
+            for record in records
+        ], "immediate": immediate})
+        return len(records)
         
-        # Adiciona timestamp ao estado
+    def _stamp(self, agent_id: str, state: Dict, timestamp: str, client_timestamp: Any = None) -> Dict[str, Any]:
+        # Adiciona timestamp e número de sequência (por agente) ao estado;
+        # após reiniciar, a sequência continua a do histórico em disco. Conta
+        # também o que este worker publicou e o broker ainda não entregou
+        previous = self.agent_states.get(agent_id)
+        if previous:
+            seq = previous["seq"]
+        else:
+            seq = self.history_log.last_seq(agent_id) if self.history_log else 0
+        seq = max(seq, self._published_seqs.get(agent_id, 0)) + 1
+        self._published_seqs[agent_id] = seq
         state_with_meta = {
             "state": state,
-            "timestamp": timestamp
+            "timestamp": timestamp,
+            "seq": seq
         }
+        if client_timestamp is not None:
+            state_with_meta["client_timestamp"] = client_timestamp
+        return state_with_meta
+        
+    async def _apply_update(self, message: Dict[str, Any]):
+        """Aplica uma atualização (ou lote) entregue pelo broker, publicada por este ou outro worker."""
+        if "updates" in message:
+            # Lote: todos os registros aplicados antes de qualquer envio; vão
+            # juntos no mesmo state_batch, agora ou ao fim da janela
+            urgent = message.get("immediate") or self.batch_window <= 0
+            for update in message["updates"]:
+                applied = self._record_update(update["agent_id"], update["state"])
+                if applied is not None:
+                    state_with_meta, previous, changed_fields = applied
+                    urgent = urgent or self._is_urgent(previous, state_with_meta["state"])
+                    self.pending_updates[update["agent_id"]] = state_with_meta
+                    self.pending_fields.setdefault(update["agent_id"], set()).update(changed_fields)
+            if urgent:
+                await self.flush_pending()
+            elif self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_after(self.batch_window))
+            return
+        
+        agent_id = message["agent_id"]
+        applied = self._record_update(agent_id, message["state"], message.get("replay", False))
+        if applied is None:
+            return
+        state_with_meta, previous, changed_fields = applied
+        
+        # Notifica os clientes deste worker
+        if message.get("immediate") or self.batch_window <= 0 or self._is_urgent(previous, state_with_meta["state"]):
+            # O estado novo torna obsoleto o que estava esperando a janela
+            self.pending_updates.pop(agent_id, None)
+            changed_fields |= self.pending_fields.pop(agent_id, set())
+            await self.broadcast_update(agent_id, state_with_meta, changed_fields)
+        else:
+            self.pending_updates[agent_id] = state_with_meta
+            self.pending_fields.setdefault(agent_id, set()).update(changed_fields)
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_after(self.batch_window))
+                
+    def _record_update(self, agent_id: str, state_with_meta: Dict[str, Any], replay: bool = False):
+        # Estado atual e histórico; retorna (estado, anterior, campos alterados) ou None se ignorado
+        state = state_with_meta["state"]
+        previous = self.agent_states.get(agent_id)
+        if previous and state_with_meta["seq"] <= previous["seq"]:
+            if replay:
+                # Estado atual de quem entrou depois, já conhecido aqui
+                return None
+            # Dois workers publicaram o agente ao mesmo tempo: vale a ordem do broker
+            state_with_meta = {**state_with_meta, "seq": previous["seq"] + 1}
+        changed_fields = self._changed_fields(previous, state)
+        self.subscriptions.note_agent(agent_id, state)
         
         # Atualiza o estado atual
         self.agent_states[agent_id] = state_with_meta
         
-        # Adiciona ao histórico
+        # Adiciona ao histórico: keyframes periódicos e, entre eles, só o patch
+        # do estado anterior (limitado a HISTORY_SIZE estados por agente)
         if agent_id not in self.state_history:
-            self.state_history[agent_id] = []
+            self.state_history[agent_id] = DeltaHistory(HISTORY_SIZE, HISTORY_KEYFRAME_INTERVAL)
+        patch = diff_state(previous["state"], state) if previous else None
+        self.state_history[agent_id].append(state_with_meta, patch)
+        if self.history_log and not replay:
+            # Só enfileira para a thread escritora; só o worker com o lock do log grava
+            self.history_log.append(agent_id, state_with_meta, patch, previous["seq"] if previous else None)
+        return state_with_meta, previous, changed_fields
         
-        # Limita o histórico a 100 estados por agente
-        if len(self.state_history[agent_id]) >= 100:
-            self.state_history[agent_id].pop(0)
-            
-        self.state_history[agent_id].append(state_with_meta)
+    @staticmethod
+    def _changed_fields(previous: Optional[Dict], state: Dict) -> Set[str]:
+        if previous is None:
+            return set(state)
+        old = previous["state"]
+        return {field for field in state.keys() | old.keys() if state.get(field, _MISSING) != old.get(field, _MISSING)}
         
-        # Notifica todos os clientes
-        await self.broadcast_update(agent_id, state_with_meta)
+    def _is_urgent(self, previous: Optional[Dict], state: Dict) -> bool:
+        if previous is None:
+            return True
+        return any(state.get(field) != previous["state"].get(field) for field in self.urgent_fields)
         
-    async def broadcast_update(self, agent_id: str, state: Dict):
-        """Envia uma atualização para todos os clientes conectados."""
-        message = json.dumps({
-            "type": "state_update",
-            "agent_id": agent_id,
-            "data": state
-        })
+    async def _flush_after(self, delay: float):
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._flush_task = None
+        await self.flush_pending()
         
-        disconnect_clients = set()
-        for websocket in self.connected_clients:
-            try:
-                await websocket.send(message)
-            except Exception as e:
-                logger.error(f"Erro ao enviar mensagem: {e}")
-                disconnect_clients.add(websocket)
-                
-        # Remove clientes desconectados
-        for websocket in disconnect_clients:
-            await self.unregister_client(websocket)
+    async def flush_pending(self):
+        """Envia num único state_batch o último estado de cada agente pendente."""
+        if not self.pending_updates:
+            return
+        batch, self.pending_updates = self.pending_updates, {}
+        fields, self.pending_fields = self.pending_fields, {}
+        
+        # Agrupa os clientes pelo conjunto de agentes que lhes interessa:
+        # uma serialização por conjunto distinto
+        wanted: Dict[Any, List[str]] = {}
+        for agent_id in batch:
+            for websocket in self.subscriptions.recipients(agent_id, fields.get(agent_id, ())):
+                wanted.setdefault(websocket, []).append(agent_id)
+        groups: Dict[tuple, List[Any]] = {}
+        bases: Dict[tuple, Optional[Dict]] = {}  # (agente, seq da base) -> versão base
+        for websocket, agent_ids in wanted.items():
+            connection = self.connected_clients[websocket]
+            if connection.encoding == DELTA:
+                # Clientes delta recebem, por agente, o patch desde a versão que
+                # cada um recebeu por último: agrupados também por essas bases
+                keys = []
+                for agent_id in agent_ids:
+                    base = connection.sent.get(agent_id)
+                    keys.append((agent_id, base["seq"] if base else None))
+                    bases[keys[-1]] = base
+                    connection.sent[agent_id] = batch[agent_id]
+                groups.setdefault((DELTA, tuple(keys)), []).append(websocket)
+            else:
+                groups.setdefault((FULL, tuple(agent_ids)), []).append(websocket)
+        self.broadcast_states.update(batch)
+        
+        deltas = {key: self._delta_entry(batch[key[0]], base) for key, base in bases.items()}
+        for (encoding, agents), websockets in groups.items():
+            if encoding == DELTA:
+                data = {key[0]: deltas[key] for key in agents}
+            else:
+                data = {agent_id: batch[agent_id] for agent_id in agents}
+            message = json.dumps({
+                "type": "state_batch",
+                "data": data
+            })
+            self._enqueue_all(message, clients=websockets)
+        
+    async def broadcast_update(self, agent_id: str, state: Dict, changed_fields: Optional[Iterable[str]] = None):
+        """
+        Enfileira uma atualização para os clientes inscritos no agente.
+        
+        A mensagem é serializada uma vez por conteúdo distinto e nenhum envio
+        é aguardado aqui: cada cliente tem sua fila e sua tarefa escritora.
+        Clientes delta recebem o patch desde a versão que cada um recebeu por
+        último (o estado completo se nunca recebeu o agente). Sem
+        `changed_fields`, todos os campos do estado contam como alterados.
+        """
+        self.broadcast_states[agent_id] = state
+        clients = self.subscriptions.recipients(agent_id, state["state"] if changed_fields is None else changed_fields)
+        if not clients:
+            return
+        
+        full_clients: List[Any] = []
+        by_base: Dict[Optional[int], List[Any]] = {}
+        bases: Dict[Optional[int], Dict] = {}
+        for websocket in clients:
+            connection = self.connected_clients.get(websocket)
+            if connection is None:
+                continue
+            base = connection.sent.get(agent_id) if connection.encoding == DELTA else None
+            if base is None:
+                full_clients.append(websocket)
+            else:
+                by_base.setdefault(base["seq"], []).append(websocket)
+                bases[base["seq"]] = base
+            if connection.encoding == DELTA:
+                connection.sent[agent_id] = state
+        
+        if full_clients:
+            message = json.dumps({
+                "type": "state_update",
+                "agent_id": agent_id,
+                "data": state
+            })
+            self._enqueue_all(message, agent_id, full_clients)
+        for base_seq, websockets in by_base.items():
+            message = json.dumps({
+                "type": "state_delta",
+                "agent_id": agent_id,
+                "data": self._delta_entry(state, bases[base_seq])
+            })
+            self._enqueue_all(message, agent_id, websockets)
             
-    async def send_current_states(self, websocket):
-        """Envia todos os estados atuais para um cliente específico."""
+    @staticmethod
+    def _delta_entry(state: Dict, base: Optional[Dict]) -> Dict:
+        # Patch desde a versão base; sem ela, o estado completo
+        if base is None:
+            return state
+        return {
+            "seq": state["seq"],
+            "base": base["seq"],
+            "timestamp": state["timestamp"],
+            "patch": diff_state(base["state"], state["state"])
+        }
+        
+    def _enqueue_all(self, message: str, agent_id: Optional[str] = None, clients: Optional[Iterable[Any]] = None):
+        connections = self.connected_clients
+        slow_clients = [
+            websocket
+            for websocket in (connections if clients is None else clients)
+            if websocket in connections and not connections[websocket].enqueue(message, agent_id)
+        ]
+        
+        # Política "disconnect": clientes com a fila cheia são desconectados
+        # (1013: tente novamente mais tarde), sem esperar pelo fechamento
+        for websocket in slow_clients:
+            self.disconnected_slow_clients += 1
+            asyncio.create_task(self.unregister_client(websocket, code=1013))
+            
+    async def send_current_states(self, websocket, topics: Optional[Iterable] = None):
+        """Envia a um cliente o estado atual dos agentes cobertos por `topics` (padrão: suas inscrições)."""
+        topics = set(self.subscriptions.client_topics.get(websocket, ()) if topics is None else topics)
+        # As versões já enviadas, para que os próximos patches partam delas
+        if (ALL, "") in topics:
+            states = self.broadcast_states
+        else:
+            states = {
+                agent_id: state
+                for agent_id, state in self.broadcast_states.items()
+                if self.subscriptions.matches(topics, agent_id, state["state"])
+            }
         message = json.dumps({
             "type": "full_state",
-            "data": self.agent_states
+            "data": states
         })
         
-        try:
-            await websocket.send(message)
-        except Exception as e:
-            logger.error(f"Erro ao enviar estados atuais: {e}")
+        connection = self.connected_clients.get(websocket)
+        if connection is None or not connection.enqueue(message):
+            logger.error("Erro ao enviar estados atuais: cliente não registrado ou com a fila cheia")
+        elif connection.encoding == DELTA:
+            connection.sent.update(states)
+            
+    async def resync_client(self, websocket, agents: Optional[Iterable[str]] = None):
+        """Reenvia a um cliente o estado completo dos agentes pedidos (padrão: todos os inscritos)."""
+        if not agents:
+            await self.send_current_states(websocket)
+            return
+        connection = self.connected_clients.get(websocket)
+        topics = self.subscriptions.client_topics.get(websocket, ())
+        states = {
+            agent_id: self.broadcast_states[agent_id]
+            for agent_id in agents
+            if agent_id in self.broadcast_states
+            and self.subscriptions.matches(topics, agent_id, self.broadcast_states[agent_id]["state"])
+        }
+        if connection is not None and connection.enqueue(json.dumps({"type": "full_state", "data": states})):
+            if connection.encoding == DELTA:
+                connection.sent.update(states)
             
     def get_agent_history(self, agent_id: str, limit: int = 20) -> List[Dict]:
         """Recupera o histórico de estados de um agente."""
         if agent_id not in self.state_history:
             return []
         
-        history = self.state_history[agent_id]
-        return history[-limit:] if limit > 0 else history
+        return self.state_history[agent_id].states(limit)
+        
+    async def query_agent_history(
+        self,
+        agent_id: str,
+        limit: int = 20,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        before_seq: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Uma página do histórico de um agente: os `limit` estados mais recentes
+        com timestamp em [since, until) e seq menor que `before_seq`, em ordem
+        cronológica. "nextCursor" é o `before_seq` da página anterior a esta.
+        
+        A cauda em memória atende a página quando a cobre; senão ela é lida
+        do log em disco numa thread.
+        """
+        start, end = datetime_to_epoch(since), datetime_to_epoch(until)
+        hot = self.state_history.get(agent_id)
+        matching = [
+            entry for entry in (hot.states() if hot else [])
+            if (start is None or to_epoch(entry["timestamp"]) >= start)
+            and (end is None or to_epoch(entry["timestamp"]) < end)
+            and (before_seq is None or entry["seq"] < before_seq)
+        ]
+        if self.history_log is None or len(matching) > limit:
+            page, more = matching[-limit:], len(matching) > limit
+        else:
+            page, more = await asyncio.get_running_loop().run_in_executor(
+                None, partial(self.history_log.query, agent_id, start, end, before_seq, limit)
+            )
+        return {
+            "history": page,
+            "nextCursor": str(page[0]["seq"]) if more and page else None
+        }
+        
+    def get_fanout_stats(self) -> Dict[str, Any]:
+        """Fila pendente e mensagens descartadas dos clientes conectados."""
+        connections = list(self.connected_clients.values())
+        return {
+            "clients": len(connections),
+            "overflow_policy": self.overflow_policy,
+            "queued": sum(len(connection.queue) for connection in connections),
+            "max_queued": max((len(connection.queue) for connection in connections), default=0),
+            "dropped": sum(connection.dropped for connection in connections),
+            "pending_agents": len(self.pending_updates),
+            "topics": len(self.subscriptions.topics),
+            "disconnected_slow_clients": self.disconnected_slow_clients
+        }
 
 # Instância global do serviço
-monitor_service = AgentMonitorService()
+monitor_service = AgentMonitorService(history_dir=DEFAULT_HISTORY_DIR or None, broker=create_broker(DEFAULT_BROKER_URL))
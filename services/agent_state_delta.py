@@ -0,0 +1,130 @@
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Operações no estilo JSON Patch (RFC 6902) com caminhos JSON Pointer (RFC 6901)
+Patch = List[Dict[str, Any]]
+
+def _escape(key: str) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+def diff_state(previous: Any, current: Any, path: str = "") -> Patch:
+    """
+    Operações que levam `previous` a `current`.
+
+    Dicts são comparados recursivamente, então só as folhas alteradas entram
+    no patch. Listas que apenas cresceram (ex.: logs de mensagens) viram
+    "add" em "/-"; qualquer outra mudança de lista a substitui inteira.
+    """
+    if isinstance(previous, dict) and isinstance(current, dict):
+        patch: Patch = []
+        for key, value in current.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in previous:
+                patch.append({"op": "add", "path": child, "value": value})
+            elif value is not previous[key]:
+                patch.extend(diff_state(previous[key], value, child))
+        for key in previous:
+            if key not in current:
+                patch.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        return patch
+    if (isinstance(previous, list) and isinstance(current, list)
+            and len(current) > len(previous) and current[:len(previous)] == previous):
+        return [{"op": "add", "path": f"{path}/-", "value": value} for value in current[len(previous):]]
+    if previous == current and type(previous) is type(current):
+        return []
+    return [{"op": "replace", "path": path, "value": current}]
+
+def apply_patch(document: Any, patch: Patch) -> Any:
+    """
+    Aplica `patch` sem alterar `document`.
+
+    Só os containers no caminho de cada operação são copiados; o resto é
+    compartilhado com o documento original.
+    """
+    for operation in patch:
+        tokens = [_unescape(token) for token in operation["path"].split("/")[1:]]
+        if not tokens:
+            document = operation.get("value")
+            continue
+        document = _apply(document, tokens, operation)
+    return document
+
+def _apply(container: Any, tokens: List[str], operation: Dict[str, Any]) -> Any:
+    token = tokens[0]
+    container = list(container) if isinstance(container, list) else dict(container)
+    if isinstance(container, list):
+        index = len(container) if token == "-" else int(token)
+        if len(tokens) > 1:
+            container[index] = _apply(container[index], tokens[1:], operation)
+        elif operation["op"] == "remove":
+            del container[index]
+        elif operation["op"] == "add":
+            container.insert(index, operation["value"])
+        else:
+            container[index] = operation["value"]
+        return container
+    if len(tokens) > 1:
+        container[token] = _apply(container[token], tokens[1:], operation)
+    elif operation["op"] == "remove":
+        container.pop(token, None)
+    else:
+        container[token] = operation["value"]
+    return container
+
+class DeltaHistory:
+    """
+    Histórico de estados de um agente como keyframes periódicos mais patches.
+
+    Cada entrada guarda "seq" e "timestamp" e, ou o estado completo
+    ("state", a cada `keyframe_interval` entradas), ou o "patch" da entrada
+    anterior. A primeira entrada é sempre um keyframe: ao descartar a mais
+    antiga, a seguinte é materializada.
+    """
+
+    def __init__(self, max_entries: int = 100, keyframe_interval: int = 20):
+        self.max_entries = max_entries
+        self.keyframe_interval = keyframe_interval
+        self.entries: Deque[Dict[str, Any]] = deque()
+        self._since_keyframe = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, state_with_meta: Dict[str, Any], patch: Optional[Patch]):
+        """Adiciona um estado; `patch` o leva do estado anterior a este (None força keyframe)."""
+        entry = {key: value for key, value in state_with_meta.items() if key != "state"}
+        if patch is None or not self.entries or self._since_keyframe + 1 >= self.keyframe_interval:
+            entry["state"] = state_with_meta["state"]
+            self._since_keyframe = 0
+        else:
+            entry["patch"] = patch
+            self._since_keyframe += 1
+        self.entries.append(entry)
+
+        if len(self.entries) > self.max_entries:
+            dropped = self.entries.popleft()
+            head = self.entries[0]
+            if "patch" in head:
+                head["state"] = apply_patch(dropped["state"], head.pop("patch"))
+
+    def states(self, limit: int = 0) -> List[Dict[str, Any]]:
+        """Os últimos `limit` estados (todos se limit <= 0) como {"state", "timestamp", "seq"}."""
+        entries = list(self.entries)
+        if not entries:
+            return []
+        start = max(len(entries) - limit, 0) if limit > 0 else 0
+        # Reconstrói a partir do último keyframe antes do início pedido
+        keyframe = start
+        while "state" not in entries[keyframe]:
+            keyframe -= 1
+        states = []
+        state = None
+        for index in range(keyframe, len(entries)):
+            entry = entries[index]
+            state = entry["state"] if "state" in entry else apply_patch(state, entry["patch"])
+            if index >= start:
+                states.append({**{key: value for key, value in entry.items() if key != "patch"}, "state": state})
+        return states
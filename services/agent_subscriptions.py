@@ -0,0 +1,124 @@
+import fnmatch
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Tipos de tópico aceitos pelo protocolo de inscrição do /ws/agents
+ALL = "all"            # todas as atualizações (padrão de um cliente novo)
+AGENT = "agent"        # agent:<agent_id>
+PATTERN = "pattern"    # pattern:<glob sobre agent_id>, ex.: pattern:team-3-*
+ROLE = "role"          # role:<papel informado pelo agente no campo "role">
+FIELD = "field"        # field:<campo do estado>, quando esse campo muda
+TOPIC_KINDS = (ALL, AGENT, PATTERN, ROLE, FIELD)
+
+Topic = Tuple[str, str]
+
+def parse_topic(topic: str) -> Topic:
+    """Converte "tipo:valor" em (tipo, valor); levanta ValueError se inválido."""
+    if topic == ALL:
+        return ALL, ""
+    kind, separator, value = topic.partition(":")
+    if not separator or kind not in TOPIC_KINDS or kind == ALL or not value:
+        raise ValueError(f"Tópico inválido: {topic!r}")
+    return kind, value
+
+def format_topic(topic: Topic) -> str:
+    kind, value = topic
+    return kind if kind == ALL else f"{kind}:{value}"
+
+class SubscriptionIndex:
+    """
+    Índice invertido de tópicos para clientes.
+
+    Cada atualização consulta só os conjuntos dos tópicos que ela toca
+    (o agente, seus padrões, seu papel e os campos alterados), então o custo
+    de rotear é proporcional aos interessados, não ao total de clientes.
+    Os padrões glob são avaliados uma vez por par (padrão, agente).
+    """
+
+    def __init__(self):
+        self.topics: Dict[Topic, Set[Any]] = {}         # tópico -> clientes
+        self.client_topics: Dict[Any, Set[Topic]] = {}  # cliente -> tópicos
+        self.agent_roles: Dict[str, str] = {}
+        self._agent_patterns: Dict[str, Set[str]] = {}  # agente -> padrões que casam
+
+    def add_client(self, client, topics: Optional[Iterable[Topic]] = None):
+        """Registra um cliente; sem `topics`, ele recebe todas as atualizações."""
+        self.client_topics[client] = set()
+        self.subscribe(client, [(ALL, "")] if topics is None else topics)
+
+    def remove_client(self, client):
+        for topic in self.client_topics.pop(client, ()):
+            self._discard(topic, client)
+
+    def subscribe(self, client, topics: Iterable[Topic]) -> List[Topic]:
+        """Inscreve o cliente; retorna os tópicos que ele ainda não tinha."""
+        added = []
+        subscribed = self.client_topics[client]
+        for topic in topics:
+            if topic in subscribed:
+                continue
+            subscribed.add(topic)
+            clients = self.topics.setdefault(topic, set())
+            clients.add(client)
+            if topic[0] == PATTERN and len(clients) == 1:
+                self._index_pattern(topic[1])
+            added.append(topic)
+        return added
+
+    def unsubscribe(self, client, topics: Iterable[Topic]):
+        subscribed = self.client_topics[client]
+        for topic in topics:
+            if topic in subscribed:
+                subscribed.discard(topic)
+                self._discard(topic, client)
+
+    def _discard(self, topic: Topic, client):
+        clients = self.topics.get(topic)
+        if clients is None:
+            return
+        clients.discard(client)
+        if not clients:
+            del self.topics[topic]
+            if topic[0] == PATTERN:
+                for patterns in self._agent_patterns.values():
+                    patterns.discard(topic[1])
+
+    def _index_pattern(self, pattern: str):
+        for agent_id, patterns in self._agent_patterns.items():
+            if fnmatch.fnmatchcase(agent_id, pattern):
+                patterns.add(pattern)
+
+    def note_agent(self, agent_id: str, state: Dict):
+        """Registra um agente novo e o papel que ele informa no estado."""
+        if agent_id not in self._agent_patterns:
+            self._agent_patterns[agent_id] = {
+                value for kind, value in self.topics if kind == PATTERN and fnmatch.fnmatchcase(agent_id, value)
+            }
+        role = state.get("role")
+        if isinstance(role, str):
+            self.agent_roles[agent_id] = role
+
+    def _agent_topics(self, agent_id: str) -> List[Topic]:
+        topics = [(ALL, ""), (AGENT, agent_id)]
+        topics += [(PATTERN, pattern) for pattern in self._agent_patterns.get(agent_id, ())]
+        role = self.agent_roles.get(agent_id)
+        if role is not None:
+            topics.append((ROLE, role))
+        return topics
+
+    def recipients(self, agent_id: str, changed_fields: Iterable[str] = ()) -> Set[Any]:
+        """Clientes interessados numa atualização do agente que alterou `changed_fields`."""
+        topics = self._agent_topics(agent_id) + [(FIELD, field) for field in changed_fields]
+        interested = set()
+        for topic in topics:
+            clients = self.topics.get(topic)
+            if clients:
+                interested |= clients
+        return interested
+
+    def matches(self, topics: Iterable[Topic], agent_id: str, state: Dict) -> bool:
+        """Se algum dos `topics` cobre o estado atual do agente (usado nos instantâneos)."""
+        agent_topics = set(self._agent_topics(agent_id))
+        for topic in topics:
+            if topic in agent_topics or (topic[0] == FIELD and topic[1] in state):
+                return True
+        return False
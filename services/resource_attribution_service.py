@@ -0,0 +1,308 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+PROC_ROOT = "/proc"
+CGROUP_ROOT = "/sys/fs/cgroup"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Intervalo mínimo entre duas varreduras de processos (segundos)
+DEFAULT_SAMPLE_INTERVAL = 1.0
+
+# "1" aceita processos de outros usuários (ex.: jobs de alunos num servidor
+# compartilhado) cujo /proc/[pid]/stat o serviço consiga ler
+ALLOW_OTHER_USERS = os.environ.get("ATTRIBUTION_ALLOW_OTHER_USERS", "0") == "1"
+
+
+class ProcessSample:
+    """Leitura de um processo em uma varredura."""
+
+    __slots__ = ("pid", "ppid", "start_time", "cpu_time", "rss", "uss", "io_read", "io_write", "cgroup")
+
+    def __init__(self, pid: int, ppid: int, start_time: int, cpu_time: float, rss: int):
+        self.pid = pid
+        self.ppid = ppid
+        self.start_time = start_time
+        self.cpu_time = cpu_time
+        self.rss = rss
+        self.uss: Optional[int] = None
+        self.io_read: Optional[int] = None
+        self.io_write: Optional[int] = None
+        self.cgroup: Optional[str] = None
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _parse_stat(pid: int, content: str) -> ProcessSample:
+    # O nome do processo fica entre parênteses e pode conter espaços
+    fields = content[content.rindex(")") + 2:].split()
+    return ProcessSample(
+        pid=pid,
+        ppid=int(fields[1]),
+        start_time=int(fields[19]),
+        cpu_time=(int(fields[11]) + int(fields[12])) / CLOCK_TICKS,
+        rss=int(fields[21]) * PAGE_SIZE,
+    )
+
+
+def _read_details(sample: ProcessSample):
+    """Lê USS, IO e cgroup; feito apenas para processos atribuídos a agentes."""
+    base = os.path.join(PROC_ROOT, str(sample.pid))
+    smaps = _read_file(os.path.join(base, "smaps_rollup"))
+    if smaps:
+        private_kb = 0
+        for line in smaps.splitlines():
+            if line.startswith(("Private_Clean:", "Private_Dirty:")):
+                private_kb += int(line.split()[1])
+        sample.uss = private_kb * 1024
+    io = _read_file(os.path.join(base, "io"))
+    if io:
+        for line in io.splitlines():
+            key, _, value = line.partition(":")
+            if key == "read_bytes":
+                sample.io_read = int(value)
+            elif key == "write_bytes":
+                sample.io_write = int(value)
+    cgroup = _read_file(os.path.join(base, "cgroup"))
+    if cgroup:
+        for line in cgroup.splitlines():
+            # Formato do cgroup v2: "0::/caminho"
+            if line.startswith("0::"):
+                sample.cgroup = line[3:].strip()
+
+
+def process_uid(pid: int) -> Optional[int]:
+    """UID real do dono do processo, ou None se ele não existir."""
+    try:
+        if os.path.isdir(PROC_ROOT):
+            return os.stat(os.path.join(PROC_ROOT, str(pid))).st_uid
+        return psutil.Process(pid).uids().real
+    except (OSError, psutil.Error):
+        return None
+
+
+def sweep_proc() -> Dict[int, ProcessSample]:
+    """Uma única varredura de /proc/[pid]/stat para todos os processos."""
+    samples = {}
+    for entry in os.listdir(PROC_ROOT):
+        if not entry.isdigit():
+            continue
+        content = _read_file(os.path.join(PROC_ROOT, entry, "stat"))
+        if content is None:
+            continue
+        try:
+            samples[int(entry)] = _parse_stat(int(entry), content)
+        except (ValueError, IndexError):
+            continue
+    return samples
+
+
+def sweep_psutil() -> Dict[int, ProcessSample]:
+    """Alternativa para sistemas sem /proc: uma iteração do psutil por varredura."""
+    samples = {}
+    for proc in psutil.process_iter(["pid", "ppid", "create_time", "cpu_times", "memory_info"]):
+        info = proc.info
+        if info["cpu_times"] is None or info["memory_info"] is None:
+            continue
+        samples[info["pid"]] = ProcessSample(
+            pid=info["pid"],
+            ppid=info["ppid"] or 0,
+            start_time=int((info["create_time"] or 0) * 1000),
+            cpu_time=info["cpu_times"].user + info["cpu_times"].system,
+            rss=info["memory_info"].rss,
+        )
+    return samples
+
+
+def read_cgroup_stats(path: str) -> Optional[Dict[str, int]]:
+    """Lê memory.current e cpu.stat de um cgroup v2."""
+    base = os.path.join(CGROUP_ROOT, path.lstrip("/"))
+    memory = _read_file(os.path.join(base, "memory.current"))
+    cpu = _read_file(os.path.join(base, "cpu.stat"))
+    if memory is None and cpu is None:
+        return None
+    stats = {"path": path}
+    if memory is not None:
+        stats["memory_current"] = int(memory.strip())
+    if cpu:
+        for line in cpu.splitlines():
+            key, _, value = line.partition(" ")
+            if key == "usage_usec":
+                stats["cpu_usage_usec"] = int(value)
+    return stats
+
+
+class ResourceAttributionService:
+    """
+    Atribui consumo de recursos (RSS/USS, CPU, IO, cgroup v2) a agentes.
+
+    Agentes registram o PID raiz; todos os descendentes desse processo são
+    atribuídos ao mesmo agente. Cada varredura lê /proc uma única vez para
+    montar a árvore de processos, e só os processos atribuídos têm USS, IO e
+    cgroup lidos. O uso de CPU é a diferença de tempo de CPU entre varreduras.
+    """
+
+    def __init__(self, sample_interval: float = DEFAULT_SAMPLE_INTERVAL, allow_other_users: bool = ALLOW_OTHER_USERS):
+        self.sample_interval = sample_interval
+        self.use_proc = os.path.isdir(PROC_ROOT)
+        # pid raiz -> (agent_id, start_time registrado ou None)
+        self._roots: Dict[int, Tuple[str, Optional[int]]] = {}
+        self._previous: Dict[Tuple[int, int], float] = {}
+        self._previous_at: Optional[float] = None
+        self._breakdown: Dict[str, Dict[str, Any]] = {}
+        self._sampled_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._inflight: Optional[asyncio.Future] = None
+        self._own_cgroup = self._cgroup_of(os.getpid())
+        # Sem allow_other_users, só processos do mesmo usuário do serviço podem ser registrados
+        self.service_uid = os.getuid() if hasattr(os, "getuid") else None
+        self.allow_other_users = allow_other_users
+
+    def _cgroup_of(self, pid: int) -> Optional[str]:
+        content = _read_file(os.path.join(PROC_ROOT, str(pid), "cgroup"))
+        if content:
+            for line in content.splitlines():
+                if line.startswith("0::"):
+                    return line[3:].strip()
+        return None
+
+    def register_process(self, agent_id: str, pid: int):
+        """
+        Associa o processo `pid` (e seus descendentes) ao agente.
+
+        Recusa (ValueError) o init, PIDs inexistentes e processos de outro
+        usuário. Com `allow_other_users`, um processo de outro usuário é
+        aceito se o serviço lê o seu stat; USS e IO só aparecem se o serviço
+        também puder lê-los (root ou CAP_SYS_PTRACE). Um novo registro do mesmo agente mantém o start_time já
+        conhecido, para que a reutilização do PID continue sendo detectada.
+        """
+        if pid <= 1:
+            raise ValueError(f"PID inválido: {pid}")
+        uid = process_uid(pid)
+        if uid is None:
+            raise ValueError(f"Processo {pid} não encontrado")
+        if self.service_uid is not None and uid != self.service_uid:
+            if not self.allow_other_users:
+                raise ValueError(f"Processo {pid} não pertence ao usuário do serviço")
+            if self.use_proc and not os.access(os.path.join(PROC_ROOT, str(pid), "stat"), os.R_OK):
+                raise ValueError(f"Processo {pid} de outro usuário sem /proc legível")
+        with self._lock:
+            root = self._roots.get(pid)
+            if root is None or root[0] != agent_id:
+                self._roots[pid] = (agent_id, None)
+
+    def unregister_agent(self, agent_id: str):
+        with self._lock:
+            self._roots = {pid: root for pid, root in self._roots.items() if root[0] != agent_id}
+            self._breakdown.pop(agent_id, None)
+
+    def sample(self) -> Dict[str, Dict[str, Any]]:
+        """Executa uma varredura e recalcula o consumo por agente (bloqueante)."""
+        now = time.monotonic()
+        samples = sweep_proc() if self.use_proc else sweep_psutil()
+
+        with self._lock:
+            # Descarta raízes cujo processo terminou ou cujo PID foi reutilizado
+            roots = {}
+            for pid, (agent_id, start_time) in self._roots.items():
+                sample = samples.get(pid)
+                if sample is None or (start_time is not None and sample.start_time != start_time):
+                    continue
+                roots[pid] = (agent_id, sample.start_time)
+            self._roots = roots
+
+        # Atribui cada processo ao agente do ancestral registrado mais próximo
+        owners: Dict[int, Optional[str]] = {pid: agent_id for pid, (agent_id, _) in roots.items()}
+
+        def owner_of(pid: int) -> Optional[str]:
+            chain = []
+            while pid not in owners:
+                sample = samples.get(pid)
+                if sample is None or sample.ppid == 0 or sample.ppid == pid:
+                    owners[pid] = None
+                    break
+                chain.append(pid)
+                pid = sample.ppid
+            owner = owners[pid]
+            for visited in chain:
+                owners[visited] = owner
+            return owner
+
+        elapsed = now - self._previous_at if self._previous_at is not None else None
+        current_cpu: Dict[Tuple[int, int], float] = {}
+        breakdown: Dict[str, Dict[str, Any]] = {}
+        for pid, sample in samples.items():
+            agent_id = owner_of(pid)
+            if agent_id is None:
+                continue
+            if self.use_proc:
+                _read_details(sample)
+            key = (pid, sample.start_time)
+            current_cpu[key] = sample.cpu_time
+            agent = breakdown.setdefault(agent_id, {
+                "agent_id": agent_id,
+                "pids": [],
+                "rss": 0,
+                "uss": 0,
+                "cpu_time": 0.0,
+                "cpu_percent": 0.0,
+                "io_read_bytes": 0,
+                "io_write_bytes": 0,
+                "cgroups": set(),
+            })
+            agent["pids"].append(pid)
+            agent["rss"] += sample.rss
+            agent["uss"] += sample.uss or 0
+            agent["cpu_time"] += sample.cpu_time
+            agent["io_read_bytes"] += sample.io_read or 0
+            agent["io_write_bytes"] += sample.io_write or 0
+            if elapsed and key in self._previous:
+                agent["cpu_percent"] += max(sample.cpu_time - self._previous[key], 0.0) / elapsed * 100
+            if sample.cgroup and sample.cgroup != self._own_cgroup:
+                agent["cgroups"].add(sample.cgroup)
+
+        for agent in breakdown.values():
+            # Estatísticas de cgroup só quando o agente roda em cgroup próprio
+            agent["cgroups"] = [
+                stats for stats in map(read_cgroup_stats, sorted(agent["cgroups"])) if stats
+            ]
+            agent["cpu_percent"] = round(agent["cpu_percent"], 2)
+
+        with self._lock:
+            self._previous = current_cpu
+            self._previous_at = now
+            self._breakdown = breakdown
+            self._sampled_at = now
+        return breakdown
+
+    async def get_breakdown(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna o consumo por agente, varrendo /proc no máximo uma vez por
+        intervalo; requisições simultâneas compartilham a mesma varredura.
+        """
+        if self._sampled_at is not None and time.monotonic() - self._sampled_at < self.sample_interval:
+            return self._breakdown
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(asyncio.to_thread(self.sample))
+            self._inflight.add_done_callback(self._clear_inflight)
+        return await asyncio.shield(self._inflight)
+
+    def _clear_inflight(self, _future):
+        self._inflight = None
+
+# Instância global do serviço
+attribution_service = ResourceAttributionService()
@@ -1,3 +1,34 @@
+// Aplica operações JSON Patch (add, replace, remove) copiando só o caminho alterado
+function applyPatch(document, patch) {
+    const apply = (container, tokens, operation) => {
+        const copy = Array.isArray(container) ? [...container] : { ...container };
+        const token = tokens[0].replace(/~1/g, '/').replace(/~0/g, '~');
+        if (Array.isArray(copy)) {
+            const index = token === '-' ? copy.length : Number(token);
+            if (tokens.length > 1) {
+                copy[index] = apply(copy[index], tokens.slice(1), operation);
+            } else if (operation.op === 'remove') {
+                copy.splice(index, 1);
+            } else if (operation.op === 'add') {
+                copy.splice(index, 0, operation.value);
+            } else {
+                copy[index] = operation.value;
+            }
+        } else if (tokens.length > 1) {
+            copy[token] = apply(copy[token], tokens.slice(1), operation);
+        } else if (operation.op === 'remove') {
+            delete copy[token];
+        } else {
+            copy[token] = operation.value;
+        }
+        return copy;
+    };
+    return patch.reduce((current, operation) => {
+        const tokens = operation.path.split('/').slice(1);
+        return tokens.length ? apply(current, tokens, operation) : operation.value;
+    }, document);
+}
+
 class AgentMonitor {
     constructor(containerId, options = {}) {
         this.container = document.getElementById(containerId);
@@ -5,6 +36,7 @@ class AgentMonitor {
             updateInterval: 100, // ms
             maxHistory: 50,
             displayMode: 'cards', // 'cards', 'list', 'diagram'
+            topics: null, // ex.: ['pattern:team-3-*', 'role:planner']; null recebe todos os agentes
             ...options
         };
         
@@ -51,7 +83,13 @@ class AgentMonitor {
     
     initWebSocket() {
         const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
-        const wsUrl = `${protocol}://${window.location.host}/ws/agents`;
+        const topics = this.options.topics;
+        // Atualizações chegam como patches; o estado completo só na conexão e em resync
+        const params = new URLSearchParams({ encoding: 'delta' });
+        if (topics && topics.length) {
+            params.set('topics', topics.join(','));
+        }
+        const wsUrl = `${protocol}://${window.location.host}/ws/agents?${params}`;
         
         this.socket = new WebSocket(wsUrl);
         
@@ -79,6 +117,22 @@ class AgentMonitor {
         };
     }
     
+    subscribe(topics) {
+        this.options.topics = [...new Set([...(this.options.topics || []), ...topics])];
+        this.sendCommand('subscribe', topics);
+    }
+    
+    unsubscribe(topics) {
+        this.options.topics = (this.options.topics || []).filter(topic => !topics.includes(topic));
+        this.sendCommand('unsubscribe', topics);
+    }
+    
+    sendCommand(action, topics) {
+        if (this.connected) {
+            this.socket.send(JSON.stringify({ action, topics }));
+        }
+    }
+    
     handleMessage(message) {
         switch(message.type) {
             case 'state_update':
@@ -89,12 +143,63 @@ class AgentMonitor {
                 this.updateAllAgents(message.data);
                 break;
                 
+            case 'state_delta':
+                this.applyDelta(message.agent_id, message.data);
+                break;
+                
+            case 'state_batch':
+                // Último estado (ou patch) de cada agente atualizado na janela de agrupamento
+                Object.entries(message.data).forEach(([agentId, entry]) => {
+                    if (entry.patch) {
+                        this.applyDelta(agentId, entry);
+                    } else {
+                        this.updateAgentState(agentId, entry);
+                    }
+                });
+                break;
+                
+            case 'subscriptions':
+                break;
+                
+            case 'error':
+                console.warn('Erro do monitor de agentes:', message.message);
+                break;
+                
             default:
                 console.warn('Mensagem desconhecida:', message);
         }
     }
     
+    applyDelta(agentId, delta) {
+        const agent = this.agents.get(agentId);
+        const seq = agent ? agent.currentState.seq : undefined;
+        if (seq !== delta.base) {
+            // Patch de outra versão: ignora os antigos e pede o estado completo após um salto
+            if (seq === undefined || delta.seq > seq) {
+                this.requestResync(agentId);
+            }
+            return;
+        }
+        this.updateAgentState(agentId, {
+            state: applyPatch(agent.currentState.state, delta.patch),
+            timestamp: delta.timestamp,
+            seq: delta.seq
+        });
+    }
+    
+    requestResync(agentId) {
+        this.pendingResync = this.pendingResync || new Set();
+        if (this.pendingResync.has(agentId)) {
+            return;
+        }
+        this.pendingResync.add(agentId);
+        this.socket.send(JSON.stringify({ action: 'resync', agents: [agentId] }));
+    }
+    
     updateAgentState(agentId, data) {
+        if (this.pendingResync) {
+            this.pendingResync.delete(agentId);
+        }
         if (!this.agents.has(agentId)) {
             this.agents.set(agentId, {
                 id: agentId,
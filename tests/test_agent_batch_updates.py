@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+# Adicionar a raiz do projeto ao path para importar o pacote services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.agent_broker import UnixSocketBroker
+from services.agent_monitor_service import AgentMonitorService, parse_state_records
+from services.agent_state_delta import apply_patch
+
+class RecordingWebSocket:
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, message):
+        self.messages.append(json.loads(message))
+
+    async def close(self, code=None):
+        pass
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+def step_records(step, agents=50):
+    return [
+        {"agent_id": f"agent-{index}", "state": {"status": "running", "step": step}, "client_timestamp": f"2026-01-01T00:00:{step:02d}"}
+        for index in range(agents)
+    ]
+
+class TestParseStateRecords(unittest.TestCase):
+
+    def test_accepted_shapes_and_errors(self):
+        record = {"agent_id": "a1", "state": {"status": "running"}}
+        self.assertEqual(parse_state_records(record), [record])
+        self.assertEqual(parse_state_records({"id": 3, "records": [record]}), [record])
+        for invalid in ("a1", [record, {"agent_id": "a2"}], [{"agent_id": "", "state": {}}],
+                        [{"agent_id": "a1", "state": {}, "client_timestamp": {"at": 1}}]):
+            with self.assertRaises(ValueError):
+                parse_state_records(invalid)
+
+class TestBatchUpdates(unittest.TestCase):
+
+    def test_batch_is_one_message_per_client(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            client, delta = RecordingWebSocket(), RecordingWebSocket()
+            await monitor.register_client(client)
+            await monitor.register_client(delta, encoding="delta")
+            applied = [await monitor.update_agent_states(step_records(step)) for step in range(3)]
+            await settle()
+            return monitor, applied, client.messages, delta.messages
+        monitor, applied, messages, delta = run(scenario())
+        self.assertEqual(applied, [50, 50, 50])
+        self.assertEqual([message["type"] for message in messages], ["full_state"] + ["state_batch"] * 3)
+        last = messages[-1]["data"]["agent-7"]
+        self.assertEqual((last["state"]["step"], last["seq"], last["client_timestamp"]), (2, 3, "2026-01-01T00:00:02"))
+        self.assertEqual(len(monitor.get_agent_history("agent-7", 0)), 3)
+
+        # Clientes delta recebem o estado no primeiro lote e patches nos seguintes
+        state = delta[1]["data"]["agent-7"]["state"]
+        for message in delta[2:]:
+            entry = message["data"]["agent-7"]
+            self.assertEqual(entry["base"], entry["seq"] - 1)
+            state = apply_patch(state, entry["patch"])
+        self.assertEqual(state, {"status": "running", "step": 2})
+
+    def test_invalid_batch_applies_nothing(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            records = step_records(0, agents=3) + [{"agent_id": "broken", "state": "running"}]
+            with self.assertRaises(ValueError):
+                await monitor.update_agent_states(records)
+            return monitor
+        self.assertEqual(run(scenario()).agent_states, {})
+
+    def test_parsed_records_are_not_validated_again(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            records = parse_state_records(step_records(0, agents=3))
+            with mock.patch("services.agent_monitor_service.parse_state_records", side_effect=AssertionError):
+                applied = await monitor.publish_state_records(records)
+            return monitor, applied
+        monitor, applied = run(scenario())
+        self.assertEqual(applied, 3)
+        self.assertEqual(set(monitor.agent_states), {"agent-0", "agent-1", "agent-2"})
+
+    def test_same_agent_twice_keeps_both_in_history(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            client = RecordingWebSocket()
+            await monitor.register_client(client)
+            await monitor.update_agent_states([
+                {"agent_id": "a1", "state": {"status": "running", "step": 1}},
+                {"agent_id": "a1", "state": {"status": "done", "step": 2}}
+            ])
+            await settle()
+            return monitor, client.messages
+        monitor, messages = run(scenario())
+        self.assertEqual(messages[-1]["data"]["a1"]["state"], {"status": "done", "step": 2})
+        self.assertEqual([entry["seq"] for entry in monitor.get_agent_history("a1", 0)], [1, 2])
+
+    def test_batch_reaches_other_workers_and_history_log(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "agents.sock")
+
+        async def scenario():
+            first = AgentMonitorService(batch_window=0, broker=UnixSocketBroker(path),
+                                        history_dir=os.path.join(directory, "history"))
+            second = AgentMonitorService(batch_window=0, broker=UnixSocketBroker(path))
+            client = RecordingWebSocket()
+            await first.register_client(RecordingWebSocket())
+            await second.register_client(client)
+            await second.update_agent_states(step_records(0, agents=5))
+            for _ in range(200):
+                if first.history_log.stats()["records"] == 5 and len(client.messages) == 2:
+                    break
+                await asyncio.sleep(0.005)
+            page = await first.query_agent_history("agent-3", limit=200)
+            persisted = first.history_log.query("agent-3", limit=0)[0]
+            await second.close()
+            await first.close()
+            return client.messages, page, persisted
+        messages, page, persisted = run(scenario())
+        self.assertEqual(messages[-1]["type"], "state_batch")
+        self.assertEqual(len(messages[-1]["data"]), 5)
+        self.assertEqual(page["history"][0]["client_timestamp"], "2026-01-01T00:00:00")
+        self.assertEqual(persisted, page["history"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+# Adicionar a raiz do projeto ao path para importar o pacote services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import agent_history_store
+from services import agent_broker
+from services.agent_broker import AgentBroker, InProcessBroker, RedisBroker, RedisError, UnixSocketBroker, create_broker
+from services.agent_history_store import AgentHistoryLog
+from services.agent_monitor_service import AgentMonitorService
+
+class RecordingWebSocket:
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, message):
+        self.messages.append(json.loads(message))
+
+    async def close(self, code=None):
+        pass
+
+    def states(self, agent_id):
+        return [message["data"]["state"] for message in self.messages
+                if message["type"] == "state_update" and message["agent_id"] == agent_id]
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def until(condition, timeout=5.0):
+    """Espera a condição ficar verdadeira (as entregas entre workers são assíncronas)"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("Condição não atingida a tempo")
+        await asyncio.sleep(0.005)
+
+class FakeError(str):
+    """Resposta de erro do FakeRedis"""
+
+class FakeRedis:
+    """Servidor RESP mínimo (SUBSCRIBE, PUBLISH, HSET, HGETALL, ZADD, EXPIRE, MULTI/EXEC e o EVAL de limpeza) no lugar de um Redis"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.sorted_sets = {}
+        self.expires = {}
+        self.subscribers = {}
+        self.server = None
+        self.failing = set()  # Comandos que falham ao executar (erro dentro do EXEC)
+        self.rejected = set()  # Comandos recusados ao enfileirar (EXEC vira EXECABORT)
+        self.stalled = False  # Recebe os comandos sem responder, como um Redis travado
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return f"redis://127.0.0.1:{self.server.sockets[0].getsockname()[1]}/0"
+
+    async def stop(self):
+        self.server.close()
+        for writers in self.subscribers.values():
+            for writer in writers:
+                writer.close()
+
+    @staticmethod
+    def encode(value):
+        if isinstance(value, FakeError):
+            return b"-%s\r\n" % value.encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, bytes):
+            return b"$%d\r\n%s\r\n" % (len(value), value)
+        return b"*%d\r\n" % len(value) + b"".join(FakeRedis.encode(item) for item in value)
+
+    async def read_command(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            size = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    def execute(self, name, args):
+        if name in self.failing:
+            return FakeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        if name == b"ZADD":
+            scores = {member: float(score) for score, member in zip(args[1::2], args[2::2])}
+            self.sorted_sets.setdefault(args[0], {}).update(scores)
+            return len(scores)
+        if name == b"EXPIRE":
+            self.expires[args[0]] = int(args[1])
+            return 1
+        if name == b"EVAL":
+            # Só o script de limpeza do broker: KEYS = hash e sorted set, ARGV = corte e limite
+            states, seen = args[2], args[3]
+            cutoff, limit = float(args[4]), int(args[5])
+            stale = sorted(member for member, score in self.sorted_sets.get(seen, {}).items() if score <= cutoff)[:limit]
+            for member in stale:
+                self.hashes.get(states, {}).pop(member, None)
+                self.sorted_sets[seen].pop(member)
+            return len(stale)
+        if name == b"HSET":
+            fields = dict(zip(args[1::2], args[2::2]))
+            self.hashes.setdefault(args[0], {}).update(fields)
+            return len(fields)
+        if name == b"HGETALL":
+            return [item for pair in self.hashes.get(args[0], {}).items() for item in pair]
+        if name == b"PUBLISH":
+            writers = self.subscribers.get(args[0], [])
+            for writer in writers:
+                writer.write(self.encode([b"message", args[0], args[1]]))
+            return len(writers)
+        return "OK"
+
+    async def handle(self, reader, writer):
+        queued = None
+        while True:
+            command = await self.read_command(reader)
+            if command is None:
+                break
+            name, args = command[0].upper(), command[1:]
+            if self.stalled:
+                continue
+            if name == b"SUBSCRIBE":
+                self.subscribers.setdefault(args[0], []).append(writer)
+                writer.write(self.encode([b"subscribe", args[0], 1]))
+            elif name == b"MULTI":
+                queued = []
+                writer.write(self.encode("OK"))
+            elif name == b"EXEC":
+                if None in queued:
+                    writer.write(self.encode(FakeError("EXECABORT Transaction discarded because of previous errors.")))
+                else:
+                    writer.write(self.encode([self.execute(name, args) for name, args in queued]))
+                queued = None
+            elif queued is not None and name in self.rejected:
+                queued.append(None)
+                writer.write(self.encode(FakeError(f"ERR unknown command '{name.decode()}'")))
+            elif queued is not None:
+                queued.append((name, args))
+                writer.write(self.encode("QUEUED"))
+            else:
+                writer.write(self.encode(self.execute(name, args)))
+
+class TestAgentBroker(unittest.TestCase):
+
+    def test_publish_is_abstract(self):
+        with self.assertRaises(TypeError):
+            AgentBroker()
+
+class TestCreateBroker(unittest.TestCase):
+
+    def test_urls(self):
+        self.assertIsInstance(create_broker("memory"), InProcessBroker)
+        self.assertEqual(create_broker("unix:///tmp/agents.sock").path, "/tmp/agents.sock")
+        broker = create_broker("redis://:secret@cache:6380/2")
+        self.assertIsInstance(broker, RedisBroker)
+        self.assertEqual((broker.host, broker.port, broker.db, broker.password), ("cache", 6380, 2, "secret"))
+        with self.assertRaises(ValueError):
+            create_broker("amqp://localhost")
+
+class TestUnixSocketBroker(unittest.TestCase):
+
+    def test_updates_reach_clients_on_every_worker(self):
+        path = os.path.join(tempfile.mkdtemp(), "agents.sock")
+
+        async def scenario():
+            first = AgentMonitorService(batch_window=0, broker=UnixSocketBroker(path))
+            second = AgentMonitorService(batch_window=0, broker=UnixSocketBroker(path))
+            on_first, on_second = RecordingWebSocket(), RecordingWebSocket()
+            await first.register_client(on_first)
+            await second.register_client(on_second)
+            self.assertTrue(first.broker.is_hub)
+            self.assertFalse(second.broker.is_hub)
+
+            # Publicado uma vez, em qualquer worker, entregue nos dois
+            await first.update_agent_state("a1", {"status": "running", "step": 1})
+            await second.update_agent_state("a1", {"status": "running", "step": 2})
+            await until(lambda: len(on_first.states("a1")) == 2 and len(on_second.states("a1")) == 2)
+            self.assertEqual(on_first.states("a1"), on_second.states("a1"))
+            self.assertEqual(first.agent_states["a1"]["seq"], second.agent_states["a1"]["seq"])
+
+            # Worker que entra depois recebe os estados atuais
+            third = AgentMonitorService(batch_window=0, broker=UnixSocketBroker(path))
+            await third.register_client(RecordingWebSocket())
+            await until(lambda: "a1" in third.agent_states)
+            self.assertEqual(third.agent_states["a1"], second.agent_states["a1"])
+
+            # O hub cai: um dos outros assume e as atualizações continuam
+            await first.close()
+            on_third = RecordingWebSocket()
+            await third.register_client(on_third)
+            await until(lambda: second.broker.is_hub or third.broker.is_hub)
+            await third.update_agent_state("a1", {"status": "done", "step": 3})
+            await until(lambda: on_second.states("a1")[-1:] == [{"status": "done", "step": 3}])
+            self.assertEqual(on_third.states("a1"), [{"status": "done", "step": 3}])
+            await second.close()
+            await third.close()
+        run(scenario())
+
+class TestRedisBroker(unittest.TestCase):
+
+    def test_updates_and_snapshot_through_redis(self):
+        async def scenario():
+            redis = FakeRedis()
+            url = await redis.start()
+            first = AgentMonitorService(batch_window=0, broker=RedisBroker(url))
+            second = AgentMonitorService(batch_window=0, broker=RedisBroker(url))
+            on_second = RecordingWebSocket()
+            await first.register_client(RecordingWebSocket())
+            await second.register_client(on_second)
+            for step in range(3):
+                await first.update_agent_state("a1", {"status": "running", "step": step})
+            await until(lambda: len(on_second.states("a1")) == 3)
+            self.assertEqual([state["step"] for state in on_second.states("a1")], [0, 1, 2])
+            await second.update_agent_states([
+                {"agent_id": "a2", "state": {"status": "running"}},
+                {"agent_id": "a3", "state": {"status": "done"}}
+            ])
+            await until(lambda: {"a2", "a3"} <= set(first.agent_states))
+
+            # Quem entra depois lê o último estado do hash
+            third = AgentMonitorService(batch_window=0, broker=RedisBroker(url))
+            await third.register_client(RecordingWebSocket())
+            self.assertEqual(third.agent_states["a1"]["state"], {"status": "running", "step": 2})
+            self.assertEqual(third.agent_states["a1"]["seq"], 3)
+            self.assertEqual(third.agent_states["a3"]["state"], {"status": "done"})
+            for monitor in (first, second, third):
+                await monitor.close()
+            await redis.stop()
+        run(scenario())
+
+    def test_errors_inside_the_transaction_keep_the_connection_in_sync(self):
+        async def scenario():
+            redis = FakeRedis()
+            broker = RedisBroker(await redis.start())
+            update = {"agent_id": "a1", "state": {"status": "running"}, "seq": 1}
+
+            # Erro de um comando executado, dentro da resposta do EXEC
+            redis.failing.add(b"HSET")
+            with self.assertRaisesRegex(RedisError, "WRONGTYPE"):
+                await broker.publish(update)
+            redis.failing.clear()
+
+            # Erro ao enfileirar: o EXEC responde EXECABORT
+            redis.rejected.add(b"ZADD")
+            with self.assertRaisesRegex(RedisError, "unknown command"):
+                await broker.publish(update)
+            redis.rejected.clear()
+
+            # A mesma conexão segue utilizável, com as respostas alinhadas
+            publisher = broker._publisher
+            await broker.publish({**update, "seq": 2})
+            self.assertIs(broker._publisher, publisher)
+            self.assertEqual(await publisher.command("HGETALL", broker.states_key),
+                             [b"a1", json.dumps({"agent_id": "a1", "state": {"status": "running"}}).encode()])
+            await broker.close()
+            await redis.stop()
+        run(scenario())
+
+    def test_publish_gives_up_on_a_stalled_server(self):
+        async def scenario():
+            redis = FakeRedis()
+            broker = RedisBroker(await redis.start())
+            update = {"agent_id": "a1", "state": {"status": "running"}, "seq": 1}
+            await broker.publish(update)
+            redis.stalled = True
+            with mock.patch.object(agent_broker, "PUBLISH_TIMEOUT", 0.1):
+                with self.assertRaisesRegex(ConnectionError, "sem resposta"):
+                    await broker.publish({**update, "seq": 2})
+            self.assertIsNone(broker._publisher)
+
+            # A próxima publicação abre outra conexão
+            redis.stalled = False
+            await broker.publish({"agent_id": "a1", "state": {"status": "done"}, "seq": 3})
+            self.assertEqual(json.loads(redis.hashes[broker.states_key.encode()][b"a1"])["state"], {"status": "done"})
+            await broker.close()
+            await redis.stop()
+        run(scenario())
+
+    def test_agents_without_updates_leave_the_states_hash(self):
+        async def scenario():
+            redis = FakeRedis()
+            broker = RedisBroker(await redis.start(), state_ttl=600)
+            clock = [1000.0]
+            with mock.patch.object(agent_broker.time, "time", lambda: clock[0]):
+                await broker.publish({"agent_id": "old", "state": {}, "seq": 1})
+                clock[0] = 1590.0
+                await broker.publish({"agent_id": "recent", "state": {}, "seq": 1})
+                # "old" já passou do TTL, mas a última limpeza foi há menos de TRIM_INTERVAL
+                clock[0] = 1601.0
+                await broker.publish({"agent_id": "new", "state": {}, "seq": 1})
+                self.assertEqual(len(redis.hashes[broker.states_key.encode()]), 3)
+                clock[0] = 1590.0 + agent_broker.TRIM_INTERVAL
+                await broker.publish({"agent_id": "new", "state": {}, "seq": 2})
+            self.assertEqual(set(redis.hashes[broker.states_key.encode()]), {b"recent", b"new"})
+            self.assertEqual(set(redis.sorted_sets[broker.seen_key.encode()]), {b"recent", b"new"})
+            self.assertEqual(redis.expires[broker.states_key.encode()], 600)
+            self.assertEqual(redis.expires[broker.seen_key.encode()], 600)
+            await broker.close()
+            await redis.stop()
+        run(scenario())
+
+class TestSharedHistoryLog(unittest.TestCase):
+
+    def test_single_writer_and_takeover(self):
+        directory = tempfile.mkdtemp()
+        entry = lambda seq: {"state": {"step": seq}, "timestamp": f"2026-01-01T00:00:{seq:02d}", "seq": seq}
+        writer = AgentHistoryLog(directory, max_age=None, max_bytes=None)
+        reader = AgentHistoryLog(directory, max_age=None, max_bytes=None)
+        # Todos os workers recebem o mesmo estado; só o dono do lock grava
+        for log in (writer, reader):
+            log.append("a1", entry(1), None)
+            log.flush()
+        self.assertTrue(writer.writable)
+        self.assertFalse(reader.writable)
+        self.assertEqual([item["seq"] for item in reader.query("a1", limit=0)[0]], [1])
+
+        writer.close()
+        with mock.patch.object(agent_history_store, "WRITER_RETRY_INTERVAL", 0):
+            reader.append("a1", entry(2), [{"op": "replace", "path": "/step", "value": 2}], base_seq=1)
+            reader.flush()
+        self.assertTrue(reader.writable)
+        self.assertEqual([item["state"] for item in reader.query("a1", limit=0)[0]], [{"step": 1}, {"step": 2}])
+        reader.close()
+
+if __name__ == '__main__':
+    unittest.main()
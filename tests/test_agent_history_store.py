@@ -0,0 +1,212 @@
+import os
+import sys
+import copy
+import asyncio
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+# Adicionar a raiz do projeto ao path para importar o pacote services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.agent_history_store import AgentHistoryLog, to_epoch
+from services.agent_monitor_service import AgentMonitorService
+from services.agent_state_delta import diff_state
+
+START = datetime(2026, 1, 1)
+
+def fill(log, agents=("a1", "a2"), count=120):
+    """Grava `count` estados por agente, um por segundo; retorna {agente: [estados com metadados]}"""
+    written = {agent_id: [] for agent_id in agents}
+    for step in range(count):
+        for agent_id in agents:
+            previous = written[agent_id][-1]["state"] if written[agent_id] else None
+            state = {"status": "running", "step": step, "log": (previous or {"log": []})["log"] + [f"{agent_id}-{step}"]}
+            entry = {"state": state, "timestamp": (START + timedelta(seconds=step)).isoformat(), "seq": step + 1}
+            log.append(agent_id, entry, diff_state(previous, state) if previous else None)
+            written[agent_id].append(copy.deepcopy(entry))
+    return written
+
+class TestAgentHistoryLog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def make_log(self, **options):
+        options.setdefault("max_age", None)
+        options.setdefault("max_bytes", None)
+        return AgentHistoryLog(self.directory, segment_bytes=4096, keyframe_interval=10, **options)
+
+    def test_range_and_cursor_queries(self):
+        log = self.make_log()
+        written = fill(log)
+        self.assertGreater(log.stats()["segments"], 3)
+
+        since = to_epoch((START + timedelta(seconds=30)).isoformat())
+        until = to_epoch((START + timedelta(seconds=60)).isoformat())
+        page, more = log.query("a1", since, until, limit=10)
+        self.assertEqual(page, written["a1"][50:60])
+        self.assertTrue(more)
+
+        # Páginas anteriores pelo cursor até o início do intervalo
+        pages = [page]
+        while more:
+            page, more = log.query("a1", since, until, before_seq=pages[-1][0]["seq"], limit=10)
+            pages.append(page)
+        self.assertEqual([entry for page in reversed(pages) for entry in page], written["a1"][30:60])
+        self.assertEqual(log.query("a2", limit=5)[0], written["a2"][-5:])
+        self.assertEqual(log.query("missing"), ([], False))
+        log.close()
+
+    def test_reopen_rebuilds_index_and_drops_partial_record(self):
+        log = self.make_log()
+        written = fill(log, count=40)
+        log.close()
+        segments = sorted(name for name in os.listdir(self.directory))
+        with open(os.path.join(self.directory, segments[-1]), "ab") as segment:
+            segment.write(b'"a1"\t41\t2026-01-01T00:00:41\tp\t[{"op"')
+
+        reopened = self.make_log()
+        self.assertEqual(reopened.last_seq("a1"), 40)
+        self.assertEqual(reopened.query("a1", limit=0)[0], written["a1"])
+        entry = {"state": {"status": "done"}, "timestamp": (START + timedelta(seconds=41)).isoformat(), "seq": 41}
+        reopened.append("a1", entry, [{"op": "replace", "path": "/status", "value": "done"}])
+        self.assertEqual(reopened.query("a1", limit=1)[0][0]["state"]["status"], "done")
+        reopened.close()
+
+    def test_corrupt_line_is_dropped_with_the_rest_of_the_segment(self):
+        log = self.make_log()
+        fill(log, count=40)
+        log.close()
+        first = os.path.join(self.directory, min(name for name in os.listdir(self.directory) if name.endswith(".log")))
+        with open(first, "rb") as segment:
+            lines = segment.readlines()
+        with open(first, "wb") as segment:
+            segment.writelines(lines[:5] + [b"not a record\n"] + lines[6:])
+
+        reopened = self.make_log()
+        reopened.load()
+        self.assertEqual(os.path.getsize(first), sum(len(line) for line in lines[:5]))
+        # Os segmentos seguintes começam com keyframes e continuam legíveis
+        self.assertEqual(reopened.last_seq("a1"), 40)
+        self.assertEqual(reopened.query("a1", limit=1)[0][0]["seq"], 40)
+        reopened.close()
+
+    def test_flush_does_not_wait_for_later_records(self):
+        log = self.make_log()
+        log.load()
+        started, release_first, release_second = threading.Event(), threading.Event(), threading.Event()
+        append = log._append
+
+        def slow_append(agent_id, *args):
+            # Retém a thread escritora em cada registro até o teste liberar
+            started.set()
+            (release_first if agent_id == "a1" else release_second).wait()
+            append(agent_id, *args)
+
+        log._append = slow_append
+        log.append("a1", {"state": {"step": 1}, "timestamp": START.isoformat(), "seq": 1}, None)
+        started.wait()
+        flushed = threading.Event()
+        thread = threading.Thread(target=lambda: (log.flush(), flushed.set()))
+        thread.start()
+        # Enfileirado depois do flush e retido na escritora: o flush não espera por ele
+        log.append("a2", {"state": {"step": 1}, "timestamp": START.isoformat(), "seq": 1}, None)
+        release_first.set()
+        self.assertTrue(flushed.wait(5))
+        thread.join()
+        release_second.set()
+        log.flush()
+        self.assertEqual(log.last_seq("a2"), 1)
+        log.close()
+
+    def test_retention_keeps_queries_consistent(self):
+        log = self.make_log(max_bytes=3 * 4096)
+        written = fill(log)
+        stats = log.stats()
+        self.assertLessEqual(stats["bytes"], 3 * 4096 + 4096)
+        remaining, _ = log.query("a1", limit=0)
+        # O que sobrou é um sufixo exato do que foi gravado
+        self.assertEqual(remaining, written["a1"][-len(remaining):])
+        self.assertLess(len(remaining), 120)
+        log.close()
+
+    def test_age_retention_drops_whole_old_segments(self):
+        log = self.make_log()
+        written = fill(log)
+        segments = log.stats()["segments"]
+        # Somem os segmentos inteiros mais velhos que 30s; os últimos 30s ficam
+        log.max_age = 30
+        log.enforce_retention(now=to_epoch(written["a1"][-1]["timestamp"]))
+        remaining, _ = log.query("a1", limit=0)
+        self.assertEqual(remaining, written["a1"][-len(remaining):])
+        self.assertGreaterEqual(len(remaining), 31)
+        self.assertLess(log.stats()["segments"], segments)
+        log.close()
+
+    def test_append_never_waits_for_the_index_lock(self):
+        log = self.make_log()
+        log.load()
+        held, release = threading.Event(), threading.Event()
+
+        def reader():
+            # Uma consulta longa segura o lock do índice numa thread do executor
+            with log._lock:
+                held.set()
+                release.wait()
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        held.wait()
+        entry = {"state": {"step": 1}, "timestamp": START.isoformat(), "seq": 1}
+        log.append("a1", entry, None)
+        self.assertEqual(log.last_seq("a1"), 0)
+        release.set()
+        thread.join()
+        self.assertEqual(log.query("a1")[0], [entry])
+        self.assertEqual(log.last_seq("a1"), 1)
+        log.close()
+
+    def test_missing_base_is_written_as_keyframe(self):
+        log = self.make_log()
+        log.append("a1", {"state": {"step": 1}, "timestamp": START.isoformat(), "seq": 1}, None)
+        # O registro 2 não foi gravado (fila cheia): o patch 2 -> 3 não teria base no log
+        entry = {"state": {"step": 3, "tool": "search"}, "timestamp": START.isoformat(), "seq": 3}
+        log.append("a1", entry, [{"op": "replace", "path": "/step", "value": 3}], base_seq=2)
+        self.assertEqual(log.query("a1", limit=0)[0][-1], entry)
+        log.close()
+
+class TestServiceHistory(unittest.TestCase):
+
+    def test_history_beyond_memory_tail_and_across_restart(self):
+        directory = tempfile.mkdtemp()
+
+        async def first_run():
+            monitor = AgentMonitorService(batch_window=0, history_dir=directory)
+            for step in range(150):
+                await monitor.update_agent_state("a1", {"status": "running", "step": step})
+            recent = await monitor.query_agent_history("a1", limit=20)
+            older = await monitor.query_agent_history("a1", limit=100, before_seq=int(recent["nextCursor"]))
+            monitor.history_log.close()
+            return recent, older
+
+        async def second_run():
+            monitor = AgentMonitorService(batch_window=0, history_dir=directory)
+            await monitor.update_agent_state("a1", {"status": "done", "step": 150})
+            page = await monitor.query_agent_history("a1", limit=200)
+            monitor.history_log.close()
+            return page
+
+        recent, older = asyncio.run(first_run())
+        self.assertEqual([entry["seq"] for entry in recent["history"]], list(range(131, 151)))
+        self.assertEqual([entry["state"]["step"] for entry in older["history"]], list(range(30, 130)))
+        self.assertEqual(older["nextCursor"], "31")
+
+        page = asyncio.run(second_run())
+        self.assertEqual([entry["seq"] for entry in page["history"]], list(range(1, 152)))
+        self.assertIsNone(page["nextCursor"])
+        self.assertEqual(page["history"][-1]["state"], {"status": "done", "step": 150})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+
+# Adicionar a raiz do projeto ao path para importar o pacote services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.agent_monitor_service import AgentMonitorService, COALESCE, DISCONNECT, DROP_OLDEST
+
+class FakeWebSocket:
+    """Cliente que só entrega mensagens quando `release` é sinalizado."""
+
+    def __init__(self, blocked=False, fail=False):
+        self.messages = []
+        self.closed_with = None
+        self.fail = fail
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+
+    async def send_text(self, message):
+        if self.fail:
+            raise ConnectionError("cliente caiu")
+        await self.release.wait()
+        self.messages.append(json.loads(message))
+
+    async def close(self, code=None):
+        self.closed_with = code
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+class TestAgentMonitorFanout(unittest.TestCase):
+
+    def test_slow_client_does_not_block_others(self):
+        async def scenario():
+            monitor = AgentMonitorService(queue_size=8, overflow_policy=DROP_OLDEST, batch_window=0)
+            slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+            await monitor.register_client(slow)
+            await monitor.register_client(fast)
+            await asyncio.wait_for(monitor.update_agent_state("a1", {"status": "running"}), timeout=1)
+            await settle()
+            received = [message["type"] for message in fast.messages]
+            await monitor.unregister_client(slow)
+            await monitor.unregister_client(fast)
+            return received, slow.messages
+        received, slow_messages = run(scenario())
+        self.assertEqual(received, ["full_state", "state_update"])
+        self.assertEqual(slow_messages, [])
+
+    def test_drop_oldest_keeps_newest_messages(self):
+        async def scenario():
+            monitor = AgentMonitorService(queue_size=3, overflow_policy=DROP_OLDEST, batch_window=0)
+            client = FakeWebSocket(blocked=True)
+            await monitor.register_client(client)
+            # O escritor retira a primeira mensagem (full_state) e aguarda o envio
+            await settle()
+            for step in range(6):
+                await monitor.update_agent_state("a1", {"step": step})
+            client.release.set()
+            await settle()
+            stats = monitor.get_fanout_stats()
+            await monitor.unregister_client(client)
+            return client.messages, stats
+        messages, stats = run(scenario())
+        steps = [message["data"]["state"]["step"] for message in messages if message["type"] == "state_update"]
+        self.assertEqual(steps, [3, 4, 5])
+        self.assertEqual(stats["dropped"], 3)
+
+    def test_coalesce_replaces_pending_update_of_same_agent(self):
+        async def scenario():
+            monitor = AgentMonitorService(queue_size=2, overflow_policy=COALESCE, batch_window=0)
+            client = FakeWebSocket(blocked=True)
+            await monitor.register_client(client)
+            await settle()
+            await monitor.update_agent_state("a1", {"step": 1})
+            await monitor.update_agent_state("a2", {"step": 1})
+            await monitor.update_agent_state("a1", {"step": 2})
+            client.release.set()
+            await settle()
+            await monitor.unregister_client(client)
+            return client.messages
+        messages = run(scenario())
+        updates = [(message["agent_id"], message["data"]["state"]["step"]) for message in messages if message["type"] == "state_update"]
+        self.assertEqual(updates, [("a2", 1), ("a1", 2)])
+
+    def test_disconnect_policy_closes_overflowing_client(self):
+        async def scenario():
+            monitor = AgentMonitorService(queue_size=1, overflow_policy=DISCONNECT, batch_window=0)
+            client = FakeWebSocket(blocked=True)
+            await monitor.register_client(client)
+            await settle()
+            await monitor.update_agent_state("a1", {"step": 1})
+            await monitor.update_agent_state("a1", {"step": 2})
+            await settle()
+            return monitor, client
+        monitor, client = run(scenario())
+        self.assertEqual(client.closed_with, 1013)
+        self.assertEqual(monitor.connected_clients, {})
+        self.assertEqual(monitor.disconnected_slow_clients, 1)
+
+    def test_failed_send_unregisters_client(self):
+        async def scenario():
+            monitor = AgentMonitorService()
+            client = FakeWebSocket(fail=True)
+            await monitor.register_client(client)
+            await settle()
+            return monitor
+        monitor = run(scenario())
+        self.assertEqual(monitor.connected_clients, {})
+
+class TestAgentMonitorBatching(unittest.TestCase):
+
+    def test_updates_in_window_collapse_to_latest_state(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0.05)
+            client = FakeWebSocket()
+            await monitor.register_client(client)
+            # A primeira atualização de um agente é enviada na hora
+            await monitor.update_agent_state("a1", {"status": "running", "step": 0})
+            await monitor.update_agent_state("a2", {"status": "running", "step": 0})
+            for step in range(1, 10):
+                await monitor.update_agent_state("a1", {"status": "running", "step": step})
+                await monitor.update_agent_state("a2", {"status": "running", "step": step})
+            await settle()
+            before_tick = [message["type"] for message in client.messages]
+            await asyncio.sleep(0.1)
+            await monitor.unregister_client(client)
+            return before_tick, client.messages
+        before_tick, messages = run(scenario())
+        self.assertEqual(before_tick, ["full_state", "state_update", "state_update"])
+        self.assertEqual(len(messages), 4)
+        batch = messages[-1]
+        self.assertEqual(batch["type"], "state_batch")
+        self.assertEqual({agent: data["state"]["step"] for agent, data in batch["data"].items()}, {"a1": 9, "a2": 9})
+
+    def test_status_change_bypasses_window(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=10)
+            client = FakeWebSocket()
+            await monitor.register_client(client)
+            await monitor.update_agent_state("a1", {"status": "running", "step": 0})
+            await monitor.update_agent_state("a1", {"status": "running", "step": 1})
+            await monitor.update_agent_state("a1", {"status": "done", "step": 2})
+            await monitor.update_agent_state("a1", {"status": "done", "step": 3}, immediate=True)
+            await settle()
+            pending = dict(monitor.pending_updates)
+            await monitor.unregister_client(client)
+            return client.messages, pending
+        messages, pending = run(scenario())
+        updates = [message["data"]["state"]["step"] for message in messages if message["type"] == "state_update"]
+        # O passo 1 ficou obsoleto antes do fim da janela e nunca é enviado
+        self.assertEqual(updates, [0, 2, 3])
+        self.assertEqual(pending, {})
+
+if __name__ == '__main__':
+    unittest.main()
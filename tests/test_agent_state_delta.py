@@ -0,0 +1,199 @@
+import os
+import sys
+import copy
+import json
+import random
+import asyncio
+import unittest
+
+# Adicionar a raiz do projeto ao path para importar o pacote services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.agent_monitor_service import AgentMonitorService
+from services.agent_state_delta import DeltaHistory, apply_patch, diff_state
+
+class RecordingWebSocket:
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, message):
+        self.messages.append(json.loads(message))
+
+    async def close(self, code=None):
+        pass
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+async def drain(monitor):
+    while monitor.get_fanout_stats()["queued"]:
+        await asyncio.sleep(0)
+    await settle()
+
+def random_state(rng, previous=None):
+    state = copy.deepcopy(previous) if previous else {"status": "running", "plan": {"steps": [], "current": 0}, "messages": []}
+    state["plan"]["current"] = rng.randint(0, 10)
+    if rng.random() < 0.5:
+        state["messages"].append({"role": "assistant", "text": f"m{rng.random()}"})
+    if rng.random() < 0.2:
+        state["plan"]["steps"] = [f"s{rng.randint(0, 3)}" for _ in range(rng.randint(0, 3))]
+    if rng.random() < 0.2:
+        state.pop("error", None) if "error" in state else state.update({"error": "x/y~z"})
+    return state
+
+class TestDiffState(unittest.TestCase):
+
+    def test_patch_round_trip(self):
+        rng = random.Random(7)
+        previous = random_state(rng)
+        for _ in range(200):
+            current = random_state(rng, previous)
+            snapshot = copy.deepcopy(previous)
+            self.assertEqual(apply_patch(previous, diff_state(previous, current)), current)
+            # O documento original não é alterado
+            self.assertEqual(previous, snapshot)
+            previous = current
+
+    def test_only_changed_leaves_and_appends(self):
+        previous = {"status": "running", "log": ["a"], "plan": {"current": 1, "steps": ["x"]}, "old": 1}
+        current = {"status": "running", "log": ["a", "b"], "plan": {"current": 2, "steps": ["x"]}, "new": True}
+        self.assertEqual(diff_state(previous, current), [
+            {"op": "add", "path": "/log/-", "value": "b"},
+            {"op": "replace", "path": "/plan/current", "value": 2},
+            {"op": "add", "path": "/new", "value": True},
+            {"op": "remove", "path": "/old"}
+        ])
+        self.assertEqual(diff_state({"count": 1}, {"count": True}), [{"op": "replace", "path": "/count", "value": True}])
+
+class TestDeltaHistory(unittest.TestCase):
+
+    def test_reconstructs_states_after_trimming(self):
+        rng = random.Random(3)
+        history = DeltaHistory(max_entries=30, keyframe_interval=7)
+        states, previous = [], None
+        for seq in range(1, 101):
+            state = random_state(rng, previous)
+            history.append({"state": state, "timestamp": str(seq), "seq": seq}, diff_state(previous, state) if previous else None)
+            states.append(state)
+            previous = state
+        self.assertEqual(len(history), 30)
+        self.assertIn("state", history.entries[0])
+        self.assertEqual([entry["state"] for entry in history.states()], states[-30:])
+        self.assertEqual([entry["seq"] for entry in history.states(5)], [96, 97, 98, 99, 100])
+        keyframes = sum("state" in entry for entry in history.entries)
+        self.assertLessEqual(keyframes, 30 // 7 + 2)
+
+class TestDeltaProtocol(unittest.TestCase):
+
+    def test_delta_client_rebuilds_states(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            client, legacy = RecordingWebSocket(), RecordingWebSocket()
+            await monitor.register_client(client, encoding="delta")
+            await monitor.register_client(legacy)
+            rng = random.Random(5)
+            states, previous = [], None
+            for _ in range(30):
+                previous = random_state(rng, previous)
+                states.append(copy.deepcopy(previous))
+                await monitor.update_agent_state("a1", previous)
+            await drain(monitor)
+            return client.messages, legacy.messages, states, monitor.get_agent_history("a1", 0)
+        messages, legacy, states, history = run(scenario())
+        self.assertEqual([message["type"] for message in messages[:3]], ["full_state", "state_update", "state_delta"])
+        self.assertTrue(all(message["type"] == "state_update" for message in legacy[1:]))
+
+        state, seq = None, 0
+        for message in messages[1:]:
+            data = message["data"]
+            if message["type"] == "state_update":
+                state, seq = data["state"], data["seq"]
+            else:
+                self.assertEqual(data["base"], seq)
+                state, seq = apply_patch(state, data["patch"]), data["seq"]
+        self.assertEqual(state, states[-1])
+        self.assertEqual(seq, 30)
+        self.assertEqual([entry["state"] for entry in history], states)
+
+    def test_batch_patches_start_from_last_sent_version(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0.01)
+            client = RecordingWebSocket()
+            await monitor.register_client(client, encoding="delta")
+            await monitor.update_agent_state("a1", {"status": "running", "step": 0, "log": []})
+            for step in range(1, 4):
+                await monitor.update_agent_state("a1", {"status": "running", "step": step, "log": list(range(step))})
+            await asyncio.sleep(0.05)
+            return client.messages
+        messages = run(scenario())
+        batch = messages[-1]["data"]["a1"]
+        self.assertEqual((batch["base"], batch["seq"]), (1, 4))
+        self.assertEqual(apply_patch({"status": "running", "step": 0, "log": []}, batch["patch"]),
+                         {"status": "running", "step": 3, "log": [0, 1, 2]})
+
+    def test_resync_sends_last_sent_state(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            client = RecordingWebSocket()
+            await monitor.register_client(client, encoding="delta")
+            await monitor.update_agent_state("a1", {"status": "running", "step": 1})
+            await monitor.update_agent_state("a2", {"status": "running", "step": 1})
+            await monitor.update_agent_state("a1", {"status": "running", "step": 2})
+            await monitor.handle_client_message(client, json.dumps({"action": "resync", "agents": ["a1", "missing"]}))
+            await settle()
+            return client.messages[-1]
+        message = run(scenario())
+        self.assertEqual(message["type"], "full_state")
+        self.assertEqual(message["data"], {"a1": {"state": {"status": "running", "step": 2}, "timestamp": message["data"]["a1"]["timestamp"], "seq": 2}})
+
+    def test_field_subscriber_patches_start_from_what_it_received(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            client = RecordingWebSocket()
+            await monitor.register_client(client, ["field:error"], encoding="delta")
+            states = [{"status": "running", "step": step, "error": f"e{step // 3}"} for step in range(10)]
+            for state in states:
+                await monitor.update_agent_state("a1", state)
+            await drain(monitor)
+            return client.messages, states
+        messages, states = run(scenario())
+        updates = messages[1:]
+        # Só as mudanças de "error" chegam; nenhum patch parte de uma versão não recebida
+        self.assertEqual([message["type"] for message in updates], ["state_update"] + ["state_delta"] * 3)
+        state, seq = updates[0]["data"]["state"], updates[0]["data"]["seq"]
+        for message in updates[1:]:
+            self.assertEqual(message["data"]["base"], seq)
+            state, seq = apply_patch(state, message["data"]["patch"]), message["data"]["seq"]
+        self.assertEqual((state, seq), (states[9], 10))
+
+    def test_role_change_sends_full_state_to_new_subscribers(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0.01)
+            client = RecordingWebSocket()
+            await monitor.register_client(client, ["role:reviewer"], encoding="delta")
+            await monitor.update_agent_state("a1", {"status": "running", "role": "coder", "step": 1})
+            await monitor.update_agent_state("a1", {"status": "running", "role": "coder", "step": 2})
+            await asyncio.sleep(0.05)
+            await monitor.update_agent_state("a1", {"status": "running", "role": "reviewer", "step": 3})
+            await asyncio.sleep(0.05)
+            await monitor.update_agent_state("a1", {"status": "running", "role": "reviewer", "step": 4})
+            await asyncio.sleep(0.05)
+            return [message["data"]["a1"] for message in client.messages if message["type"] == "state_batch"]
+        entries = run(scenario())
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[0]["state"]["step"], 3)
+        self.assertEqual((entries[1]["base"], entries[1]["seq"]), (entries[0]["seq"], 4))
+
+    def test_unknown_encoding_is_rejected(self):
+        async def scenario():
+            with self.assertRaises(ValueError):
+                await AgentMonitorService().register_client(RecordingWebSocket(), encoding="gzip")
+        run(scenario())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+
+# Adicionar a raiz do projeto ao path para importar o pacote services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.agent_monitor_service import AgentMonitorService
+from services.agent_subscriptions import SubscriptionIndex, parse_topic
+
+class RecordingWebSocket:
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_text(self, message):
+        self.messages.append(json.loads(message))
+
+    async def close(self, code=None):
+        pass
+
+    def of_type(self, message_type):
+        return [message for message in self.messages if message["type"] == message_type]
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def settle():
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+async def drain(monitor):
+    while monitor.get_fanout_stats()["queued"]:
+        await asyncio.sleep(0)
+
+class TestSubscriptionIndex(unittest.TestCase):
+
+    def test_parse_topic(self):
+        self.assertEqual(parse_topic("agent:a1"), ("agent", "a1"))
+        self.assertEqual(parse_topic("pattern:team-*"), ("pattern", "team-*"))
+        self.assertEqual(parse_topic("all"), ("all", ""))
+        for invalid in ("a1", "agent:", "color:red"):
+            with self.assertRaises(ValueError):
+                parse_topic(invalid)
+
+    def test_recipients_follow_agent_pattern_role_and_field(self):
+        index = SubscriptionIndex()
+        index.add_client("by_agent", [("agent", "team-1-a")])
+        index.add_client("by_pattern", [("pattern", "team-1-*")])
+        index.add_client("by_role", [("role", "planner")])
+        index.add_client("by_field", [("field", "error")])
+        index.note_agent("team-1-a", {"role": "coder"})
+        index.note_agent("team-2-a", {"role": "planner"})
+
+        self.assertEqual(index.recipients("team-1-a", ["step"]), {"by_agent", "by_pattern"})
+        self.assertEqual(index.recipients("team-2-a", ["step"]), {"by_role"})
+        self.assertEqual(index.recipients("team-2-a", ["error"]), {"by_role", "by_field"})
+
+        # Padrões inscritos depois do agente também são indexados
+        index.subscribe("by_role", [("pattern", "team-?-a")])
+        self.assertIn("by_role", index.recipients("team-1-a", []))
+        index.remove_client("by_pattern")
+        self.assertEqual(index.recipients("team-1-a", []), {"by_agent", "by_role"})
+
+class TestAgentSubscriptions(unittest.TestCase):
+
+    def test_team_subscriber_gets_one_percent_of_traffic(self):
+        async def scenario():
+            monitor = AgentMonitorService(queue_size=4096, batch_window=0)
+            everyone, instructor = RecordingWebSocket(), RecordingWebSocket()
+            await monitor.register_client(everyone)
+            await monitor.register_client(instructor, ["pattern:team-7-*"])
+            # 100 equipes de 5 agentes
+            for step in range(4):
+                for team in range(100):
+                    for member in range(5):
+                        await monitor.update_agent_state(f"team-{team}-{member}", {"status": "running", "step": step})
+            await drain(monitor)
+            await monitor.unregister_client(everyone)
+            await monitor.unregister_client(instructor)
+            return everyone, instructor
+        everyone, instructor = run(scenario())
+        self.assertEqual(len(everyone.of_type("state_update")), 2000)
+        self.assertEqual(len(instructor.of_type("state_update")), 20)
+        self.assertTrue(all(message["agent_id"].startswith("team-7-") for message in instructor.of_type("state_update")))
+
+    def test_first_subscribe_narrows_and_sends_snapshot(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            await monitor.update_agent_state("a1", {"status": "running", "role": "planner"})
+            await monitor.update_agent_state("a2", {"status": "running", "role": "coder"})
+            client = RecordingWebSocket()
+            await monitor.register_client(client)
+            await monitor.handle_client_message(client, json.dumps({"action": "subscribe", "topics": ["role:coder"]}))
+            await monitor.update_agent_state("a1", {"status": "done", "role": "planner"})
+            await monitor.update_agent_state("a2", {"status": "done", "role": "coder"})
+            await monitor.handle_client_message(client, json.dumps({"action": "unsubscribe", "topics": "role:coder"}))
+            await monitor.update_agent_state("a2", {"status": "failed", "role": "coder"})
+            await monitor.handle_client_message(client, json.dumps({"action": "subscribe", "topics": ["color:red"]}))
+            await settle()
+            return client.messages
+        messages = run(scenario())
+        self.assertEqual([message["type"] for message in messages],
+                         ["full_state", "full_state", "subscriptions", "state_update", "subscriptions", "error"])
+        self.assertEqual(set(messages[0]["data"]), {"a1", "a2"})
+        self.assertEqual(set(messages[1]["data"]), {"a2"})
+        self.assertEqual(messages[2]["topics"], ["role:coder"])
+        self.assertEqual(messages[3]["agent_id"], "a2")
+        self.assertEqual(messages[4]["topics"], [])
+
+    def test_field_subscription_receives_only_changes_of_that_field(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0)
+            client = RecordingWebSocket()
+            await monitor.register_client(client, ["field:error"])
+            await monitor.update_agent_state("a1", {"status": "running", "step": 1})
+            await monitor.update_agent_state("a1", {"status": "running", "step": 2, "error": "OOM"})
+            await monitor.update_agent_state("a1", {"status": "running", "step": 3, "error": "OOM"})
+            await settle()
+            return client.of_type("state_update")
+        updates = run(scenario())
+        self.assertEqual([update["data"]["state"]["step"] for update in updates], [2])
+
+    def test_batches_carry_only_subscribed_agents(self):
+        async def scenario():
+            monitor = AgentMonitorService(batch_window=0.01)
+            first, second, everyone = RecordingWebSocket(), RecordingWebSocket(), RecordingWebSocket()
+            await monitor.register_client(first, ["agent:a1"])
+            await monitor.register_client(second, ["agent:a2"])
+            await monitor.register_client(everyone)
+            for step in range(3):
+                for agent_id in ("a1", "a2", "a3"):
+                    await monitor.update_agent_state(agent_id, {"status": "running", "step": step})
+            await asyncio.sleep(0.05)
+            return [set(client.of_type("state_batch")[-1]["data"]) for client in (first, second, everyone)]
+        batches = run(scenario())
+        self.assertEqual(batches, [{"a1"}, {"a2"}, {"a1", "a2", "a3"}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+from typing import Optional
+from unittest import mock
+
+from pydantic import BaseModel
+from starlette.requests import Request
+
+# Adicionar o diretório do backend ao path para importar a camada de persistência
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from persistence import bulk
+from persistence.bulk import RowError, iter_row_chunks, validate_chunk
+
+class Reading(BaseModel):
+    userId: str
+    loadValue: int
+    note: Optional[str] = None
+
+def make_request(body: bytes, content_type: str, piece: int = 7) -> Request:
+    """Requisição cujo corpo chega em pedaços de `piece` bytes."""
+    pieces = [body[i:i + piece] for i in range(0, len(body), piece)] or [b""]
+    messages = [{"type": "http.request", "body": p, "more_body": i < len(pieces) - 1} for i, p in enumerate(pieces)]
+
+    async def receive():
+        return messages.pop(0)
+
+    scope = {"type": "http", "method": "POST", "path": "/bulk", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+def parse(body: bytes, content_type: str = "application/x-ndjson", chunk_size: int = 500):
+    async def run():
+        return [chunk async for chunk in iter_row_chunks(make_request(body, content_type), chunk_size)]
+    return asyncio.run(run())
+
+def rows(body: bytes, content_type: str = "application/x-ndjson"):
+    return [row for chunk in parse(body, content_type) for row in chunk]
+
+class TestNdjsonRows(unittest.TestCase):
+
+    def test_rows_are_chunked(self):
+        body = "\n".join(json.dumps({"userId": "u1", "loadValue": i}) for i in range(5)).encode()
+        chunks = parse(body, chunk_size=2)
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual([number for chunk in chunks for number, _ in chunk], [1, 2, 3, 4, 5])
+
+    def test_malformed_json_is_a_row_error(self):
+        body = b'{"userId": "u1", "loadValue": 3}\n{"userId": \n[1, 2]\n{"userId": "u2", "loadValue": 4}\n'
+        parsed = rows(body)
+        self.assertEqual(len(parsed), 4)
+        self.assertIsInstance(parsed[1][1], RowError)
+        self.assertIn("JSON object", str(parsed[2][1]))
+        valid, errors = validate_chunk(Reading, parsed)
+        self.assertEqual([number for number, _ in valid], [1, 4])
+        self.assertEqual([error["row"] for error in errors], [2, 3])
+
+    def test_bad_encoding_rejects_only_that_row(self):
+        body = b'{"userId": "u1", "loadValue": 3}\n\n{"userId": "\xff\xfe", "loadValue": 4}\n{"userId": "\xc3\xa9", "loadValue": 5}'
+        parsed = rows(body)
+        self.assertEqual(len(parsed), 3)
+        self.assertIsInstance(parsed[1][1], RowError)
+        # A linha em branco conta para a linha do corpo, não para o número do registro
+        self.assertIn("Line 3", str(parsed[1][1]))
+        self.assertEqual(parsed[2], (3, {"userId": "é", "loadValue": 5}))
+
+    def test_long_line_is_a_row_error(self):
+        record = json.dumps({"userId": "u1", "loadValue": 3}).encode()
+        body = record + b"\n" + b'{"note": "' + b"x" * 200 + b'"}\n' + record + b"\n" + b"y" * 200
+        with mock.patch.object(bulk, "MAX_LINE_BYTES", 64):
+            parsed = rows(body)
+        self.assertEqual([number for number, _ in parsed], [1, 2, 3, 4])
+        self.assertEqual(parsed[0][1], parsed[2][1])
+        # A linha longa no meio e a do fim, sem quebra de linha, viram erros da própria linha
+        self.assertIn("Line 2 is longer than 64 bytes", str(parsed[1][1]))
+        self.assertIn("Line 4 is longer than 64 bytes", str(parsed[3][1]))
+
+    def test_line_at_the_limit_is_kept(self):
+        record = json.dumps({"userId": "u1", "loadValue": 3}).encode()
+        with mock.patch.object(bulk, "MAX_LINE_BYTES", len(record)):
+            self.assertEqual(rows(record + b"\n" + record), [(1, json.loads(record)), (2, json.loads(record))])
+
+class TestCsvRows(unittest.TestCase):
+
+    def test_header_and_empty_cells(self):
+        body = b"userId,loadValue,note\r\nu1,3,\r\nu2,4,\"a, b\"\r\n"
+        self.assertEqual(rows(body, "text/csv"), [
+            (1, {"userId": "u1", "loadValue": "3", "note": None}),
+            (2, {"userId": "u2", "loadValue": "4", "note": "a, b"}),
+        ])
+
+    def test_column_count_mismatch(self):
+        body = b"userId,loadValue\nu1,3\nu2\nu3,5,extra\n"
+        valid, errors = validate_chunk(Reading, rows(body, "text/csv"))
+        self.assertEqual([number for number, _ in valid], [1])
+        self.assertEqual([error["row"] for error in errors], [2, 3])
+        self.assertIn("Expected 2 columns, got 1", errors[0]["errors"][0]["msg"])
+
+    def test_undecodable_header_rejects_every_row(self):
+        body = b"user\xffId,loadValue\nu1,3\nu2,4\n"
+        parsed = rows(body, "text/csv")
+        self.assertEqual(len(parsed), 2)
+        for _, row in parsed:
+            self.assertIsInstance(row, RowError)
+            self.assertIn("Invalid CSV header", str(row))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+import os
+import sys
+import asyncio
+import tempfile
+import unittest
+
+# Adicionar o diretório do backend ao path para importar a camada de persistência
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from unittest import mock
+
+from persistence import write_behind
+from persistence.write_behind import WriteBehindStore, SQLiteSink, SegmentFileSink, StoreFull
+
+class WriteBehindStoreTests:
+    """Casos comuns aos dois tipos de armazenamento."""
+
+    def make_sink(self, directory):
+        raise NotImplementedError
+
+    def test_batches_are_flushed_and_read_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = WriteBehindStore(self.make_sink(directory), batch_size=100, flush_interval=0.05)
+
+            async def run():
+                for i in range(1000):
+                    store.put("reading", {"userId": "u1", "loadValue": i % 9 + 1})
+                store.put("project", {"project_id": "p1", "value": 5})
+                await asyncio.sleep(0.2)
+                await store.close()
+
+            asyncio.run(run())
+            self.assertEqual(store.count(), 1001)
+
+            reopened = self.make_sink(directory)
+            records = list(reopened.read())
+            self.assertEqual(len(records), 1001)
+            self.assertEqual(records[0]["data"]["loadValue"], 1)
+            self.assertEqual(len(list(reopened.read(source="project"))), 1)
+
+            # Retomar a leitura a partir do último id recebido
+            first_page = list(reopened.read(limit=10))
+            rest = list(reopened.read(after_id=first_page[-1]["id"]))
+            self.assertEqual(len(rest), 991)
+            reopened.close()
+
+    def test_count_includes_other_writers_and_queued_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Dois workers gravando no mesmo caminho
+            first = WriteBehindStore(self.make_sink(directory), batch_size=100, flush_interval=0.05)
+            second = WriteBehindStore(self.make_sink(directory), batch_size=100, flush_interval=0.05)
+
+            async def run():
+                first.put_many("reading", [{"loadValue": i} for i in range(25)])
+                # Ainda na fila, já contados
+                self.assertEqual(first.count(), 25)
+                await first.flush()
+                self.assertEqual(first.count(), 25)
+                second.put_many("reading", [{"loadValue": i} for i in range(3)])
+                # As gravações do outro worker aparecem em até um flush_interval
+                await asyncio.sleep(0.3)
+                self.assertEqual(second.count(), 28)
+                self.assertEqual(first.count(), 28)
+                await second.close()
+                await first.close()
+
+            asyncio.run(run())
+
+class FailingSink:
+    def __init__(self):
+        self.closed = False
+
+    def count(self):
+        return 0
+
+    def write_batch(self, records):
+        raise OSError("disk full")
+
+    def close(self):
+        self.closed = True
+
+class TestStoreLimits(unittest.TestCase):
+
+    def test_full_queue_refuses_records(self):
+        store = WriteBehindStore(FailingSink(), batch_size=2, flush_interval=0.01, max_pending=5)
+
+        async def run():
+            store.put_many("reading", [{"loadValue": i} for i in range(4)])
+            await asyncio.sleep(0.05)
+            # As gravações falham: nada sai da fila e ela não cresce além do limite
+            with self.assertRaises(StoreFull):
+                store.put_many("reading", [{"loadValue": 5}, {"loadValue": 6}])
+            store.put("reading", {"loadValue": 5})
+            with self.assertRaises(StoreFull):
+                store.put("reading", {"loadValue": 6})
+            self.assertEqual((store.count(), store.accepted, store.shed), (5, 5, 3))
+            with self.assertRaises(OSError):
+                await store.close()
+
+        asyncio.run(run())
+
+    def test_count_does_no_sink_io(self):
+        sink = mock.Mock(wraps=FailingSink())
+        store = WriteBehindStore(sink, flush_interval=60)
+
+        async def run():
+            store.put_many("reading", [{"loadValue": i} for i in range(3)])
+            self.assertEqual(store.count(), 3)
+            store._task.cancel()
+
+        asyncio.run(run())
+        # Só a contagem inicial, na criação do store
+        self.assertEqual(sink.count.call_count, 1)
+
+    def test_sink_is_closed_when_the_last_flush_fails(self):
+        sink = FailingSink()
+        store = WriteBehindStore(sink)
+
+        async def run():
+            store.put("reading", {"loadValue": 1})
+            with self.assertRaises(OSError):
+                await store.close()
+            # Um segundo close (outro router no mesmo processo) não faz nada
+            await store.close()
+
+        asyncio.run(run())
+        self.assertTrue(sink.closed)
+
+    def test_one_shared_store_per_process(self):
+        with tempfile.TemporaryDirectory() as directory:
+            environ = {"CL_STORE_PATH": os.path.join(directory, "cl.db"), "CL_STORE_MAX_PENDING": "7"}
+            with mock.patch.dict(os.environ, environ), mock.patch.object(write_behind, "_shared_store", None):
+                store = write_behind.shared_store()
+                self.assertIs(write_behind.shared_store(), store)
+                self.assertEqual(store.max_pending, 7)
+                asyncio.run(store.close())
+                reopened = write_behind.shared_store()
+                self.assertIsNot(reopened, store)
+                asyncio.run(reopened.close())
+
+class TestSQLiteStore(WriteBehindStoreTests, unittest.TestCase):
+
+    def make_sink(self, directory):
+        return SQLiteSink(os.path.join(directory, "cl.db"))
+
+class TestSegmentFileStore(WriteBehindStoreTests, unittest.TestCase):
+
+    def make_sink(self, directory):
+        return SegmentFileSink(directory, fsync="always", segment_size=4096)
+
+if __name__ == '__main__':
+    unittest.main()
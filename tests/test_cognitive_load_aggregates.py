@@ -0,0 +1,68 @@
+import os
+import sys
+import random
+import statistics
+import unittest
+from collections import Counter
+
+import numpy as np
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.routes.cognitive_load import calculate_class_averages, calculate_cognitive_load_stats, median_from_distribution
+from app.services.cognitive_load_stats import SEQ_DIMENSIONS
+
+def aggregates_of(rows):
+    """Mesmo formato de query_class_aggregates, calculado em Python sobre `rows`"""
+    efforts = [row["effort"] for row in rows]
+    return {
+        "count": len(rows),
+        "averages": {dimension: float(np.mean([row[dimension] for row in rows])) for dimension in SEQ_DIMENSIONS},
+        "effort_squared_mean": float(np.mean(np.square(efforts))),
+        "overload_count": sum(effort >= 7 for effort in efforts)
+    }
+
+class TestMedianFromDistribution(unittest.TestCase):
+
+    def test_matches_statistics_median(self):
+        rng = random.Random(5)
+        for size in (1, 2, 3, 10, 11, 250):
+            values = [rng.randint(1, 9) for _ in range(size)]
+            self.assertEqual(median_from_distribution(Counter(values)), statistics.median(values), values)
+
+    def test_even_count_between_two_scores(self):
+        self.assertEqual(median_from_distribution({2: 1, 7: 1}), 4.5)
+        self.assertEqual(median_from_distribution({9: 2, 1: 2}), 5)
+
+class TestClassStats(unittest.TestCase):
+
+    def test_matches_the_per_row_computation(self):
+        rng = random.Random(11)
+        rows = [{dimension: rng.randint(1, 9) for dimension in SEQ_DIMENSIONS} for _ in range(301)]
+        efforts = [row["effort"] for row in rows]
+        stats = calculate_cognitive_load_stats(aggregates_of(rows), Counter(efforts))
+        self.assertEqual(stats, {
+            "mean": round(float(np.mean(efforts)), 2),
+            "median": statistics.median(efforts),
+            "stdDev": round(float(np.std(efforts)), 2),
+            "overload": round(sum(effort >= 7 for effort in efforts) / len(efforts) * 100)
+        })
+        averages = calculate_class_averages(aggregates_of(rows))
+        self.assertEqual(averages, [round(float(np.mean([row[d] for row in rows])), 1) for d in SEQ_DIMENSIONS])
+
+    def test_constant_effort_has_no_negative_variance(self):
+        rows = [{dimension: 7 for dimension in SEQ_DIMENSIONS}] * 3
+        aggregates = aggregates_of(rows)
+        # AVG(effort^2) - AVG(effort)^2 pode ficar levemente negativo no banco
+        aggregates["effort_squared_mean"] -= 1e-12
+        stats = calculate_cognitive_load_stats(aggregates, {7: 3})
+        self.assertEqual((stats["stdDev"], stats["overload"]), (0, 100))
+
+    def test_empty_class(self):
+        empty = {"count": 0, "averages": {}, "effort_squared_mean": 0, "overload_count": 0}
+        self.assertEqual(calculate_class_averages(empty), [0] * 7)
+        self.assertEqual(calculate_cognitive_load_stats(empty, {}), {"mean": 0, "median": 0, "stdDev": 0, "overload": 0})
+
+if __name__ == '__main__':
+    unittest.main()
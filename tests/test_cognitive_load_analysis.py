@@ -0,0 +1,62 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+from pydantic import ValidationError
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.routes.cognitive_load import CognitiveLoadAssessmentCreate
+from app.services.cognitive_load_analysis import analyze_cohort, score_counts, valid_rows
+
+def assessment(**scores):
+    values = dict(task_id=1, complexity=5, usability=5, effort=5, confidence=5, frustration=5, germane=5, transfer=5)
+    values.update(scores)
+    return values
+
+class TestScoreValidation(unittest.TestCase):
+
+    def test_scores_outside_the_scale_are_rejected(self):
+        self.assertEqual(CognitiveLoadAssessmentCreate(**assessment(effort=9)).effort, 9)
+        for score in (0, 10, -1):
+            with self.assertRaises(ValidationError):
+                CognitiveLoadAssessmentCreate(**assessment(effort=score))
+
+class TestScoreCounts(unittest.TestCase):
+
+    def test_counts_per_dimension(self):
+        scores = np.array([[1, 9], [1, 5], [2, 5]])
+        counts = score_counts(scores)
+        self.assertEqual(counts.shape, (2, 9))
+        self.assertEqual(counts[0].tolist(), [2, 1, 0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(counts[1].tolist(), [0, 0, 0, 0, 2, 0, 0, 0, 1])
+
+    def test_out_of_range_scores_do_not_leak_into_other_dimensions(self):
+        # effort=10 cairia no bin 1 de confidence e effort=-1 no bin 8 de usability
+        scores = np.array([[5, 10, 5], [5, -1, 5], [5, 5, 5]])
+        counts = score_counts(scores)
+        self.assertEqual(counts.sum(axis=1).tolist(), [3, 1, 3])
+        self.assertEqual(counts[0][7], 0)
+        self.assertEqual(counts[2][0], 0)
+        self.assertEqual(valid_rows(scores).tolist(), [False, False, True])
+
+class TestAnalyzeCohort(unittest.TestCase):
+
+    def test_rows_off_the_scale_are_excluded(self):
+        rng = np.random.default_rng(0)
+        scores = rng.integers(1, 10, size=(40, 7))
+        scores[0, 2], scores[1, 2] = 10, -1
+        arrays = {
+            "time": np.arange(40, dtype=np.float64),
+            "config_type": np.array(["q4", "q8"] * 20, dtype=object),
+            "scores": scores.astype(np.int8)
+        }
+        result = analyze_cohort(arrays, resamples=100, seed=1)
+        self.assertEqual((result["count"], result["excluded"]), (38, 2))
+        self.assertEqual(sum(result["groups"].values()), 38)
+        self.assertIsNotNone(result["effectSizes"]["effort"]["meanDifference"]["value"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.database import Base
+from app.models import CognitiveLoadAssessment, Task, User
+from app.services.cognitive_load_archive import (
+    archive_before, hot_start, list_partitions, month_start, naive_utc, next_month, read_archives, read_user_history
+)
+from app.services.cognitive_load_histograms import query_class_histogram, record_assessments
+from app.services.cognitive_load_rollups import check_rollups, record_rollups
+from app.services.cognitive_load_stats import SEQ_DIMENSIONS
+
+class TestMonthRanges(unittest.TestCase):
+
+    def test_month_boundaries(self):
+        self.assertEqual(month_start(datetime(2026, 3, 31, 23, 59)), datetime(2026, 3, 1))
+        self.assertEqual(next_month(datetime(2026, 3, 1)), datetime(2026, 4, 1))
+        self.assertEqual(next_month(datetime(2025, 12, 1)), datetime(2026, 1, 1))
+
+    def test_aware_datetimes_become_naive_utc(self):
+        moment = datetime(2026, 1, 1, 2, 0, tzinfo=timezone(timedelta(hours=3)))
+        self.assertEqual(naive_utc(moment), datetime(2025, 12, 31, 23, 0))
+        self.assertIsNone(naive_utc(None))
+
+class TestArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [{"id": 1, "expertise_level": "beginner"}, {"id": 2, "expertise_level": "advanced"}])
+            conn.execute(Task.__table__.insert(), [{"id": 1, "task_type": "qlora", "module_id": 3}])
+        self.db = sessionmaker(bind=engine)()
+        # Novembro e dezembro de 2025 e janeiro de 2026, dez avaliações por mês
+        for month in (datetime(2025, 11, 1), datetime(2025, 12, 1), datetime(2026, 1, 1)):
+            for day in range(10):
+                user_id = 1 + day % 2
+                row = {dimension: day % 9 + 1 for dimension in SEQ_DIMENSIONS}
+                row.update(user_id=user_id, task_id=1, config_type="q4", timestamp=month + timedelta(days=day, hours=day))
+                self.db.execute(CognitiveLoadAssessment.__table__.insert(), row)
+                counted = [dict(row, task_type="qlora", module_id=3)]
+                user = SimpleNamespace(id=user_id, expertise_level="beginner" if user_id == 1 else "advanced")
+                record_assessments(self.db, user, counted)
+                record_rollups(self.db, user, counted)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_current_month_cannot_be_archived(self):
+        with self.assertRaises(ValueError):
+            archive_before(self.db, next_month(month_start(datetime.utcnow())), self.directory.name)
+
+    def test_months_move_to_files_listed_in_the_manifest(self):
+        self.assertIsNone(hot_start(self.db))
+        partitions = archive_before(self.db, datetime(2026, 1, 15), self.directory.name)
+
+        self.assertEqual([(p.month, p.row_count) for p in partitions], [("2025-11", 10), ("2025-12", 10)])
+        self.assertEqual(list_partitions(self.db), partitions)
+        for partition in partitions:
+            self.assertTrue(os.path.exists(os.path.join(self.directory.name, partition.path)))
+        self.assertEqual(hot_start(self.db), datetime(2026, 1, 1))
+        self.assertEqual(self.db.query(CognitiveLoadAssessment).count(), 10)
+        self.assertEqual(list_partitions(self.db, since=datetime(2025, 12, 5)), partitions[1:])
+        self.assertEqual(list_partitions(self.db, until=datetime(2025, 12, 1)), partitions[:1])
+
+        # Os contadores passam a descrever só a partição quente
+        self.assertEqual(query_class_histogram(self.db)["total"], 10)
+        self.assertEqual(check_rollups(self.db), [])
+
+        # Uma nova execução não encontra mais nada para arquivar
+        self.assertEqual(archive_before(self.db, datetime(2026, 1, 1), self.directory.name), [])
+
+    def test_archived_rows_are_read_back(self):
+        archive_before(self.db, datetime(2026, 1, 1), self.directory.name)
+        table = read_archives(self.db, ["user_id", "effort", "expertise_level"], directory=self.directory.name,
+                              since=datetime(2025, 12, 1), expertise_level="advanced")
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(set(table.column("user_id").to_pylist()), {2})
+
+        history = read_user_history(self.db, 1, ["id", "timestamp"], None, 7, directory=self.directory.name)
+        timestamps = [timestamp for _, timestamp in history]
+        self.assertEqual(len(history), 7)
+        self.assertEqual(timestamps, sorted(timestamps, reverse=True))
+        self.assertEqual(timestamps[0].month, 12)
+        older = read_user_history(self.db, 1, ["id", "timestamp"], (timestamps[-1], history[-1][0]), 7, directory=self.directory.name)
+        self.assertEqual(len(history) + len(older), 10)
+        self.assertTrue(all(timestamp < timestamps[-1] for _, timestamp in older))
+
+if __name__ == '__main__':
+    unittest.main()
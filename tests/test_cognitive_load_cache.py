@@ -0,0 +1,79 @@
+import os
+import sys
+import unittest
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.services.cognitive_load_cache import ResponseCache, normalize_filters
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(max_entries=3, ttl=5, clock=self.clock)
+
+    def store(self, endpoint, key, response):
+        self.cache.put(endpoint, key, self.cache.version(key), response)
+
+    def test_hit(self):
+        key = normalize_filters("qlora", "", None, "")
+        self.assertEqual(key, ("qlora", None, None, None))
+        self.assertIsNone(self.cache.get("class", key))
+        self.store("class", key, {"radarData": [1]})
+        self.assertEqual(self.cache.get("class", key), {"radarData": [1]})
+        self.assertIsNone(self.cache.get("stats", key))
+        self.assertEqual(self.cache.stats(), {"entries": 1, "hits": 1, "misses": 2})
+
+    def test_invalidate_bumps_only_matching_filters(self):
+        matching = normalize_filters("qlora", "q4")
+        unfiltered = normalize_filters()
+        other = normalize_filters("lora", "q4")
+        for key in (matching, unfiltered, other):
+            self.store("stats", key, key)
+        self.cache.invalidate("qlora", "q4", 2, "beginner")
+        self.assertIsNone(self.cache.get("stats", matching))
+        self.assertIsNone(self.cache.get("stats", unfiltered))
+        self.assertEqual(self.cache.get("stats", other), other)
+
+    def test_response_computed_during_an_insert_is_not_stored(self):
+        key = normalize_filters()
+        version = self.cache.version(key)
+        self.cache.invalidate("qlora", None, None, None)
+        self.cache.put("class", key, version, "stale")
+        self.assertIsNone(self.cache.get("class", key))
+
+    def test_expiry(self):
+        key = normalize_filters(module_id=2)
+        self.store("class", key, "fresh")
+        self.clock.now = 4.9
+        self.assertEqual(self.cache.get("class", key), "fresh")
+        # Inserções de outro worker não invalidam este cache: a entrada expira
+        self.clock.now = 5.0
+        self.assertIsNone(self.cache.get("class", key))
+
+    def test_without_ttl_entries_live_until_invalidated(self):
+        cache = ResponseCache(clock=self.clock)
+        key = normalize_filters()
+        cache.put("class", key, cache.version(key), "kept")
+        self.clock.now = 1e6
+        self.assertEqual(cache.get("class", key), "kept")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        keys = [normalize_filters(module_id=module_id) for module_id in (1, 2, 3, 4)]
+        for key in keys[:3]:
+            self.store("class", key, key)
+        self.cache.get("class", keys[0])
+        self.store("class", keys[3], keys[3])
+        self.assertIsNone(self.cache.get("class", keys[1]))
+        self.assertEqual(self.cache.get("class", keys[0]), keys[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.migrations import add_cognitive_load_counters
+from app.models import CognitiveLoadHistogramBucket, UserCognitiveLoadHistogramBucket
+from app.services import counters
+from app.services.cognitive_load_histograms import CLASS_KEY, query_class_histogram, query_user_histogram, record_assessments
+from app.services.cognitive_load_stats import SEQ_DIMENSIONS
+
+BUCKET_TABLES = [CognitiveLoadHistogramBucket.__table__, UserCognitiveLoadHistogramBucket.__table__]
+
+def sqlite_session(tables=BUCKET_TABLES):
+    engine = create_engine("sqlite://")
+    for table in tables:
+        table.create(engine)
+    return engine, sessionmaker(bind=engine)()
+
+def assessment(effort, config_type="q4", task_type="qlora", module_id=1):
+    row = {dimension: 5 for dimension in SEQ_DIMENSIONS}
+    row.update(effort=effort, config_type=config_type, task_type=task_type, module_id=module_id)
+    return row
+
+class TestIncrementRows(unittest.TestCase):
+
+    def setUp(self):
+        self.engine, self.db = sqlite_session()
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: self.statements.append(args[2]))
+
+    def tearDown(self):
+        self.db.close()
+
+    def counts(self):
+        return {tuple(getattr(row, column) for column in CLASS_KEY): row.count for row in self.db.query(CognitiveLoadHistogramBucket)}
+
+    def test_creates_then_adds_with_one_statement(self):
+        key = ("effort", 7, "q4", "qlora", 1, "beginner")
+        counters.increment_rows(self.db, CognitiveLoadHistogramBucket, CLASS_KEY, {key: {"count": 2}})
+        del self.statements[:]
+        counters.increment_rows(self.db, CognitiveLoadHistogramBucket, CLASS_KEY, {
+            key: {"count": 3},
+            ("effort", 8, "q4", "qlora", 1, "beginner"): {"count": 1}
+        })
+        self.assertEqual(len(self.statements), 1)
+        self.assertIn("ON CONFLICT", self.statements[0])
+        self.assertEqual(self.counts(), {key: 5, ("effort", 8, "q4", "qlora", 1, "beginner"): 1})
+
+    def test_large_increments_are_batched(self):
+        increments = {("effort", score, f"c{i}", "", 0, ""): {"count": 1} for i in range(200) for score in (1, 2, 3)}
+        counters.increment_rows(self.db, CognitiveLoadHistogramBucket, CLASS_KEY, increments)
+        self.assertEqual(len(self.statements), -(-len(increments) // counters.UPSERT_BATCH))
+        self.assertEqual(sum(self.counts().values()), 600)
+
+    def test_nothing_to_add(self):
+        counters.increment_rows(self.db, CognitiveLoadHistogramBucket, CLASS_KEY, {})
+        self.assertEqual(self.statements, [])
+
+class TestHistograms(unittest.TestCase):
+
+    def setUp(self):
+        self.engine, self.db = sqlite_session()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_recorded_assessments_are_counted_and_filtered(self):
+        beginner = SimpleNamespace(id=1, expertise_level="beginner")
+        record_assessments(self.db, beginner, [assessment(7), assessment(7, config_type=None), assessment(9, module_id=2)])
+        record_assessments(self.db, None, [dict(assessment(3), user_id=2, expertise_level=None)])
+        self.db.commit()
+
+        user = query_user_histogram(self.db, 1)
+        self.assertEqual(user["total"], 3)
+        self.assertEqual(user["dimensions"]["effort"], [0, 0, 0, 0, 0, 0, 2, 0, 1])
+        self.assertEqual(query_user_histogram(self.db, 1, config_type="q4", module_id=1)["total"], 1)
+
+        everyone = query_class_histogram(self.db)
+        self.assertEqual(everyone["total"], 4)
+        self.assertEqual(everyone["byExpertise"]["unknown"]["effort"][2], 1)
+        self.assertEqual(query_class_histogram(self.db, expertise_level="beginner", module_id=2)["total"], 1)
+
+    def test_negative_weight_removes_archived_assessments(self):
+        user = SimpleNamespace(id=1, expertise_level="beginner")
+        record_assessments(self.db, user, [assessment(4), assessment(6)])
+        record_assessments(self.db, user, [assessment(4)], weight=-1)
+        self.assertEqual(query_class_histogram(self.db)["dimensions"]["effort"], [0, 0, 0, 0, 0, 1, 0, 0, 0])
+
+class TestCounterMigration(unittest.TestCase):
+
+    def test_creates_missing_tables_with_their_unique_key(self):
+        engine = create_engine("sqlite://")
+        add_cognitive_load_counters.upgrade(engine)
+        inspector = inspect(engine)
+        for model, key_columns in add_cognitive_load_counters.COUNTER_KEYS:
+            self.assertTrue(add_cognitive_load_counters._has_unique_key(inspector, model.__tablename__, key_columns))
+        add_cognitive_load_counters.downgrade(engine)
+        self.assertEqual(inspect(engine).get_table_names(), [])
+
+    def test_adds_the_unique_index_to_a_table_created_without_it(self):
+        engine = create_engine("sqlite://")
+        old = MetaData()
+        Table(CognitiveLoadHistogramBucket.__tablename__, old, Column("id", Integer, primary_key=True),
+              *[Column(column, Integer if column in ("score", "module_id") else String, nullable=False) for column in CLASS_KEY],
+              Column("count", Integer, nullable=False, default=0))
+        old.create_all(engine)
+        indexes = len(CognitiveLoadHistogramBucket.__table__.indexes)
+
+        add_cognitive_load_counters.upgrade(engine)
+        self.assertTrue(add_cognitive_load_counters._has_unique_key(inspect(engine), CognitiveLoadHistogramBucket.__tablename__, CLASS_KEY))
+        self.assertEqual(len(CognitiveLoadHistogramBucket.__table__.indexes), indexes)
+        db = sessionmaker(bind=engine)()
+        record_assessments(db, SimpleNamespace(id=1, expertise_level=""), [assessment(2), assessment(2)])
+        self.assertEqual(query_class_histogram(db)["dimensions"]["effort"][1], 2)
+        db.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.database import Base
+from app.models import CognitiveLoadAssessment, Task, User
+from app.routes.cognitive_load import decode_history_cursor, encode_history_cursor, load_user_history
+from app.services.cognitive_load_stats import SEQ_DIMENSIONS
+
+START = datetime(2026, 3, 1, 12, 0)
+
+class TestHistoryCursor(unittest.TestCase):
+
+    def test_round_trip(self):
+        for timestamp in (START, START.replace(microsecond=123456)):
+            cursor = encode_history_cursor(timestamp, 42)
+            self.assertEqual(decode_history_cursor(cursor), (timestamp, 42))
+
+    def test_invalid_cursor_is_a_400(self):
+        for cursor in ("", "42", "yesterday_42", f"{START.isoformat()}_x"):
+            with self.assertRaises(HTTPException) as raised:
+                decode_history_cursor(cursor)
+            self.assertEqual(raised.exception.status_code, 400)
+
+class TestUserHistoryPages(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [{"id": 1, "expertise_level": "beginner"}, {"id": 2, "expertise_level": "advanced"}])
+            conn.execute(Task.__table__.insert(), [{"id": 1, "task_type": "qlora", "module_id": 1}])
+            rows = []
+            for i in range(1, 13):
+                row = {dimension: i % 9 + 1 for dimension in SEQ_DIMENSIONS}
+                # Pares de avaliações com o mesmo timestamp: o id desempata
+                row.update(id=i, user_id=1 if i != 6 else 2, task_id=1, config_type="q4" if i % 3 else "q8",
+                           timestamp=START + timedelta(minutes=i // 2))
+                rows.append(row)
+            conn.execute(CognitiveLoadAssessment.__table__.insert(), rows)
+        self.db = sessionmaker(bind=engine)()
+
+    def tearDown(self):
+        self.db.close()
+
+    def pages(self, limit, config_type=None):
+        before, pages = None, []
+        while True:
+            page = load_user_history(self.db, 1, None, config_type, None, before, limit)
+            pages.append([item["id"] for item in page["items"]])
+            if not page["nextCursor"]:
+                return pages
+            before = decode_history_cursor(page["nextCursor"])
+
+    def test_pages_walk_back_without_gaps_or_repeats(self):
+        self.assertEqual(self.pages(4), [[12, 11, 10, 9], [8, 7, 5, 4], [3, 2, 1]])
+        self.assertEqual(self.pages(11), [[12, 11, 10, 9, 8, 7, 5, 4, 3, 2, 1]])
+
+    def test_filtered_pages(self):
+        self.assertEqual(self.pages(2, config_type="q8"), [[12, 9], [3]])
+
+    def test_items_carry_the_scores(self):
+        item = load_user_history(self.db, 1, None, None, None, None, 1)["items"][0]
+        self.assertEqual(item["effort"], 12 % 9 + 1)
+        self.assertEqual(item["timestamp"], (START + timedelta(minutes=6)).isoformat())
+
+if __name__ == '__main__':
+    unittest.main()
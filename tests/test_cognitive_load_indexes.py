@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+from sqlalchemy import create_engine, inspect, text
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.database import Base
+from app.migrations import add_cognitive_load_indexes
+from app.models import CognitiveLoadAssessment, Task
+
+def index_names(engine):
+    inspector = inspect(engine)
+    return {
+        index["name"]
+        for table in (CognitiveLoadAssessment.__tablename__, Task.__tablename__)
+        for index in inspector.get_indexes(table)
+    }
+
+class TestIndexMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(self.engine)
+
+    def test_models_declare_every_migrated_index(self):
+        self.assertTrue(set(add_cognitive_load_indexes.INDEX_NAMES) <= index_names(self.engine))
+
+    def test_downgrade_then_upgrade(self):
+        add_cognitive_load_indexes.downgrade(self.engine)
+        self.assertFalse(set(add_cognitive_load_indexes.INDEX_NAMES) & index_names(self.engine))
+        add_cognitive_load_indexes.upgrade(self.engine)
+        # Idempotente: bancos que já têm os índices não falham
+        add_cognitive_load_indexes.upgrade(self.engine)
+        self.assertTrue(set(add_cognitive_load_indexes.INDEX_NAMES) <= index_names(self.engine))
+
+    def test_user_history_by_config_uses_the_composite_index(self):
+        with self.engine.connect() as conn:
+            plan = " ".join(str(row[-1]) for row in conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM cognitive_load_assessments "
+                "WHERE user_id = 1 AND config_type = 'q4' ORDER BY timestamp DESC, id DESC LIMIT 20"
+            )))
+        self.assertIn("ix_cognitive_load_assessments_user_config_timestamp", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sys
+import random
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.database import Base
+from app.models import CognitiveLoadAssessment, ModuleExpertiseCognitiveLoadRollup, Task, User
+from app.routes.cognitive_load import compute_class_cognitive_data
+from app.services.cognitive_load_cache import normalize_filters, response_cache
+from app.services.cognitive_load_histograms import record_assessments
+from app.services.cognitive_load_rollups import check_rollups, query_module_rollup_aggregates, rebuild_rollups, record_rollups
+from app.services.cognitive_load_stats import SEQ_DIMENSIONS
+
+LEVELS = {1: "beginner", 2: "beginner", 3: "advanced", 4: None}
+
+class TestRollups(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), [{"id": user_id, "expertise_level": level} for user_id, level in LEVELS.items()])
+            # Todas as tarefas são do mesmo tipo: /class?task_type=qlora (SQL bruto) e /class (rollup) devem coincidir
+            conn.execute(Task.__table__.insert(), [{"id": task_id, "task_type": "qlora", "module_id": task_id} for task_id in (1, 2)])
+        self.db = sessionmaker(bind=engine)()
+        rng = random.Random(2)
+        start = datetime(2026, 5, 1)
+        for i in range(60):
+            user_id, task_id = rng.choice(list(LEVELS)), rng.choice((1, 2))
+            row = {dimension: rng.randint(1, 9) for dimension in SEQ_DIMENSIONS}
+            row.update(user_id=user_id, task_id=task_id, config_type=rng.choice(("q4", "q8", None)), timestamp=start + timedelta(minutes=i))
+            self.db.execute(CognitiveLoadAssessment.__table__.insert(), row)
+            # Mesmo caminho das inserções: contadores no momento da avaliação
+            user = SimpleNamespace(id=user_id, expertise_level=LEVELS[user_id])
+            counted = [dict(row, task_type="qlora", module_id=task_id)]
+            record_assessments(self.db, user, counted)
+            record_rollups(self.db, user, counted)
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def both_paths(self, **filters):
+        raw = compute_class_cognitive_data(self.db, "qlora", filters.get("config_type"), filters.get("module_id"), filters.get("expertise_level"))
+        rollup = compute_class_cognitive_data(self.db, None, filters.get("config_type"), filters.get("module_id"), filters.get("expertise_level"))
+        return raw, rollup
+
+    def assertPathsAgree(self, **filters):
+        raw, rollup = self.both_paths(**filters)
+        self.assertEqual(raw["radarData"], rollup["radarData"], filters)
+        self.assertEqual(raw["stats"], rollup["stats"], filters)
+
+    def test_incremental_rollups_match_the_raw_aggregates(self):
+        self.assertEqual(check_rollups(self.db), [])
+        for filters in ({}, {"config_type": "q8"}, {"module_id": 2}, {"expertise_level": "beginner", "config_type": "q4"}):
+            self.assertPathsAgree(**filters)
+        self.assertEqual(query_module_rollup_aggregates(self.db)["count"], 60)
+
+    def test_drift_is_reported_and_repaired_by_a_rebuild(self):
+        row = self.db.query(ModuleExpertiseCognitiveLoadRollup).first()
+        row.effort_sum += 1
+        self.db.commit()
+        mismatches = check_rollups(self.db)
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(mismatches[0]["actual"]["effort_sum"], mismatches[0]["expected"]["effort_sum"] + 1)
+        rebuild_rollups(self.db)
+        self.assertEqual(check_rollups(self.db), [])
+
+    def test_expertise_change_moves_the_user_in_both_paths(self):
+        key = normalize_filters(expertise_level="advanced")
+        response_cache.put("class", key, response_cache.version(key), "stale")
+        beginners = self.both_paths(expertise_level="beginner")[1]["histogramData"]["total"]
+
+        user = self.db.get(User, 1)
+        user.expertise_level = "advanced"
+        self.db.commit()
+
+        self.assertEqual(check_rollups(self.db), [])
+        for level in ("beginner", "advanced", None):
+            self.assertPathsAgree(expertise_level=level)
+        moved = beginners - self.both_paths(expertise_level="beginner")[1]["histogramData"]["total"]
+        self.assertGreater(moved, 0)
+        self.assertIsNone(response_cache.get("class", key))
+
+        # Sem nível: "" nos contadores, "unknown" na resposta
+        user.expertise_level = None
+        self.db.commit()
+        self.assertEqual(check_rollups(self.db), [])
+        unknown = self.db.query(CognitiveLoadAssessment).filter(CognitiveLoadAssessment.user_id.in_((1, 4))).count()
+        by_expertise = compute_class_cognitive_data(self.db, None, None, None, None)["histogramData"]["byExpertise"]
+        self.assertEqual(sum(by_expertise["unknown"]["effort"]), unknown)
+
+    def test_rolled_back_change_leaves_the_counters(self):
+        self.db.get(User, 3).expertise_level = "beginner"
+        self.db.flush()
+        self.db.rollback()
+        self.assertEqual(check_rollups(self.db), [])
+        self.assertPathsAgree(expertise_level="advanced")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import random
+import unittest
+
+import numpy as np
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app.services.cognitive_load_stats import CognitiveLoadStatsEngine, RunningStats, SEQ_DIMENSIONS
+
+def scores(effort):
+    return {dimension: effort for dimension in SEQ_DIMENSIONS}
+
+class TestRunningStats(unittest.TestCase):
+
+    def test_matches_numpy(self):
+        rng = random.Random(3)
+        values = [rng.randint(1, 9) for _ in range(501)]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        self.assertAlmostEqual(stats.mean, np.mean(values))
+        self.assertAlmostEqual(stats.variance, np.var(values))
+        for q in (0.25, 0.5, 0.75, 0.9):
+            self.assertAlmostEqual(stats.quantile(q), np.quantile(values, q))
+        self.assertEqual(stats.at_least(7), sum(value >= 7 for value in values))
+
+    def test_weighted_add_equals_repeated_add(self):
+        weighted, repeated = RunningStats(), RunningStats()
+        for value, weight in ((2, 3), (8, 5), (5, 1)):
+            weighted.add(value, weight)
+            for _ in range(weight):
+                repeated.add(value)
+        self.assertEqual(weighted.count, repeated.count)
+        self.assertAlmostEqual(weighted.mean, repeated.mean)
+        self.assertAlmostEqual(weighted.m2, repeated.m2)
+        self.assertEqual(weighted.counts, repeated.counts)
+
+    def test_empty(self):
+        self.assertEqual(RunningStats().to_dict()["median"], 0)
+
+class TestStatsEngine(unittest.TestCase):
+
+    def loaded_engine(self, high_water):
+        # Estado de um motor carregado do banco até o id `high_water`
+        engine = CognitiveLoadStatsEngine()
+        engine._loaded = True
+        engine._high_water = high_water
+        return engine
+
+    def test_not_loaded_ignores_inserts(self):
+        engine = CognitiveLoadStatsEngine()
+        engine.add_assessment(1, "qlora", "q4", 1, scores(5))
+        self.assertEqual(engine.summary()["count"], 0)
+
+    def test_rows_counted_by_the_load_are_not_added_twice(self):
+        engine = self.loaded_engine(high_water=10)
+        # Commit anterior à carga, notificado depois dela
+        engine.add_assessment(10, "qlora", "q4", 1, scores(9))
+        engine.add_assessment(11, "qlora", "q4", 1, scores(8))
+        engine.add_assessment(11, "qlora", "q4", 1, scores(8))
+        summary = engine.summary()
+        self.assertEqual(summary["count"], 1)
+        self.assertEqual(summary["mean"], 8)
+
+    def test_filters_and_overload(self):
+        engine = self.loaded_engine(high_water=0)
+        for assessment_id, (config_type, effort) in enumerate([("q4", 3), ("q4", 7), ("q8", 9), ("q8", 5)], start=1):
+            engine.add_assessment(assessment_id, "qlora", config_type, 2, scores(effort))
+        self.assertEqual(engine.summary()["count"], 4)
+        self.assertEqual(engine.summary(config_type="q8")["mean"], 7)
+        self.assertEqual(engine.summary(task_type="qlora", module_id=2)["overload"], 50)
+        self.assertEqual(engine.summary(module_id=3)["count"], 0)
+        engine.reset()
+        self.assertEqual(engine.summary()["count"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import asyncio
+import unittest
+from unittest import mock
+
+# Adicionar o diretório do backend ao path para importar os módulos de CompL
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from compl.probes import CachedProbe, FakeGPUProbe, GPUProbe, select_gpu_probe
+
+class TestCachedProbe(unittest.TestCase):
+
+    def test_concurrent_callers_share_one_probe(self):
+        probe = FakeGPUProbe(delay=0.05)
+        cached = CachedProbe(probe.read, ttl=60)
+
+        async def run():
+            return await asyncio.gather(*[cached.get() for _ in range(50)])
+
+        results = asyncio.run(run())
+        self.assertEqual(probe.calls, 1)
+        self.assertTrue(all(r == probe.reading for r in results))
+
+    def test_ttl_expiry_triggers_refresh(self):
+        probe = FakeGPUProbe()
+        cached = CachedProbe(probe.read, ttl=0.01)
+
+        async def run():
+            await cached.get()
+            await asyncio.sleep(0.02)
+            await cached.get()
+
+        asyncio.run(run())
+        self.assertEqual(probe.calls, 2)
+
+    def test_errors_are_not_cached(self):
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise RuntimeError("nvidia-smi failed")
+            return {"total": 1, "used": 0, "usage": 0.0}
+
+        cached = CachedProbe(flaky, ttl=60)
+
+        async def run():
+            with self.assertRaises(RuntimeError):
+                await cached.get()
+            return await cached.get()
+
+        self.assertEqual(asyncio.run(run())["total"], 1)
+
+    def test_select_named_backend(self):
+        self.assertEqual(select_gpu_probe("fake").name, "fake")
+        self.assertIsNone(select_gpu_probe("none").read())
+
+    def test_unknown_backend_falls_back_to_auto(self):
+        with mock.patch.dict(os.environ, {"COMPL_GPU_PROBE": "nvidia"}):
+            with self.assertLogs("compl.probes", level="WARNING") as logs:
+                probe = select_gpu_probe()
+        self.assertIsInstance(probe, GPUProbe)
+        self.assertIn("nvml", logs.output[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import asyncio
+import unittest
+
+# Adicionar o diretório do backend ao path para importar os módulos de CompL
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from compl.sampler import RingBuffer, MetricsSampler
+
+class TestRingBuffer(unittest.TestCase):
+
+    def test_keeps_most_recent_items_in_order(self):
+        buffer = RingBuffer(3)
+        for i in range(5):
+            buffer.append(i)
+        self.assertEqual(len(buffer), 3)
+        self.assertEqual(buffer.items(), [2, 3, 4])
+        self.assertEqual(buffer.latest(), 4)
+
+    def test_partial_buffer(self):
+        buffer = RingBuffer(4)
+        self.assertIsNone(buffer.latest())
+        buffer.append("a")
+        buffer.append("b")
+        self.assertEqual(buffer.items(), ["a", "b"])
+
+class TestMetricsSampler(unittest.TestCase):
+
+    def test_payload_is_built_from_samples(self):
+        readings = iter(range(100))
+
+        def probe():
+            value = next(readings)
+            return {"cpu_usage": value, "vram_used": value / 10}
+
+        sampler = MetricsSampler(probe, interval=0.01, capacity=5)
+
+        async def run():
+            await sampler.start()
+            await asyncio.sleep(0.1)
+            await sampler.stop()
+
+        asyncio.run(run())
+        payload = sampler.payload()
+        self.assertEqual(len(payload["timeSeries"]), 5)
+        self.assertEqual(payload["timeSeries"][-1]["cpuUsage"], payload["current"]["cpu_usage"])
+        self.assertEqual([p["time"] for p in payload["timeSeries"]], list(range(5)))
+        self.assertIn("execution_time", payload["current"])
+
+if __name__ == '__main__':
+    unittest.main()
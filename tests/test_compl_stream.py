@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+
+# Adicionar o diretório do backend ao path para importar os módulos de CompL
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from compl.sampler import MetricsSampler
+from compl.stream import MetricsBroadcaster, StreamRate, compute_delta
+
+class TestComputeDelta(unittest.TestCase):
+
+    def test_only_changed_leaves_are_returned(self):
+        previous = {"ram": {"total": 16, "used": 4}, "gpu": {"usage": 10.0}, "old": 1}
+        current = {"ram": {"total": 16, "used": 5}, "gpu": {"usage": 10.0}, "new": 2}
+        changed, removed = compute_delta(previous, current)
+        self.assertEqual(changed, {"ram": {"used": 5}, "new": 2})
+        self.assertEqual(removed, [["old"]])
+
+class TestMetricsBroadcaster(unittest.TestCase):
+
+    def test_one_sampler_fans_out_to_many_clients(self):
+        calls = []
+
+        def probe():
+            calls.append(1)
+            return {"cpu_usage": len(calls), "ram": {"total": 16}}
+
+        broadcaster = MetricsBroadcaster(MetricsSampler(probe, interval=0.02), owns_sampler=True)
+
+        async def consume():
+            received = []
+            async for _, message in broadcaster.messages(StreamRate(0.1)):
+                received.append(json.loads(message))
+                if len(received) == 2:
+                    break
+            return received
+
+        async def run():
+            results = await asyncio.gather(*[consume() for _ in range(50)])
+            await asyncio.sleep(0.05)
+            return results
+
+        results = asyncio.run(run())
+        for snapshot, delta in results:
+            self.assertEqual(snapshot["type"], "snapshot")
+            self.assertEqual(delta["type"], "delta")
+            self.assertNotIn("ram", delta["changed"])
+        # Poucas leituras para 50 clientes, e o amostrador para quando todos saem
+        self.assertLess(len(calls), 20)
+        self.assertEqual(broadcaster.client_count, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import unittest
+
+# Adicionar o diretório do backend ao path para importar os módulos de CompL
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from compl.tasks import TaskConflict, TaskRegistry
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTaskRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.registry = TaskRegistry(alpha=0.5, clock=self.clock)
+
+    def test_eta_from_task_throughput(self):
+        task_id = self.registry.start_task("generation", "q4", 100)
+        self.assertIsNone(self.registry.estimate(task_id))
+        self.clock.now = 2.0
+        self.registry.report_progress(task_id, 20)  # 10 tokens/s
+        self.assertAlmostEqual(self.registry.estimate(task_id), 8.0)
+        self.clock.now = 3.0
+        self.assertAlmostEqual(self.registry.estimate(task_id), 7.0)
+
+    def test_new_task_uses_class_throughput(self):
+        first = self.registry.start_task("fine-tuning", "q8", 10)
+        self.clock.now = 5.0
+        self.registry.report_progress(first, 5)  # 1 step/s
+        self.registry.finish_task(first)
+        second = self.registry.start_task("fine-tuning", "q8", 30)
+        self.assertAlmostEqual(self.registry.estimate(second), 30.0)
+        other = self.registry.start_task("fine-tuning", "q4", 30)
+        self.assertIsNone(self.registry.estimate(other))
+
+    def test_aggregate_eta_is_longest_task(self):
+        fast = self.registry.start_task("generation", "q4", 100)
+        slow = self.registry.start_task("generation", "q8", 100)
+        self.clock.now = 1.0
+        self.registry.report_progress(fast, 50)
+        self.registry.report_progress(slow, 10)
+        self.assertAlmostEqual(self.registry.aggregate_eta(), 9.0)
+        self.registry.finish_task(slow)
+        self.assertAlmostEqual(self.registry.aggregate_eta(), 1.0)
+
+    def test_stalled_reports_stay_in_the_throughput(self):
+        task_id = self.registry.start_task("generation", "q4", 100)
+        self.clock.now = 2.0
+        self.registry.report_progress(task_id, 20)  # 10 tokens/s
+        # Parado por 8s: os relatórios sem progresso não reiniciam o intervalo
+        for now in (4.0, 6.0, 8.0, 10.0):
+            self.clock.now = now
+            self.registry.report_progress(task_id, 20)
+        self.clock.now = 12.0
+        self.registry.report_progress(task_id, 40)  # 20 tokens em 10s: 2 tokens/s
+        self.assertAlmostEqual(self.registry.snapshot()[0]["throughput"], 6.0)
+        self.assertAlmostEqual(self.registry.estimate(task_id), 10.0)
+
+    def test_overshoot_is_clamped_before_the_rate(self):
+        task_id = self.registry.start_task("generation", "q4", 100)
+        self.clock.now = 1.0
+        self.registry.report_progress(task_id, 50)
+        self.clock.now = 2.0
+        self.registry.report_progress(task_id, 250)  # só 50 tokens restavam
+        task = self.registry.snapshot()[0]
+        self.assertEqual(task["completed_units"], 100)
+        self.assertAlmostEqual(task["throughput"], 50.0)
+        self.assertAlmostEqual(self.registry.throughput_table()["generation/q4"], 50.0)
+
+    def test_running_task_id_is_not_replaced(self):
+        task_id = self.registry.start_task("generation", "q4", 100, task_id="job-1")
+        self.clock.now = 2.0
+        self.registry.report_progress(task_id, 20)
+        with self.assertRaises(TaskConflict):
+            self.registry.start_task("generation", "q8", 50, task_id="job-1")
+        self.assertEqual(self.registry.snapshot()[0]["completed_units"], 20)
+
+        # Depois de finalizada, o mesmo id pode ser reiniciado do zero
+        self.registry.finish_task(task_id)
+        self.registry.start_task("generation", "q8", 50, task_id="job-1")
+        self.assertEqual(self.registry.snapshot()[0]["completed_units"], 0.0)
+
+if __name__ == '__main__':
+    unittest.main()
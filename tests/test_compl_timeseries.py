@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+# Adicionar o diretório do backend ao path para importar os módulos de CompL
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from compl.timeseries import MultiResolutionStore
+
+class TestMultiResolutionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = MultiResolutionStore(fields=["cpu_usage"])
+        # Duas horas de leituras a cada segundo, com valor = segundo dentro do minuto
+        self.start = 1_700_000_000 - 1_700_000_000 % 3600
+        for i in range(2 * 3600 + 1):
+            self.store.add_sample({"cpu_usage": i % 60}, ts=self.start + i)
+
+    def test_rollup_values(self):
+        result = self.store.query(self.start, self.start + 59, step=60)
+        self.assertEqual(result["resolution"], 60)
+        row = result["series"][0]["cpu_usage"]
+        self.assertEqual(row["min"], 0)
+        self.assertEqual(row["max"], 59)
+        self.assertAlmostEqual(row["avg"], 29.5)
+        self.assertEqual(row["p95"], 56)
+        self.assertEqual(row["count"], 60)
+
+    def test_picks_coarsest_resolution_for_step(self):
+        self.assertEqual(self.store.query(self.start + 3600, self.start + 4200, step=1)["resolution"], 1)
+        self.assertEqual(self.store.query(self.start, self.start + 600, step=30)["resolution"], 10)
+        self.assertEqual(self.store.query(self.start, self.start + 7200, step=3600)["resolution"], 3600)
+
+    def test_long_range_is_downsampled(self):
+        result = self.store.query(self.start, self.start + 7200)
+        self.assertLessEqual(len(result["series"]), self.store.max_points)
+        self.assertGreater(result["step"], result["resolution"] - 1)
+        total = sum(point["cpu_usage"]["count"] for point in result["series"])
+        self.assertEqual(total, 7200)
+
+    def test_retention_falls_back_to_coarser_resolution(self):
+        store = MultiResolutionStore(resolutions=[(1, 10), (10, 100)], fields=["cpu_usage"])
+        for i in range(200):
+            store.add_sample({"cpu_usage": 1}, ts=1000 + i)
+        result = store.query(1000, 1199, step=1)
+        self.assertEqual(result["resolution"], 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+# Adicionar o diretório do backend ao path para importar o pacote app
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'backend')))
+
+from app import db_executor
+
+POOL_VARIABLES = ("DB_POOL_SIZE", "DB_MAX_OVERFLOW", "DB_POOL_TIMEOUT", "DB_POOL_RECYCLE")
+
+class TestPoolOptions(unittest.TestCase):
+
+    def test_defaults_follow_the_executor_size(self):
+        environ = {key: value for key, value in os.environ.items() if key not in POOL_VARIABLES}
+        with mock.patch.dict(os.environ, environ, clear=True):
+            self.assertEqual(db_executor.pool_options(), {
+                "pool_size": db_executor.DB_THREADS,
+                "max_overflow": 4,
+                "pool_timeout": 30.0,
+                "pool_recycle": 1800,
+                "pool_pre_ping": True,
+            })
+
+    def test_environment_overrides(self):
+        overrides = {"DB_POOL_SIZE": "3", "DB_MAX_OVERFLOW": "0", "DB_POOL_TIMEOUT": "2.5", "DB_POOL_RECYCLE": "60"}
+        with mock.patch.dict(os.environ, overrides):
+            options = db_executor.pool_options()
+        self.assertEqual((options["pool_size"], options["max_overflow"]), (3, 0))
+        self.assertEqual((options["pool_timeout"], options["pool_recycle"]), (2.5, 60))
+
+class TestRunDb(unittest.TestCase):
+
+    def test_runs_off_the_event_loop_thread(self):
+        def work(value, offset=0):
+            return threading.current_thread().name, value + offset
+
+        async def run():
+            return threading.current_thread().name, await db_executor.run_db(work, 40, offset=2)
+
+        loop_thread, (worker_thread, result) = asyncio.run(run())
+        self.assertEqual(result, 42)
+        self.assertNotEqual(worker_thread, loop_thread)
+        self.assertTrue(worker_thread.startswith("db"))
+
+    def test_errors_reach_the_caller(self):
+        def fail():
+            raise LookupError("missing")
+
+        with self.assertRaises(LookupError):
+            asyncio.run(db_executor.run_db(fail))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+# Adicionar a raiz do projeto ao path para importar o pacote services
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import resource_attribution_service as attribution
+from services.resource_attribution_service import ResourceAttributionService, _parse_stat
+
+def stat_line(pid, ppid, start_time, utime=0, stime=0, rss_pages=0, name="python worker"):
+    # Campos após o nome: state ppid ... utime(11) stime(12) ... starttime(19) vsize rss(21)
+    fields = ["S", ppid] + [0] * 9 + [utime, stime] + [0] * 6 + [start_time, 0, rss_pages]
+    return f"{pid} ({name}) " + " ".join(map(str, fields))
+
+class FakeProc:
+    """Árvore /proc mínima num diretório temporário: só /proc/[pid]/stat."""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp()
+
+    def spawn(self, pid, ppid, start_time, **kwargs):
+        os.makedirs(os.path.join(self.root, str(pid)), exist_ok=True)
+        with open(os.path.join(self.root, str(pid), "stat"), "w") as f:
+            f.write(stat_line(pid, ppid, start_time, **kwargs))
+
+    def kill(self, pid):
+        shutil.rmtree(os.path.join(self.root, str(pid)))
+
+    def cleanup(self):
+        shutil.rmtree(self.root)
+
+class TestResourceAttribution(unittest.TestCase):
+
+    def setUp(self):
+        self.proc = FakeProc()
+        self.addCleanup(self.proc.cleanup)
+        patcher = mock.patch.object(attribution, "PROC_ROOT", self.proc.root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.proc.spawn(1, 0, 1)
+        self.proc.spawn(100, 1, 500, utime=30, rss_pages=10)
+        self.proc.spawn(101, 100, 510, utime=20, rss_pages=5)
+        self.proc.spawn(102, 101, 520, rss_pages=1)
+        self.proc.spawn(200, 1, 600, rss_pages=7)
+        self.service = ResourceAttributionService()
+
+    def test_parse_stat_with_spaces_and_parentheses_in_the_name(self):
+        sample = _parse_stat(7, stat_line(7, 3, 42, utime=10, stime=5, rss_pages=2, name="a (b) c"))
+        self.assertEqual((sample.ppid, sample.start_time), (3, 42))
+        self.assertAlmostEqual(sample.cpu_time, 15 / attribution.CLOCK_TICKS)
+        self.assertEqual(sample.rss, 2 * attribution.PAGE_SIZE)
+
+    def test_descendants_are_attributed_to_the_root_agent(self):
+        self.service.register_process("a1", 100)
+        self.service.register_process("a2", 200)
+        breakdown = self.service.sample()
+        self.assertEqual(sorted(breakdown["a1"]["pids"]), [100, 101, 102])
+        self.assertEqual(breakdown["a1"]["rss"], 16 * attribution.PAGE_SIZE)
+        self.assertEqual(breakdown["a2"]["pids"], [200])
+
+    def test_nested_root_takes_its_own_subtree(self):
+        self.service.register_process("a1", 100)
+        self.service.register_process("a2", 101)
+        breakdown = self.service.sample()
+        self.assertEqual(breakdown["a1"]["pids"], [100])
+        self.assertEqual(sorted(breakdown["a2"]["pids"]), [101, 102])
+
+    def test_reregistering_keeps_the_start_time_so_pid_reuse_is_detected(self):
+        self.service.register_process("a1", 100)
+        self.service.sample()
+        # O agente reenvia o PID a cada atualização de estado
+        self.service.register_process("a1", 100)
+        self.assertEqual(self.service._roots[100], ("a1", 500))
+        # O processo termina e o PID é reutilizado por outro
+        self.proc.kill(100)
+        self.proc.spawn(100, 1, 900)
+        self.service.register_process("a1", 100)
+        self.assertEqual(self.service.sample(), {})
+        self.assertEqual(self.service._roots, {})
+
+    def test_root_is_dropped_when_the_process_exits(self):
+        self.service.register_process("a2", 200)
+        self.proc.kill(200)
+        self.assertEqual(self.service.sample(), {})
+        self.assertEqual(self.service._roots, {})
+
+    def test_init_and_invalid_pids_are_refused(self):
+        for pid in (1, 0, -5):
+            with self.assertRaises(ValueError):
+                self.service.register_process("a1", pid)
+        with self.assertRaises(ValueError):
+            self.service.register_process("a1", 4242)
+        self.assertEqual(self.service._roots, {})
+
+    def test_processes_of_another_user_are_refused(self):
+        self.service.service_uid = os.stat(self.proc.root).st_uid + 1
+        with self.assertRaises(ValueError):
+            self.service.register_process("a1", 100)
+        self.assertEqual(self.service._roots, {})
+
+    def test_processes_of_another_user_with_the_flag(self):
+        self.service.service_uid = os.stat(self.proc.root).st_uid + 1
+        self.service.allow_other_users = True
+        self.service.register_process("a1", 100)
+        self.assertEqual(sorted(self.service.sample()["a1"]["pids"]), [100, 101, 102])
+
+        # Sem o stat legível não há o que atribuir
+        with mock.patch.object(attribution.os, "access", return_value=False):
+            with self.assertRaises(ValueError):
+                self.service.register_process("a2", 200)
+
+    def test_unregister_agent(self):
+        self.service.register_process("a1", 100)
+        self.service.register_process("a2", 200)
+        self.service.sample()
+        self.service.unregister_agent("a1")
+        self.assertEqual(list(self.service.sample()), ["a2"])
+
+if __name__ == '__main__':
+    unittest.main()